@@ -2,14 +2,115 @@
 APIC REST API Client
 """
 
-import requests
 import json
-import urllib3
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Sequence
 import asyncio
+import time
 from datetime import datetime
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .transport import create_async_client
+from .throttle import get_host_throttle, send_with_retry
+
+# APIC sessions last refreshTimeoutSeconds (600 by default); refresh them
+# this long (at most half the lifetime) before they expire.
+DEFAULT_TOKEN_TIMEOUT = 600
+TOKEN_REFRESH_MARGIN = 60
+
+# Objects per page when iterating class and subtree queries
+DEFAULT_PAGE_SIZE = 1000
+
+def build_tenant_mo(tenant_config: Dict[str, Any], status: str = "created") -> Dict[str, Any]:
+    """Build the fvTenant managed object for a tenant config"""
+    return {
+        "fvTenant": {
+            "attributes": {
+                "name": tenant_config["name"],
+                "descr": tenant_config.get("description", ""),
+                "status": status
+            }
+        }
+    }
+
+def build_vrf_mo(vrf_config: Dict[str, Any], status: str = "created") -> Dict[str, Any]:
+    """Build the fvCtx managed object for a VRF config"""
+    return {
+        "fvCtx": {
+            "attributes": {
+                "name": vrf_config["name"],
+                "descr": vrf_config.get("description", ""),
+                "pcEnfPref": vrf_config.get("enforcement", "enforced"),
+                "status": status
+            }
+        }
+    }
+
+def build_bridge_domain_mo(bd_config: Dict[str, Any], status: str = "created") -> Dict[str, Any]:
+    """Build the fvBD managed object (with VRF relation and subnet) for a BD config"""
+    bd_payload = {
+        "fvBD": {
+            "attributes": {
+                "name": bd_config["name"],
+                "descr": bd_config.get("description", ""),
+                "status": status
+            },
+            "children": [
+                {
+                    "fvRsCtx": {
+                        "attributes": {
+                            "tnFvCtxName": bd_config["vrf"]
+                        }
+                    }
+                }
+            ]
+        }
+    }
+    
+    if bd_config.get("subnet"):
+        subnet_payload = {
+            "fvSubnet": {
+                "attributes": {
+                    "ip": bd_config["subnet"],
+                    "scope": "public",
+                    "status": status
+                }
+            }
+        }
+        bd_payload["fvBD"]["children"].append(subnet_payload)
+    
+    return bd_payload
+
+def build_application_profile_mo(ap_config: Dict[str, Any], status: str = "created") -> Dict[str, Any]:
+    """Build the fvAp managed object for an application profile config"""
+    return {
+        "fvAp": {
+            "attributes": {
+                "name": ap_config["name"],
+                "descr": ap_config.get("description", ""),
+                "status": status
+            }
+        }
+    }
+
+def build_epg_mo(epg_config: Dict[str, Any], status: str = "created") -> Dict[str, Any]:
+    """Build the fvAEPg managed object (with BD relation) for an EPG config"""
+    return {
+        "fvAEPg": {
+            "attributes": {
+                "name": epg_config["name"],
+                "descr": epg_config.get("description", ""),
+                "status": status
+            },
+            "children": [
+                {
+                    "fvRsBd": {
+                        "attributes": {
+                            "tnFvBDName": epg_config["bridge_domain"]
+                        }
+                    }
+                }
+            ]
+        }
+    }
 
 class APICClient:
     """APIC REST API client for ACI provisioning"""
@@ -21,15 +122,67 @@ class APICClient:
         self.port = port
         self.verify_ssl = verify_ssl
         self.base_url = f"https://{host}:{port}/api"
-        self.session = requests.Session()
-        self.session.verify = verify_ssl
+        self.session = create_async_client(verify_ssl)
         self.token = None
-        
+        self.token_refresh_at = 0.0
+        self._auth_lock: Optional[asyncio.Lock] = None
+    
+    @property
+    def auth_lock(self) -> asyncio.Lock:
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        return self._auth_lock
+    
+    def _store_token(self, attributes: Dict[str, Any]):
+        """Remember a token from an aaaLogin/aaaRefresh response"""
+        self.token = attributes["token"]
+        timeout = int(attributes.get("refreshTimeoutSeconds") or DEFAULT_TOKEN_TIMEOUT)
+        self.token_refresh_at = time.monotonic() + timeout - min(TOKEN_REFRESH_MARGIN, timeout / 2)
         self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
+            'APIC-Cookie': self.token
         })
     
+    def token_needs_refresh(self) -> bool:
+        return self.token is not None and time.monotonic() >= self.token_refresh_at
+    
+    async def refresh_token(self) -> Dict[str, Any]:
+        """Extend the session with aaaRefresh, falling back to a full login"""
+        try:
+            response = await self._send("GET", f"{self.base_url}/aaaRefresh.json", timeout=30)
+            if response.status_code == 200:
+                imdata = response.json().get("imdata", [])
+                if imdata and "aaaLogin" in imdata[0]:
+                    self._store_token(imdata[0]["aaaLogin"]["attributes"])
+                    return {"success": True, "token": self.token}
+        except Exception:
+            pass
+        return await self.authenticate()
+    
+    async def _request(self, method: str, url: str, **kwargs):
+        """Send an authenticated request, keeping the session token alive.
+
+        Tokens close to expiry are refreshed first. A 401/403 caused by an
+        expired token triggers one re-login and a single retry.
+        """
+        if self.token_needs_refresh():
+            async with self.auth_lock:
+                if self.token_needs_refresh():
+                    await self.refresh_token()
+        
+        token = self.token
+        response = await self._send(method, url, **kwargs)
+        if response.status_code in (401, 403) and token is not None and _is_token_error(response):
+            async with self.auth_lock:
+                # Another request may already have logged in again
+                if self.token == token:
+                    await self.authenticate()
+            response = await self._send(method, url, **kwargs)
+        return response
+    
+    async def _send(self, method: str, url: str, **kwargs):
+        """Send one request through the per-host rate limiter, with retries"""
+        return await send_with_retry(get_host_throttle(self.host), self.session, method, url, **kwargs)
+    
     async def authenticate(self) -> Dict[str, Any]:
         """Authenticate with APIC and get session token"""
         try:
@@ -42,19 +195,17 @@ class APICClient:
                 }
             }
             
-            response = self.session.post(
+            response = await self._send(
+                "POST",
                 f"{self.base_url}/aaaLogin.json",
-                data=json.dumps(auth_payload),
+                content=json.dumps(auth_payload),
                 timeout=30
             )
             
             if response.status_code == 200:
                 auth_data = response.json()
                 if "imdata" in auth_data and len(auth_data["imdata"]) > 0:
-                    self.token = auth_data["imdata"][0]["aaaLogin"]["attributes"]["token"]
-                    self.session.headers.update({
-                        'APIC-Cookie': self.token
-                    })
+                    self._store_token(auth_data["imdata"][0]["aaaLogin"]["attributes"])
                     return {"success": True, "token": self.token}
                 else:
                     return {"success": False, "error": "Invalid authentication response"}
@@ -67,7 +218,8 @@ class APICClient:
     async def test_connectivity(self) -> Dict[str, Any]:
         """Test connectivity to APIC"""
         try:
-            response = self.session.get(
+            response = await self._request(
+                "GET",
                 f"{self.base_url}/class/topSystem.json",
                 timeout=10
             )
@@ -83,19 +235,12 @@ class APICClient:
     async def create_tenant(self, tenant_config: Dict[str, Any]) -> Dict[str, Any]:
         """Create a tenant in ACI"""
         try:
-            tenant_payload = {
-                "fvTenant": {
-                    "attributes": {
-                        "name": tenant_config["name"],
-                        "descr": tenant_config.get("description", ""),
-                        "status": "created"
-                    }
-                }
-            }
+            tenant_payload = build_tenant_mo(tenant_config)
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/node/mo/uni/tn-{tenant_config['name']}.json",
-                data=json.dumps(tenant_payload),
+                content=json.dumps(tenant_payload),
                 timeout=30
             )
             
@@ -110,20 +255,12 @@ class APICClient:
     async def create_vrf(self, vrf_config: Dict[str, Any]) -> Dict[str, Any]:
         """Create a VRF (Context) in ACI"""
         try:
-            vrf_payload = {
-                "fvCtx": {
-                    "attributes": {
-                        "name": vrf_config["name"],
-                        "descr": vrf_config.get("description", ""),
-                        "pcEnfPref": vrf_config.get("enforcement", "enforced"),
-                        "status": "created"
-                    }
-                }
-            }
+            vrf_payload = build_vrf_mo(vrf_config)
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/node/mo/uni/tn-{vrf_config['tenant']}/ctx-{vrf_config['name']}.json",
-                data=json.dumps(vrf_payload),
+                content=json.dumps(vrf_payload),
                 timeout=30
             )
             
@@ -138,40 +275,12 @@ class APICClient:
     async def create_bridge_domain(self, bd_config: Dict[str, Any]) -> Dict[str, Any]:
         """Create a Bridge Domain in ACI"""
         try:
-            bd_payload = {
-                "fvBD": {
-                    "attributes": {
-                        "name": bd_config["name"],
-                        "descr": bd_config.get("description", ""),
-                        "status": "created"
-                    },
-                    "children": [
-                        {
-                            "fvRsCtx": {
-                                "attributes": {
-                                    "tnFvCtxName": bd_config["vrf"]
-                                }
-                            }
-                        }
-                    ]
-                }
-            }
+            bd_payload = build_bridge_domain_mo(bd_config)
             
-            if bd_config.get("subnet"):
-                subnet_payload = {
-                    "fvSubnet": {
-                        "attributes": {
-                            "ip": bd_config["subnet"],
-                            "scope": "public",
-                            "status": "created"
-                        }
-                    }
-                }
-                bd_payload["fvBD"]["children"].append(subnet_payload)
-            
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/node/mo/uni/tn-{bd_config['tenant']}/BD-{bd_config['name']}.json",
-                data=json.dumps(bd_payload),
+                content=json.dumps(bd_payload),
                 timeout=30
             )
             
@@ -186,19 +295,12 @@ class APICClient:
     async def create_application_profile(self, ap_config: Dict[str, Any]) -> Dict[str, Any]:
         """Create an Application Profile in ACI"""
         try:
-            ap_payload = {
-                "fvAp": {
-                    "attributes": {
-                        "name": ap_config["name"],
-                        "descr": ap_config.get("description", ""),
-                        "status": "created"
-                    }
-                }
-            }
+            ap_payload = build_application_profile_mo(ap_config)
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/node/mo/uni/tn-{ap_config['tenant']}/ap-{ap_config['name']}.json",
-                data=json.dumps(ap_payload),
+                content=json.dumps(ap_payload),
                 timeout=30
             )
             
@@ -213,28 +315,12 @@ class APICClient:
     async def create_epg(self, epg_config: Dict[str, Any]) -> Dict[str, Any]:
         """Create an EPG (Endpoint Group) in ACI"""
         try:
-            epg_payload = {
-                "fvAEPg": {
-                    "attributes": {
-                        "name": epg_config["name"],
-                        "descr": epg_config.get("description", ""),
-                        "status": "created"
-                    },
-                    "children": [
-                        {
-                            "fvRsBd": {
-                                "attributes": {
-                                    "tnFvBDName": epg_config["bridge_domain"]
-                                }
-                            }
-                        }
-                    ]
-                }
-            }
+            epg_payload = build_epg_mo(epg_config)
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/node/mo/uni/tn-{epg_config['tenant']}/ap-{epg_config['app_profile']}/epg-{epg_config['name']}.json",
-                data=json.dumps(epg_payload),
+                content=json.dumps(epg_payload),
                 timeout=30
             )
             
@@ -249,27 +335,153 @@ class APICClient:
     async def get_fabric_nodes(self) -> Dict[str, Any]:
         """Get fabric node information"""
         try:
-            response = self.session.get(
-                f"{self.base_url}/class/fabricNode.json",
-                timeout=30
+            nodes = []
+            async for node in self.iter_class("fabricNode", properties=["id", "name", "role", "model", "serial"]):
+                nodes.append(node["attributes"])
+            return {"success": True, "nodes": nodes}
+                
+        except Exception as e:
+            return {"success": False, "error": f"Fabric nodes query error: {str(e)}"}
+    
+    async def post_tree(self, dn: str, payload: Dict[str, Any], timeout: int = 120) -> Dict[str, Any]:
+        """POST a nested managed object tree in a single APIC transaction"""
+        try:
+            response = await self._request(
+                "POST",
+                f"{self.base_url}/mo/{dn}.json",
+                content=json.dumps(payload),
+                timeout=timeout
+            )
+            
+            if response.status_code in [200, 201]:
+                return {"success": True, "message": f"Tree posted to '{dn}' successfully"}
+            else:
+                return {"success": False, "error": f"Failed to post tree: {response.status_code} - {_apic_error_text(response)}"}
+                
+        except Exception as e:
+            return {"success": False, "error": f"Tree post error: {str(e)}"}
+    
+    async def query_subtree(self, dn: str, classes: List[str], query_filter: Optional[str] = None) -> Dict[str, Any]:
+        """Query the subtree under a DN, restricted to the given classes"""
+        try:
+            params = {
+                "query-target": "subtree",
+                "target-subtree-class": ",".join(classes)
+            }
+            if query_filter:
+                params["query-target-filter"] = query_filter
+            response = await self._request(
+                "GET",
+                f"{self.base_url}/mo/{dn}.json",
+                params=params,
+                timeout=60
             )
             
             if response.status_code == 200:
-                nodes_data = response.json()
-                nodes = []
-                for node_data in nodes_data.get("imdata", []):
-                    node = node_data["fabricNode"]["attributes"]
-                    nodes.append({
-                        "id": node["id"],
-                        "name": node["name"],
-                        "role": node["role"],
-                        "model": node["model"],
-                        "serial": node["serial"]
-                    })
+                return {"success": True, "objects": _imdata_objects(response)}
+            else:
+                return {"success": False, "error": f"Failed to query subtree: {response.status_code}"}
                 
-                return {"success": True, "nodes": nodes}
+        except Exception as e:
+            return {"success": False, "error": f"Subtree query error: {str(e)}"}
+    
+    async def query_class(self, class_name: str, query_filter: Optional[str] = None) -> Dict[str, Any]:
+        """Query every object of one class"""
+        try:
+            response = await self._request(
+                "GET",
+                f"{self.base_url}/class/{class_name}.json",
+                params={"query-target-filter": query_filter} if query_filter else None,
+                timeout=60
+            )
+            
+            if response.status_code == 200:
+                return {"success": True, "objects": _imdata_objects(response)}
             else:
-                return {"success": False, "error": f"Failed to get fabric nodes: {response.status_code}"}
+                return {"success": False, "error": f"Failed to query class {class_name}: {response.status_code}"}
                 
         except Exception as e:
-            return {"success": False, "error": f"Fabric nodes query error: {str(e)}"}
+            return {"success": False, "error": f"Class query error: {str(e)}"}
+
+    async def iter_class(self, class_name: str, query_filter: Optional[str] = None,
+                         properties: Optional[Sequence[str]] = None, rsp_prop_include: Optional[str] = None,
+                         page_size: int = DEFAULT_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate every object of a class one page at a time; see iter_query()"""
+        async for obj in self.iter_query(f"class/{class_name}", {"order-by": f"{class_name}.dn"},
+                                         query_filter, properties, rsp_prop_include, page_size):
+            yield obj
+    
+    async def iter_subtree(self, dn: str, classes: List[str], query_filter: Optional[str] = None,
+                           properties: Optional[Sequence[str]] = None, rsp_prop_include: Optional[str] = None,
+                           page_size: int = DEFAULT_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate the given classes under a DN one page at a time; see iter_query()"""
+        # Pages are only consistent if the APIC sorts the whole result the same way each time
+        params = {
+            "query-target": "subtree",
+            "target-subtree-class": ",".join(classes),
+            "order-by": ",".join(f"{class_name}.dn" for class_name in classes)
+        }
+        async for obj in self.iter_query(f"mo/{dn}", params, query_filter, properties, rsp_prop_include, page_size):
+            yield obj
+    
+    async def iter_query(self, path: str, params: Optional[Dict[str, str]] = None, query_filter: Optional[str] = None,
+                         properties: Optional[Sequence[str]] = None, rsp_prop_include: Optional[str] = None,
+                         page_size: int = DEFAULT_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {"class", "attributes"} records of a class or MO query, requesting one page at a time.
+
+        ``query_filter`` and ``rsp_prop_include`` (e.g. "naming-only" or
+        "config-only") are applied by the APIC. ``properties`` keeps only
+        the named attributes of each record, page by page, since the
+        APIC has no per-attribute selector. Only one page is held in
+        memory at a time. Raises if a page cannot be fetched.
+        """
+        params = dict(params or {})
+        if query_filter:
+            params["query-target-filter"] = query_filter
+        if rsp_prop_include:
+            params["rsp-prop-include"] = rsp_prop_include
+        params["page-size"] = str(page_size)
+        
+        page = 0
+        while True:
+            params["page"] = str(page)
+            response = await self._request("GET", f"{self.base_url}/{path}.json", params=params, timeout=60)
+            if response.status_code != 200:
+                raise Exception(f"Query of {path} failed on page {page}: {response.status_code} - {_apic_error_text(response)}")
+            
+            data = response.json()
+            objects = _imdata_objects(data)
+            for obj in objects:
+                if properties is not None:
+                    obj["attributes"] = {key: obj["attributes"].get(key) for key in properties}
+                yield obj
+            
+            # totalCount is the size of the whole result, not of this page
+            page += 1
+            if len(objects) < page_size or page * page_size >= int(data.get("totalCount", page * page_size + 1)):
+                return
+
+def _imdata_objects(response) -> List[Dict[str, Any]]:
+    """Flatten an imdata response (or its decoded body) into {"class", "attributes"} records"""
+    data = response if isinstance(response, dict) else response.json()
+    objects = []
+    for mo in data.get("imdata", []):
+        for class_name, body in mo.items():
+            objects.append({"class": class_name, "attributes": body.get("attributes", {})})
+    return objects
+
+def _is_token_error(response) -> bool:
+    """Whether a 401/403 response means the session token is no longer valid"""
+    if response.status_code == 401:
+        return True
+    return "token" in _apic_error_text(response).lower()
+
+def _apic_error_text(response) -> str:
+    """Extract the APIC error text from a failed response"""
+    try:
+        for mo in response.json().get("imdata", []):
+            if "error" in mo:
+                return mo["error"]["attributes"].get("text", response.text)
+    except ValueError:
+        pass
+    return response.text
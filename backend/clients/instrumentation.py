@@ -0,0 +1,63 @@
+"""
+Per-request instrumentation hook for the APIC and NDO clients
+"""
+
+import re
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, List, Optional
+from urllib.parse import urlsplit
+
+# Provisioning job the current task is working for; asyncio tasks inherit it
+current_job_id: ContextVar[Optional[int]] = ContextVar("current_job_id", default=None)
+
+# Longest error response body kept with an API call record
+MAX_ERROR_BODY = 2048
+
+_recorders: List[Callable[..., None]] = []
+
+# Named APIC RNs (tn-prod, BD-web, subnet-[10.0.0.1/24]) and NDO object ids
+_NAMED_RN = re.compile(r"(?<=/)([A-Za-z]+)-(\[[^\]]*\]|[^/]+)")
+_NDO_ID_SEGMENT = re.compile(r"/(schemas|templates|deployments)/[^/]+")
+
+def add_api_call_recorder(recorder: Callable[..., None]):
+    """Install a function that receives every API call record"""
+    if recorder not in _recorders:
+        _recorders.append(recorder)
+
+def endpoint_template(url: str) -> str:
+    """Collapse object names in a URL path so calls group by endpoint.
+
+    ``/api/mo/uni/tn-prod/BD-web.json`` becomes ``/api/mo/uni/tn-*/BD-*.json``
+    and ``/mso/api/v1/schemas/5f3a.../templates/t1/vrfs`` becomes
+    ``/mso/api/v1/schemas/*/templates/*/vrfs``.
+    """
+    path = urlsplit(url).path
+    suffix = ".json" if path.endswith(".json") else ""
+    path = path[:len(path) - len(suffix)]
+    path = _NAMED_RN.sub(r"\1-*", path)
+    path = _NDO_ID_SEGMENT.sub(r"/\1/*", path)
+    return path + suffix
+
+def record_api_call(host: str, method: str, url: str, status_code: Optional[int], latency: float,
+                    request_bytes: int, response_bytes: int, error_body: Optional[str] = None):
+    """Hand one request to every installed recorder; never raises"""
+    if not _recorders:
+        return
+    record = dict(
+        job_id=current_job_id.get(),
+        host=host,
+        endpoint=endpoint_template(url),
+        method=method,
+        status_code=status_code,
+        latency_ms=round(latency * 1000, 3),
+        request_bytes=request_bytes,
+        response_bytes=response_bytes,
+        response_data=error_body[:MAX_ERROR_BODY] if error_body else None,
+        timestamp=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    )
+    for recorder in _recorders:
+        try:
+            recorder(**record)
+        except Exception:
+            pass
@@ -2,13 +2,60 @@
 NDO (Nexus Dashboard Orchestrator) REST API Client
 """
 
-import requests
 import json
-import urllib3
 from typing import Dict, Any, Optional, List
 import asyncio
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .transport import create_async_client
+from .throttle import get_host_throttle, send_with_retry
+
+def template_ref(template_name: str, kind: str, name: str, schema_id: Optional[str] = None) -> Dict[str, Any]:
+    """Reference to a VRF/BD/ANP/EPG in a template; schemaId is left out for the schema being created"""
+    ref = {"templateName": template_name, f"{kind}Name": name}
+    if schema_id:
+        ref["schemaId"] = schema_id
+    return ref
+
+def build_template_vrf(vrf_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an NDO template VRF"""
+    return {
+        "name": vrf_config["name"],
+        "displayName": vrf_config["name"],
+        "description": vrf_config.get("description") or "",
+        "vzAnyEnabled": vrf_config.get("vzany_enabled", False),
+        "preferredGroup": vrf_config.get("preferred_group", False)
+    }
+
+def build_template_bd(bd_config: Dict[str, Any], template_name: str, schema_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build an NDO template bridge domain"""
+    return {
+        "name": bd_config["name"],
+        "displayName": bd_config["name"],
+        "description": bd_config.get("description") or "",
+        "vrfRef": template_ref(template_name, "vrf", bd_config["vrf"], schema_id),
+        "subnets": [{"ip": ip, "scope": "private", "shared": False} for ip in bd_config.get("subnets", [])],
+        "l2Stretch": bd_config.get("l2_stretch", True),
+        "intersiteBumTrafficAllow": bd_config.get("intersite_bum_traffic", False),
+        "l2UnknownUnicast": "proxy"
+    }
+
+def build_template_epg(epg_config: Dict[str, Any], template_name: str, schema_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build an NDO template EPG"""
+    return {
+        "name": epg_config["name"],
+        "displayName": epg_config["name"],
+        "description": epg_config.get("description") or "",
+        "bdRef": template_ref(template_name, "bd", epg_config["bd"], schema_id)
+    }
+
+def build_template_anp(anp_config: Dict[str, Any], template_name: str, schema_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build an NDO template application profile with its EPGs"""
+    return {
+        "name": anp_config["name"],
+        "displayName": anp_config["name"],
+        "description": anp_config.get("description") or "",
+        "epgs": [build_template_epg(epg, template_name, schema_id) for epg in anp_config.get("epgs", [])]
+    }
 
 class NDOClient:
     """NDO REST API client for multi-site orchestration"""
@@ -20,14 +67,12 @@ class NDOClient:
         self.port = port
         self.verify_ssl = verify_ssl
         self.base_url = f"https://{host}:{port}/mso/api/v1"
-        self.session = requests.Session()
-        self.session.verify = verify_ssl
+        self.session = create_async_client(verify_ssl)
         self.token = None
-        
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
+    
+    async def _request(self, method: str, url: str, **kwargs):
+        """Send one request through the per-host rate limiter, with retries"""
+        return await send_with_retry(get_host_throttle(self.host), self.session, method, url, **kwargs)
     
     async def authenticate(self) -> Dict[str, Any]:
         """Authenticate with NDO and get session token"""
@@ -37,9 +82,10 @@ class NDOClient:
                 "password": self.password
             }
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/auth/login",
-                data=json.dumps(auth_payload),
+                content=json.dumps(auth_payload),
                 timeout=30
             )
             
@@ -62,7 +108,8 @@ class NDOClient:
     async def test_connectivity(self) -> Dict[str, Any]:
         """Test connectivity to NDO"""
         try:
-            response = self.session.get(
+            response = await self._request(
+                "GET",
                 f"{self.base_url}/platform/health",
                 timeout=10
             )
@@ -75,17 +122,21 @@ class NDOClient:
         except Exception as e:
             return {"success": False, "error": f"Connectivity error: {str(e)}"}
     
-    async def get_sites(self) -> Dict[str, Any]:
-        """Get list of sites managed by NDO"""
+    async def get_sites(self, etag: Optional[str] = None) -> Dict[str, Any]:
+        """Get list of sites managed by NDO; with ``etag``, not_modified is True if they have not changed"""
         try:
-            response = self.session.get(
+            response = await self._request(
+                "GET",
                 f"{self.base_url}/sites",
+                headers={"If-None-Match": etag} if etag else None,
                 timeout=30
             )
             
-            if response.status_code == 200:
+            if response.status_code == 304:
+                return {"success": True, "not_modified": True, "etag": etag}
+            elif response.status_code == 200:
                 sites_data = response.json()
-                return {"success": True, "sites": sites_data.get("sites", [])}
+                return {"success": True, "not_modified": False, "sites": sites_data.get("sites", []), "etag": response.headers.get("etag")}
             else:
                 return {"success": False, "error": f"Failed to get sites: {response.status_code} - {response.text}"}
                 
@@ -117,9 +168,10 @@ class NDOClient:
                 }
                 schema_payload["templates"].append(template_payload)
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/schemas",
-                data=json.dumps(schema_payload),
+                content=json.dumps(schema_payload),
                 timeout=30
             )
             
@@ -132,6 +184,89 @@ class NDOClient:
         except Exception as e:
             return {"success": False, "error": f"Schema creation error: {str(e)}"}
     
+    async def list_schemas(self) -> Dict[str, Any]:
+        """List every schema's id, name, templates and update version without the schema bodies"""
+        try:
+            response = await self._request(
+                "GET",
+                f"{self.base_url}/schemas/list-identity",
+                timeout=30
+            )
+            
+            if response.status_code == 200:
+                return {"success": True, "schemas": response.json().get("schemas", [])}
+            else:
+                return {"success": False, "error": f"Failed to list schemas: {response.status_code} - {response.text}"}
+                
+        except Exception as e:
+            return {"success": False, "error": f"Schema list error: {str(e)}"}
+    
+    async def find_schema(self, name: str) -> Dict[str, Any]:
+        """Look up a schema id by display name; schema_id is None if there is none"""
+        result = await self.list_schemas()
+        if not result["success"]:
+            return result
+        for schema in result["schemas"]:
+            if schema.get("displayName") == name:
+                return {"success": True, "schema_id": schema.get("id")}
+        return {"success": True, "schema_id": None}
+    
+    async def get_schema(self, schema_id: str, etag: Optional[str] = None) -> Dict[str, Any]:
+        """Get a whole schema document; with ``etag``, not_modified is True if it has not changed"""
+        try:
+            response = await self._request(
+                "GET",
+                f"{self.base_url}/schemas/{schema_id}",
+                headers={"If-None-Match": etag} if etag else None,
+                timeout=30
+            )
+            
+            if response.status_code == 304:
+                return {"success": True, "not_modified": True, "etag": etag}
+            elif response.status_code == 200:
+                return {"success": True, "not_modified": False, "schema": response.json(), "etag": response.headers.get("etag")}
+            else:
+                return {"success": False, "error": f"Failed to get schema: {response.status_code} - {response.text}"}
+                
+        except Exception as e:
+            return {"success": False, "error": f"Schema query error: {str(e)}"}
+    
+    async def post_schema(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a schema from a complete document, templates and objects included"""
+        try:
+            response = await self._request(
+                "POST",
+                f"{self.base_url}/schemas",
+                content=json.dumps(document),
+                timeout=120
+            )
+            
+            if response.status_code in [200, 201]:
+                return {"success": True, "schema_id": response.json().get("id"), "message": f"Schema '{document['displayName']}' created successfully"}
+            else:
+                return {"success": False, "error": f"Failed to create schema: {response.status_code} - {response.text}"}
+                
+        except Exception as e:
+            return {"success": False, "error": f"Schema creation error: {str(e)}"}
+    
+    async def patch_schema(self, schema_id: str, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply a batch of JSON-Patch operations to a schema in one request"""
+        try:
+            response = await self._request(
+                "PATCH",
+                f"{self.base_url}/schemas/{schema_id}",
+                content=json.dumps(operations),
+                timeout=120
+            )
+            
+            if response.status_code in [200, 201, 204]:
+                return {"success": True, "message": f"{len(operations)} schema changes applied"}
+            else:
+                return {"success": False, "error": f"Failed to patch schema: {response.status_code} - {response.text}"}
+                
+        except Exception as e:
+            return {"success": False, "error": f"Schema patch error: {str(e)}"}
+    
     async def deploy_template(self, schema_id: str, template_name: str, sites: List[str]) -> Dict[str, Any]:
         """Deploy a template to specified sites"""
         try:
@@ -141,9 +276,10 @@ class NDOClient:
                 "sites": sites
             }
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/schemas/{schema_id}/templates/{template_name}/deploy",
-                data=json.dumps(deploy_payload),
+                content=json.dumps(deploy_payload),
                 timeout=60
             )
             
@@ -159,7 +295,8 @@ class NDOClient:
     async def get_deployment_status(self, deployment_id: str) -> Dict[str, Any]:
         """Get deployment status"""
         try:
-            response = self.session.get(
+            response = await self._request(
+                "GET",
                 f"{self.base_url}/deployments/{deployment_id}",
                 timeout=30
             )
@@ -182,9 +319,10 @@ class NDOClient:
                 "description": tenant_config.get("description", "")
             }
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/schemas/{schema_id}/templates/{template_name}/tenants",
-                data=json.dumps(tenant_payload),
+                content=json.dumps(tenant_payload),
                 timeout=30
             )
             
@@ -199,17 +337,12 @@ class NDOClient:
     async def create_vrf_in_template(self, schema_id: str, template_name: str, vrf_config: Dict[str, Any]) -> Dict[str, Any]:
         """Create a VRF in a schema template"""
         try:
-            vrf_payload = {
-                "name": vrf_config["name"],
-                "displayName": vrf_config["name"],
-                "description": vrf_config.get("description", ""),
-                "vzAnyEnabled": vrf_config.get("vzany_enabled", False),
-                "preferredGroup": vrf_config.get("preferred_group", False)
-            }
+            vrf_payload = build_template_vrf(vrf_config)
             
-            response = self.session.post(
+            response = await self._request(
+                "POST",
                 f"{self.base_url}/schemas/{schema_id}/templates/{template_name}/vrfs",
-                data=json.dumps(vrf_payload),
+                content=json.dumps(vrf_payload),
                 timeout=30
             )
             
@@ -0,0 +1,134 @@
+"""
+Process-wide cache of authenticated APIC and NDO sessions
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Tuple
+
+from .apic_client import APICClient
+from .ndo_client import NDOClient
+
+SessionKey = Tuple[int, str, int, str]
+
+class APICSessionManager:
+    """Shares one authenticated APICClient per (host, port, username).
+
+    Jobs and validations against the same fabric reuse the cached session
+    instead of running aaaLogin each time; the client itself refreshes the
+    token before it expires and logs in again if the APIC rejects it.
+    Concurrent callers for the same key wait on a single login. Sessions
+    are kept per event loop because the underlying connections are.
+    """
+
+    def __init__(self):
+        self._clients: Dict[SessionKey, APICClient] = {}
+        self._locks: Dict[SessionKey, asyncio.Lock] = {}
+
+    async def get_client(self, host: str, username: str, password: str,
+                         port: int = 443, verify_ssl: bool = False) -> Dict[str, Any]:
+        """Return an authenticated client, logging in only when needed"""
+        key = (id(asyncio.get_running_loop()), host, port, username)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            client = self._clients.get(key)
+            if client is not None and (client.password != password or client.verify_ssl != verify_ssl):
+                # Credentials changed; the old session must not be reused
+                del self._clients[key]
+                client = None
+
+            if client is not None and client.token is not None:
+                return {"success": True, "client": client}
+
+            client = APICClient(host=host, username=username, password=password,
+                                port=port, verify_ssl=verify_ssl)
+            auth_result = await client.authenticate()
+            if not auth_result["success"]:
+                return {"success": False, "error": auth_result["error"]}
+
+            self._clients[key] = client
+            return {"success": True, "client": client}
+
+    def close(self):
+        """Drop every cached session for the running event loop.
+
+        Clients share the pooled transport, which is closed separately by
+        close_shared_transports(), so nothing is closed here.
+        """
+        loop_id = id(asyncio.get_running_loop())
+        for key in [key for key in self._clients if key[0] == loop_id]:
+            del self._clients[key]
+            self._locks.pop(key, None)
+
+# NDOClient does not refresh its token, so a session is only reused for
+# this long, well inside the lifetime of an NDO login token
+NDO_SESSION_TTL = 300.0
+
+class NDOSessionManager:
+    """Shares one authenticated NDOClient per (host, port, username).
+
+    Works like APICSessionManager, but since NDOClient cannot refresh its
+    own token, a session older than NDO_SESSION_TTL is replaced by a new
+    login, as is one whose last request was rejected (see ``discard``).
+    """
+
+    def __init__(self, ttl: float = NDO_SESSION_TTL):
+        self.ttl = ttl
+        self._clients: Dict[SessionKey, Tuple[NDOClient, float]] = {}
+        self._locks: Dict[SessionKey, asyncio.Lock] = {}
+
+    async def get_client(self, host: str, username: str, password: str,
+                         port: int = 443, verify_ssl: bool = False) -> Dict[str, Any]:
+        """Return an authenticated client, logging in only when needed"""
+        key = (id(asyncio.get_running_loop()), host, port, username)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            client, logged_in_at = self._clients.get(key, (None, 0.0))
+            if client is not None and (client.password != password or client.verify_ssl != verify_ssl
+                                       or time.monotonic() - logged_in_at >= self.ttl):
+                del self._clients[key]
+                client = None
+
+            if client is not None:
+                return {"success": True, "client": client}
+
+            client = NDOClient(host=host, username=username, password=password,
+                               port=port, verify_ssl=verify_ssl)
+            auth_result = await client.authenticate()
+            if not auth_result["success"]:
+                return {"success": False, "error": auth_result["error"]}
+
+            self._clients[key] = (client, time.monotonic())
+            return {"success": True, "client": client}
+
+    def discard(self, client: NDOClient):
+        """Forget a client's session, e.g. after the NDO rejected its token"""
+        for key, (cached, _) in list(self._clients.items()):
+            if cached is client:
+                del self._clients[key]
+
+    def close(self):
+        """Drop every cached session for the running event loop"""
+        loop_id = id(asyncio.get_running_loop())
+        for key in [key for key in self._clients if key[0] == loop_id]:
+            del self._clients[key]
+            self._locks.pop(key, None)
+
+_manager_instance = None
+_ndo_manager_instance = None
+
+def get_session_manager() -> APICSessionManager:
+    """Get singleton APIC session manager instance"""
+    global _manager_instance
+    if _manager_instance is None:
+        _manager_instance = APICSessionManager()
+    return _manager_instance
+
+def get_ndo_session_manager() -> NDOSessionManager:
+    """Get singleton NDO session manager instance"""
+    global _ndo_manager_instance
+    if _ndo_manager_instance is None:
+        _ndo_manager_instance = NDOSessionManager()
+    return _ndo_manager_instance
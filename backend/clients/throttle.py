@@ -0,0 +1,222 @@
+"""
+Per-controller rate limiting, adaptive concurrency and retries
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from .instrumentation import record_api_call
+
+# Token bucket shared by every client talking to the same controller host
+DEFAULT_RATE = 200.0  # Requests per second
+DEFAULT_BURST = 400
+
+# Adaptive concurrency (AIMD): grow the in-flight limit by one per window of
+# fast responses, cut it when latency climbs past LATENCY_TOLERANCE times
+# the best latency seen, or when the controller pushes back.
+INITIAL_CONCURRENCY = 16
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 64
+LATENCY_TOLERANCE = 2.0
+DECREASE_FACTOR = 0.7
+BASELINE_DECAY = 0.01
+
+RETRY_STATUSES = {429, 502, 503, 504}
+# POST and PATCH are not idempotent, so after a transport error they are only
+# retried when the request cannot have reached the controller
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, up to ``burst`` saved"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns the wait"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+class HostThrottle:
+    """Rate limit, concurrency limit and retry statistics for one controller.
+
+    With ``adaptive`` set, the number of requests allowed in flight shrinks
+    when latency rises well above the best observed latency or the
+    controller answers 429/503, and recovers slowly while responses stay
+    fast. Without it the limit stays at ``MAX_CONCURRENCY``.
+    """
+
+    def __init__(self, host: str, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST, adaptive: bool = True):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst)
+        self.adaptive = adaptive
+        self.limit = float(INITIAL_CONCURRENCY if adaptive else MAX_CONCURRENCY)
+        self.baseline: Optional[float] = None
+        self.in_flight = 0
+        self._slot_freed: Optional[asyncio.Condition] = None
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "rate_limited_seconds": 0.0, "backoffs": 0}
+
+    @property
+    def slot_freed(self) -> asyncio.Condition:
+        if self._slot_freed is None:
+            self._slot_freed = asyncio.Condition()
+        return self._slot_freed
+
+    async def acquire(self):
+        """Wait for a rate-limit token and a free concurrency slot"""
+        self.stats["rate_limited_seconds"] += await self.bucket.acquire()
+        async with self.slot_freed:
+            await self.slot_freed.wait_for(lambda: self.in_flight < max(MIN_CONCURRENCY, int(self.limit)))
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float], overloaded: bool = False):
+        """Free a slot and feed the response latency to the adaptive limit"""
+        if self.adaptive:
+            if overloaded:
+                self._decrease()
+            elif latency is not None:
+                self._observe(latency)
+        async with self.slot_freed:
+            self.in_flight -= 1
+            self.slot_freed.notify_all()
+
+    def _observe(self, latency: float):
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            # Let the baseline drift up so a permanently slower controller
+            # is not treated as overloaded forever
+            self.baseline += (latency - self.baseline) * BASELINE_DECAY
+
+        if latency > self.baseline * LATENCY_TOLERANCE:
+            self._decrease()
+        else:
+            self.limit = min(MAX_CONCURRENCY, self.limit + 1 / self.limit)
+
+    def _decrease(self):
+        self.stats["backoffs"] += 1
+        self.limit = max(MIN_CONCURRENCY, self.limit * DECREASE_FACTOR)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "adaptive": self.adaptive,
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "baseline_latency_ms": round(self.baseline * 1000, 1) if self.baseline is not None else None,
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()}
+        }
+
+_throttles: Dict[Tuple[int, str], HostThrottle] = {}
+_throttles_lock = threading.Lock()
+
+def get_host_throttle(host: str) -> HostThrottle:
+    """Get the throttle shared by all clients of ``host`` on this event loop"""
+    key = (id(asyncio.get_running_loop()), host)
+    with _throttles_lock:
+        throttle = _throttles.get(key)
+        if throttle is None:
+            throttle = HostThrottle(host)
+            _throttles[key] = throttle
+        return throttle
+
+def configure_host_throttle(host: str, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                            adaptive: bool = True) -> HostThrottle:
+    """Replace the throttle for ``host`` on this event loop with new settings"""
+    throttle = HostThrottle(host, rate=rate, burst=burst, adaptive=adaptive)
+    with _throttles_lock:
+        _throttles[(id(asyncio.get_running_loop()), host)] = throttle
+    return throttle
+
+def throttle_metrics() -> list:
+    """Metrics for every controller host seen so far"""
+    with _throttles_lock:
+        return [throttle.metrics() for throttle in _throttles.values()]
+
+def backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Full-jitter exponential backoff, honouring a Retry-After header"""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(BACKOFF_MAX, float(retry_after))
+            except ValueError:
+                pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+async def send_with_retry(throttle: HostThrottle, session: httpx.AsyncClient, method: str, url: str,
+                          max_retries: int = MAX_RETRIES, **kwargs) -> httpx.Response:
+    """Send a request through the host throttle, retrying transient failures.
+
+    429/502/503/504 responses are retried with jittered exponential
+    backoff, as are transport errors (refused, reset, timed out) for
+    idempotent methods. A POST or PATCH is retried after a transport error
+    only if it was never sent: the connection failed or no pooled
+    connection was free. A read timeout or dropped connection may come
+    after the controller applied the change, so that error is raised. The
+    last response is returned, or the last transport error raised, once
+    the retries are used up. Every attempt is passed to record_api_call().
+    """
+    content = kwargs.get("content")
+    request_bytes = len(content) if content else 0
+    retry_errors = httpx.TransportError if method.upper() in IDEMPOTENT_METHODS else UNSENT_ERRORS
+    attempt = 0
+    while True:
+        await throttle.acquire()
+        throttle.stats["requests"] += 1
+        started = time.monotonic()
+        response = None
+        try:
+            response = await session.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            await throttle.release(None, overloaded=True)
+            record_api_call(throttle.host, method, url, None, time.monotonic() - started, request_bytes, 0, repr(e))
+            if attempt >= max_retries or not isinstance(e, retry_errors):
+                throttle.stats["failures"] += 1
+                raise
+        except BaseException:
+            # Cancelled or failed outside the transport; just give the slot back
+            await throttle.release(None)
+            raise
+        else:
+            latency = time.monotonic() - started
+            retryable = response.status_code in RETRY_STATUSES
+            await throttle.release(latency, overloaded=retryable)
+            record_api_call(
+                throttle.host, method, url, response.status_code, latency, request_bytes, len(response.content),
+                response.text if response.status_code >= 400 else None
+            )
+            if not retryable:
+                return response
+            if attempt >= max_retries:
+                throttle.stats["failures"] += 1
+                return response
+
+        throttle.stats["retries"] += 1
+        await asyncio.sleep(backoff_delay(attempt, response))
+        attempt += 1
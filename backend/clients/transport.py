@@ -0,0 +1,63 @@
+"""
+Shared async HTTP transport for the APIC and NDO clients
+"""
+
+import asyncio
+import threading
+from typing import Dict, Tuple
+
+import httpx
+
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+
+_transports: Dict[Tuple[int, bool], httpx.AsyncHTTPTransport] = {}
+_transports_lock = threading.Lock()
+
+def _build_transport(verify_ssl: bool) -> httpx.AsyncHTTPTransport:
+    return httpx.AsyncHTTPTransport(
+        verify=verify_ssl,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+    )
+
+def get_shared_transport(verify_ssl: bool = False) -> httpx.AsyncHTTPTransport:
+    """Get the process-wide pooled transport for the running event loop.
+
+    Every client built on the same loop shares one connection pool with
+    keep-alive, while keeping its own cookies and auth headers.
+    """
+    try:
+        key = (id(asyncio.get_running_loop()), verify_ssl)
+    except RuntimeError:
+        return _build_transport(verify_ssl)
+    
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = _build_transport(verify_ssl)
+            _transports[key] = transport
+        return transport
+
+def create_async_client(verify_ssl: bool = False) -> httpx.AsyncClient:
+    """Create an AsyncClient bound to the shared transport"""
+    return httpx.AsyncClient(
+        transport=get_shared_transport(verify_ssl),
+        headers={
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+    )
+
+async def close_shared_transports():
+    """Close the pooled transports owned by the running event loop"""
+    loop_id = id(asyncio.get_running_loop())
+    with _transports_lock:
+        keys = [key for key in _transports if key[0] == loop_id]
+        transports = [_transports.pop(key) for key in keys]
+    for transport in transports:
+        await transport.aclose()
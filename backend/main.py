@@ -4,14 +4,19 @@ FastAPI Backend for ACI Provisioning Tool
 
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import sys
 from pathlib import Path
 
 from .routes import provisioning, status
-from .models.database import init_database
+from .models.database import init_database, get_database
+from .clients.transport import close_shared_transports
+from .clients.session_manager import get_session_manager, get_ndo_session_manager
+from .services.log_writer import get_log_writer
+from .services.job_queue import get_job_queue
+from .services.metrics import registry as metrics_registry
 
 app = FastAPI(
     title="ACI Provisioning Tool",
@@ -27,6 +32,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def ensure_job_queue(request, call_next):
+    """Start the job queue on first request; the packaged app runs without lifespan events"""
+    await get_job_queue().ensure_started()
+    return await call_next(request)
+
 app.include_router(provisioning.router, prefix="/api/provisioning", tags=["provisioning"])
 app.include_router(status.router, prefix="/api/status", tags=["status"])
 
@@ -65,6 +76,11 @@ async def serve_vite_svg():
     else:
         raise HTTPException(status_code=404, detail="Favicon not found")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Serve in-process metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -74,9 +90,16 @@ async def health_check():
 async def startup_event():
     """Initialize database and other startup tasks"""
     init_database()
+    await get_job_queue().ensure_started()
     print("ACI Provisioning Tool backend started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup tasks on shutdown"""
+    await get_job_queue().stop()
+    get_session_manager().close()
+    get_ndo_session_manager().close()
+    await close_shared_transports()
+    get_log_writer().stop()
+    get_database().close()
     print("ACI Provisioning Tool backend shutting down")
@@ -15,6 +15,12 @@ class SiteCode(str, Enum):
     AUSTH = "AUSTH"  # Southern DC
     AUTER = "AUTER"  # Tertiary DC
 
+class ExecutionMode(str, Enum):
+    SEQUENTIAL = "sequential"  # One POST per object
+    BULK = "bulk"  # Nested tenant trees posted as polUni documents
+    PARALLEL = "parallel"  # Dependency-ordered concurrent POSTs
+    DIFF = "diff"  # Only push objects missing from or different on the fabric
+
 class APICCredentials(BaseModel):
     host: str = Field(..., description="APIC IP address or hostname")
     username: str = Field(..., description="APIC username")
@@ -51,25 +57,49 @@ class EPGConfig(BaseModel):
     bridge_domain: str = Field(..., description="Associated bridge domain")
     description: Optional[str] = Field(None, description="EPG description")
 
+class SiteTarget(BaseModel):
+    site_code: SiteCode = Field(..., description="Site code")
+    apic_credentials: APICCredentials = Field(..., description="APIC connection details for this site")
+
+class FabricTemplate(BaseModel):
+    tenants: List[TenantConfig] = Field(default_factory=list, description="Tenants to create")
+    vrfs: List[VRFConfig] = Field(default_factory=list, description="VRFs to create")
+    bridge_domains: List[BridgeDomainConfig] = Field(default_factory=list, description="Bridge domains to create")
+    app_profiles: List[ApplicationProfileConfig] = Field(default_factory=list, description="Application profiles to create")
+    epgs: List[EPGConfig] = Field(default_factory=list, description="EPGs to create")
+
+class TemplateExpansion(BaseModel):
+    template: Dict[str, Any] = Field(..., description="Parametrized template (variables, per-site and per-fabric-type variables, object specs with for_each)")
+    parameters: Dict[str, Any] = Field(default_factory=dict, description="Variable values that override the template's")
+
 class FabricConfig(BaseModel):
     site_code: SiteCode = Field(..., description="Site code")
     fabric_type: FabricType = Field(..., description="Fabric type (IT/OT)")
     apic_credentials: APICCredentials = Field(..., description="APIC connection details")
+    execution_mode: ExecutionMode = Field(default=ExecutionMode.SEQUENTIAL, description="How objects are pushed to the APIC")
+    max_concurrency: int = Field(default=8, ge=1, le=64, description="Maximum concurrent APIC requests in parallel mode")
+    sites: List[SiteTarget] = Field(default_factory=list, description="Additional sites that receive the same objects concurrently")
     
     tenants: List[TenantConfig] = Field(default_factory=list, description="Tenants to create")
     vrfs: List[VRFConfig] = Field(default_factory=list, description="VRFs to create")
     bridge_domains: List[BridgeDomainConfig] = Field(default_factory=list, description="Bridge domains to create")
     app_profiles: List[ApplicationProfileConfig] = Field(default_factory=list, description="Application profiles to create")
     epgs: List[EPGConfig] = Field(default_factory=list, description="EPGs to create")
+    expansion: Optional[TemplateExpansion] = Field(None, description="Parametrized template whose objects are generated as the job runs")
 
 class ProvisioningJob(BaseModel):
     id: Optional[int] = Field(None, description="Job ID")
     name: str = Field(..., description="Job name")
     template_id: Optional[int] = Field(None, description="Template ID")
+    parameters: Dict[str, Any] = Field(default_factory=dict, description="Variable values for a parametrized template")
     fabric_config: FabricConfig = Field(..., description="Fabric configuration")
     status: str = Field(default="pending", description="Job status")
     progress: int = Field(default=0, description="Progress percentage")
     
+class TemplateUpdate(BaseModel):
+    config: Dict[str, Any] = Field(..., description="Template configuration")
+    description: Optional[str] = Field(None, description="New template description; unchanged if omitted")
+
 class TaskLog(BaseModel):
     id: Optional[int] = Field(None, description="Log ID")
     job_id: int = Field(..., description="Job ID")
@@ -5,88 +5,309 @@ Database models and initialization
 import sqlite3
 import os
 import json
+import queue
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 import threading
+import sys
+
+# Bundled template files, and the template type each one holds
+TEMPLATE_FILES = {
+    "fabric_templates.json": "fabric",
+    "ndo_templates.json": "ndo",
+    "parametrized_templates.json": "parametrized"
+}
+
+def get_templates_path() -> str:
+    """Get path to the bundled template files"""
+    if getattr(sys, 'frozen', False):
+        return os.path.join(sys._MEIPASS, 'templates')
+    else:
+        return os.path.join(os.path.dirname(__file__), '..', '..', 'templates')
+
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+# WAL lets readers run alongside the writer, and synchronous=NORMAL only
+# fsyncs at checkpoints instead of on every commit.
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000"
+]
+
+# Running counters behind /api/status/stats. Triggers keep them in step
+# with every insert, status change and delete in the same transaction as
+# the write itself; job creations are bucketed by hour ("YYYY-MM-DD HH").
+STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_job_insert AFTER INSERT ON provisioning_jobs
+    BEGIN
+        INSERT INTO stats_counters (name, bucket, value) VALUES ('jobs_status', COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (name, bucket) DO UPDATE SET value = value + 1;
+        INSERT INTO stats_counters (name, bucket, value) VALUES ('jobs_created', COALESCE(strftime('%Y-%m-%d %H', NEW.created_at), ''), 1)
+            ON CONFLICT (name, bucket) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_job_status AFTER UPDATE OF status ON provisioning_jobs
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'jobs_status' AND bucket = COALESCE(OLD.status, '');
+        INSERT INTO stats_counters (name, bucket, value) VALUES ('jobs_status', COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (name, bucket) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_job_delete AFTER DELETE ON provisioning_jobs
+    BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'jobs_status' AND bucket = COALESCE(OLD.status, '');
+        UPDATE stats_counters SET value = value - 1
+            WHERE name = 'jobs_created' AND bucket = COALESCE(strftime('%Y-%m-%d %H', OLD.created_at), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_api_log_insert AFTER INSERT ON api_logs
+    BEGIN
+        INSERT INTO stats_counters (name, bucket, value) VALUES ('api_calls', '', 1)
+            ON CONFLICT (name, bucket) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stats_api_log_delete AFTER DELETE ON api_logs
+    BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'api_calls' AND bucket = '';
+    END
+    """
+]
+
+# Recompute every counter from the underlying tables
+STATS_REBUILD = [
+    "DELETE FROM stats_counters",
+    """
+    INSERT INTO stats_counters (name, bucket, value)
+    SELECT 'jobs_status', COALESCE(status, ''), COUNT(*) FROM provisioning_jobs GROUP BY 2
+    """,
+    """
+    INSERT INTO stats_counters (name, bucket, value)
+    SELECT 'jobs_created', COALESCE(strftime('%Y-%m-%d %H', created_at), ''), COUNT(*) FROM provisioning_jobs GROUP BY 2
+    """,
+    "INSERT INTO stats_counters (name, bucket, value) SELECT 'api_calls', '', COUNT(*) FROM api_logs"
+]
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Append new entries; never edit or reorder ones that have shipped.
+MIGRATIONS = [
+    [
+        "CREATE INDEX IF NOT EXISTS idx_task_logs_job_timestamp ON task_logs (job_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_task_logs_timestamp ON task_logs (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_provisioning_jobs_created_at ON provisioning_jobs (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_provisioning_jobs_status ON provisioning_jobs (status)"
+    ],
+    [
+        # Per-site status and progress of multi-site jobs
+        "ALTER TABLE provisioning_jobs ADD COLUMN site_results JSON"
+    ],
+    [
+        # Per-request APIC/NDO call instrumentation
+        "ALTER TABLE api_logs ADD COLUMN host TEXT",
+        "ALTER TABLE api_logs ADD COLUMN latency_ms REAL",
+        "ALTER TABLE api_logs ADD COLUMN request_bytes INTEGER",
+        "ALTER TABLE api_logs ADD COLUMN response_bytes INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_api_logs_job_latency ON api_logs (job_id, latency_ms)",
+        "CREATE INDEX IF NOT EXISTS idx_api_logs_timestamp ON api_logs (timestamp)"
+    ],
+    [
+        # Precomputed statistics
+        """
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT NOT NULL,
+            bucket TEXT NOT NULL DEFAULT '',
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, bucket)
+        ) WITHOUT ROWID
+        """,
+        *STATS_TRIGGERS,
+        *STATS_REBUILD
+    ],
+    [
+        # NDO schema jobs share the queue; their fabric_config holds an NDOJobConfig
+        "ALTER TABLE provisioning_jobs ADD COLUMN job_type TEXT NOT NULL DEFAULT 'fabric'"
+    ]
+]
 
 class Database:
-    """Thread-safe SQLite database wrapper"""
+    """Thread-safe SQLite database wrapper with a connection pool"""
     
-    def __init__(self, db_path: str = "aci_provisioning.db"):
+    def __init__(self, db_path: str = "aci_provisioning.db", pool_size: int = POOL_SIZE):
         self.db_path = db_path
         self._lock = threading.RLock()
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=pool_size)
         self.init_tables()
     
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        """Open a new tuned database connection (prefer connection() for pooled access)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
         conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
     
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection; commits on success, rolls back on error.
+
+        Pooled connections keep their prepared statement cache between uses,
+        so hot queries are only compiled once per connection.
+        """
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self.get_connection()
+        
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def close(self):
+        """Close every idle pooled connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
     def init_tables(self):
         """Initialize database tables"""
-        with self._lock:
-            conn = self.get_connection()
+        with self._lock, self.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    type TEXT NOT NULL,
+                    description TEXT,
+                    config JSON NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS provisioning_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    template_id INTEGER,
+                    fabric_config JSON NOT NULL,
+                    status TEXT DEFAULT 'pending',
+                    progress INTEGER DEFAULT 0,
+                    started_at TIMESTAMP,
+                    completed_at TIMESTAMP,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (template_id) REFERENCES templates (id)
+                )
+            """)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS task_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id INTEGER NOT NULL,
+                    task_name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    message TEXT,
+                    details JSON,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (job_id) REFERENCES provisioning_jobs (id)
+                )
+            """)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS api_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id INTEGER,
+                    endpoint TEXT NOT NULL,
+                    method TEXT NOT NULL,
+                    request_data JSON,
+                    response_data JSON,
+                    status_code INTEGER,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (job_id) REFERENCES provisioning_jobs (id)
+                )
+            """)
+            
+            conn.commit()
+            self._migrate(conn)
+            self._insert_bundled_templates(conn)
+            self._insert_default_templates(conn)
+    
+    def _migrate(self, conn):
+        """Apply schema migrations the database has not seen yet.
+
+        Each step and its user_version bump share one transaction, so a
+        step that fails leaves the database at the previous version. The
+        version is read under the write lock, so two processes starting
+        together do not both apply a step.
+        """
+        isolation_level = conn.isolation_level
+        # Manage the transactions ourselves; sqlite3 would commit before DDL
+        conn.isolation_level = None
+        try:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = conn.execute("PRAGMA user_version").fetchone()[0]
+                    if version < len(MIGRATIONS):
+                        for statement in MIGRATIONS[version]:
+                            conn.execute(statement)
+                        conn.execute(f"PRAGMA user_version = {version + 1}")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                if version >= len(MIGRATIONS) - 1:
+                    break
+        finally:
+            conn.isolation_level = isolation_level
+
+    def reconcile_stats(self) -> Dict[str, int]:
+        """Rebuild the statistics counters from the jobs and API log tables"""
+        with self.connection() as conn:
+            for statement in STATS_REBUILD:
+                conn.execute(statement)
+            cursor = conn.execute("SELECT name, SUM(value) AS total FROM stats_counters GROUP BY name")
+            return {row["name"]: row["total"] for row in cursor.fetchall()}
+
+    def _insert_bundled_templates(self, conn):
+        """Insert the templates shipped in the templates directory"""
+        templates_path = get_templates_path()
+        for file_name, template_type in TEMPLATE_FILES.items():
             try:
+                with open(os.path.join(templates_path, file_name), encoding="utf-8") as f:
+                    templates = json.load(f)
+            except (OSError, ValueError):
+                continue
+            
+            for template in templates.values():
+                config = {key: value for key, value in template.items() if key not in ("name", "description")}
                 conn.execute("""
-                    CREATE TABLE IF NOT EXISTS templates (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL UNIQUE,
-                        type TEXT NOT NULL,
-                        description TEXT,
-                        config JSON NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS provisioning_jobs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL,
-                        template_id INTEGER,
-                        fabric_config JSON NOT NULL,
-                        status TEXT DEFAULT 'pending',
-                        progress INTEGER DEFAULT 0,
-                        started_at TIMESTAMP,
-                        completed_at TIMESTAMP,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (template_id) REFERENCES templates (id)
-                    )
-                """)
-                
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS task_logs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        job_id INTEGER NOT NULL,
-                        task_name TEXT NOT NULL,
-                        status TEXT NOT NULL,
-                        message TEXT,
-                        details JSON,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (job_id) REFERENCES provisioning_jobs (id)
-                    )
-                """)
-                
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS api_logs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        job_id INTEGER,
-                        endpoint TEXT NOT NULL,
-                        method TEXT NOT NULL,
-                        request_data JSON,
-                        response_data JSON,
-                        status_code INTEGER,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (job_id) REFERENCES provisioning_jobs (id)
-                    )
-                """)
-                
-                conn.commit()
-                self._insert_default_templates(conn)
-                
-            finally:
-                conn.close()
+                    INSERT OR IGNORE INTO templates (name, type, description, config)
+                    VALUES (?, ?, ?, ?)
+                """, (
+                    template["name"],
+                    template_type,
+                    template.get("description"),
+                    json.dumps(config)
+                ))
     
     def _insert_default_templates(self, conn):
         """Insert default configuration templates"""
@@ -155,6 +376,23 @@ def get_database() -> Database:
                 _db_instance = Database()
     return _db_instance
 
+def keyset_condition(conn, table: str, sort_column: str, after: Optional[int],
+                     descending: bool = False, alias: str = None) -> Tuple[str, tuple]:
+    """Build the WHERE fragment for the page after row ``after``.
+
+    Pages are ordered by (sort_column, id) so they line up with the
+    indexes; if the cursor row has been deleted, id order is used instead.
+    """
+    if after is None:
+        return "", ()
+    
+    prefix = f"{alias}." if alias else ""
+    op = "<" if descending else ">"
+    row = conn.execute(f"SELECT {sort_column} FROM {table} WHERE id = ?", (after,)).fetchone()
+    if row is None:
+        return f"{prefix}id {op} ?", (after,)
+    return f"({prefix}{sort_column}, {prefix}id) {op} (?, ?)", (row[0], after)
+
 def init_database():
     """Initialize the database"""
     get_database()
@@ -17,16 +17,55 @@ class SiteConfig(BaseModel):
     apic_host: str = Field(..., description="APIC host for this site")
     site_id: str = Field(..., description="Site ID")
 
+class TemplateVRF(BaseModel):
+    name: str = Field(..., description="VRF name")
+    description: Optional[str] = Field(None, description="VRF description")
+    vzany_enabled: bool = Field(default=False, description="Enable vzAny")
+    preferred_group: bool = Field(default=False, description="Enable the preferred group")
+
+class TemplateBD(BaseModel):
+    name: str = Field(..., description="Bridge domain name")
+    vrf: str = Field(..., description="VRF in the same template")
+    subnets: List[str] = Field(default_factory=list, description="Gateway subnets (e.g., 10.1.1.1/24)")
+    l2_stretch: bool = Field(default=True, description="Stretch the bridge domain across sites")
+    intersite_bum_traffic: bool = Field(default=False, description="Allow intersite BUM traffic")
+    description: Optional[str] = Field(None, description="Bridge domain description")
+
+class TemplateEPG(BaseModel):
+    name: str = Field(..., description="EPG name")
+    bd: str = Field(..., description="Bridge domain in the same template")
+    description: Optional[str] = Field(None, description="EPG description")
+
+class TemplateANP(BaseModel):
+    name: str = Field(..., description="Application profile name")
+    description: Optional[str] = Field(None, description="Application profile description")
+    epgs: List[TemplateEPG] = Field(default_factory=list, description="EPGs in this application profile")
+
 class SchemaTemplate(BaseModel):
     name: str = Field(..., description="Template name")
+    description: Optional[str] = Field(None, description="Template description")
     tenants: List[str] = Field(..., description="Associated tenants")
     sites: List[str] = Field(..., description="Deployed sites")
+    vrfs: List[TemplateVRF] = Field(default_factory=list, description="VRFs in this template")
+    bds: List[TemplateBD] = Field(default_factory=list, description="Bridge domains in this template")
+    anps: List[TemplateANP] = Field(default_factory=list, description="Application profiles in this template")
 
 class SchemaConfig(BaseModel):
     name: str = Field(..., description="Schema name")
+    description: Optional[str] = Field(None, description="Schema description")
     templates: List[SchemaTemplate] = Field(..., description="Schema templates")
 
 class NDOConfig(BaseModel):
     ndo_credentials: NDOCredentials = Field(..., description="NDO connection details")
     sites: List[SiteConfig] = Field(..., description="Sites to manage")
     schemas: List[SchemaConfig] = Field(..., description="Schemas to create")
+
+class NDOJobConfig(BaseModel):
+    ndo_credentials: NDOCredentials = Field(..., description="NDO connection details")
+    ndo_schema: Optional[SchemaConfig] = Field(None, description="Schema to apply; taken from the template if the job has a template_id")
+    deploy: bool = Field(default=True, description="Deploy every template to its sites once the schema is applied")
+
+class NDOJob(BaseModel):
+    name: str = Field(..., description="Job name")
+    template_id: Optional[int] = Field(None, description="ID of an NDO template whose schema the job applies")
+    ndo_config: NDOJobConfig = Field(..., description="NDO connection and schema")
@@ -2,83 +2,216 @@
 Provisioning API endpoints
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Callable, Iterator, Sequence
 import json
+import sqlite3
 from datetime import datetime
 
-from ..models.aci_models import ProvisioningJob, FabricConfig, TaskLog
-from ..models.database import get_database
+from ..models.aci_models import ProvisioningJob, FabricConfig, TaskLog, TemplateExpansion
+from ..models.ndo_models import NDOJob
+from ..models.database import get_database, keyset_condition
 from ..services.provisioning import ProvisioningService
+from ..services.events import job_events
+from ..services.job_queue import get_job_queue
+from ..services.templates import FABRIC_OBJECT_KINDS, get_template_registry
+from ..services.expansion import check_config_expansion
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 1000
+SSE_KEEPALIVE_SECONDS = 15
+STREAM_BATCH_SIZE = 500
+
+STREAM_FORMATS = "^(ndjson|array)$"
+STREAM_DESCRIPTION = "Stream rows as NDJSON or a chunked JSON array instead of one response body"
+
+def set_next_cursor(response: Response, rows: List[Dict[str, Any]], limit: Optional[int]):
+    """Advertise the cursor for the next page when this page is full"""
+    if limit and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+
+def stream_rows(query: Callable[[sqlite3.Connection], sqlite3.Cursor], fields: Sequence[str],
+                stream: str, raw_json: Sequence[str] = ("details",)) -> StreamingResponse:
+    """Stream query results row by row instead of building the whole list.
+
+    ``stream`` is "ndjson" (one object per line) or "array" (a JSON array
+    sent in chunks). Columns in ``raw_json`` already hold JSON text and are
+    written through verbatim rather than decoded and re-encoded. Page
+    cursors are not sent as a header; use the id of the last row instead.
+    """
+    db = get_database()
+    keys = [(field, json.dumps(field) + ": ", field in raw_json) for field in fields]
+    
+    def encode(row: sqlite3.Row) -> str:
+        return "{" + ", ".join(
+            key + ((row[field] or "null") if raw else json.dumps(row[field])) for field, key, raw in keys
+        ) + "}"
+    
+    def body() -> Iterator[str]:
+        with db.connection() as conn:
+            cursor = query(conn)
+            if stream == "ndjson":
+                while True:
+                    rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                    if not rows:
+                        return
+                    yield "".join(encode(row) + "\n" for row in rows)
+            
+            separator = "["
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                yield separator + ", ".join(encode(row) for row in rows)
+                separator = ", "
+            yield "[]" if separator == "[" else "]"
+    
+    media_type = "application/x-ndjson" if stream == "ndjson" else "application/json"
+    return StreamingResponse(body(), media_type=media_type)
+
 @router.post("/jobs", response_model=Dict[str, Any])
-async def create_provisioning_job(
-    job_data: ProvisioningJob,
-    background_tasks: BackgroundTasks
-):
-    """Create a new provisioning job"""
+async def create_provisioning_job(job_data: ProvisioningJob):
+    """Create a new provisioning job and queue it for execution.
+
+    With a ``template_id`` and no objects in ``fabric_config``, the job
+    provisions the template's objects, taken already validated from the
+    template registry. A parametrized template is stored with the job's
+    ``parameters`` and expanded while the job runs.
+    """
+    fabric_config = job_data.fabric_config
+    if job_data.template_id is not None:
+        template = get_template_registry().get(job_data.template_id)
+        if template is None:
+            raise HTTPException(status_code=404, detail="Template not found")
+        if template.type not in ("fabric", "parametrized") or template.compiled is None:
+            raise HTTPException(status_code=400, detail=f"Template '{template.name}' is not a valid fabric template")
+        if template.type == "parametrized":
+            if fabric_config.expansion is None:
+                expansion = TemplateExpansion(template=template.config, parameters=job_data.parameters)
+                fabric_config = fabric_config.copy(update={"expansion": expansion})
+        elif not any(getattr(fabric_config, kind) for kind in FABRIC_OBJECT_KINDS):
+            fabric_config = fabric_config.copy(update=template.fabric_objects())
+    
+    if fabric_config.expansion is not None:
+        # Counted and sampled rather than expanded, so a template that is too
+        # large or cannot render is rejected without holding up the event loop
+        try:
+            check_config_expansion(fabric_config)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Template expansion failed: {str(e)}")
+    
     try:
         db = get_database()
-        conn = db.get_connection()
-        
-        cursor = conn.execute("""
-            INSERT INTO provisioning_jobs (name, template_id, fabric_config, status)
-            VALUES (?, ?, ?, ?)
-        """, (
-            job_data.name,
-            job_data.template_id,
-            json.dumps(job_data.fabric_config.dict()),
-            "pending"
-        ))
-        
-        job_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            cursor = conn.execute("""
+                INSERT INTO provisioning_jobs (name, template_id, fabric_config, status)
+                VALUES (?, ?, ?, ?)
+            """, (
+                job_data.name,
+                job_data.template_id,
+                json.dumps(fabric_config.dict()),
+                "pending"
+            ))
+            
+            job_id = cursor.lastrowid
         
-        provisioning_service = ProvisioningService()
-        background_tasks.add_task(
-            provisioning_service.execute_provisioning,
-            job_id,
-            job_data.fabric_config
-        )
+        job_queue = get_job_queue()
+        await job_queue.ensure_started()
+        job_queue.submitted()
         
         return {
             "job_id": job_id,
-            "status": "started",
-            "message": "Provisioning job created and started"
+            "status": "queued",
+            "message": "Provisioning job created and queued"
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create job: {str(e)}")
 
-@router.get("/jobs", response_model=List[Dict[str, Any]])
-async def list_provisioning_jobs():
-    """List all provisioning jobs"""
+@router.post("/ndo-jobs", response_model=Dict[str, Any])
+async def create_ndo_job(job_data: NDOJob):
+    """Create a job that applies an NDO schema and queue it for execution.
+
+    With a ``template_id`` and no ``ndo_schema``, the job applies the
+    schema of that NDO template from the template registry. The job runs
+    in the same queue as provisioning jobs and logs to its task_logs.
+    """
+    ndo_config = job_data.ndo_config
+    if job_data.template_id is not None and ndo_config.ndo_schema is None:
+        template = get_template_registry().get(job_data.template_id)
+        if template is None:
+            raise HTTPException(status_code=404, detail="Template not found")
+        if template.type != "ndo" or template.compiled is None:
+            raise HTTPException(status_code=400, detail=f"Template '{template.name}' is not a valid NDO template")
+        ndo_config = ndo_config.copy(update={"ndo_schema": template.compiled})
+    if ndo_config.ndo_schema is None:
+        raise HTTPException(status_code=422, detail="An NDO job needs a template_id or an ndo_schema")
+    
     try:
         db = get_database()
-        conn = db.get_connection()
+        with db.connection() as conn:
+            cursor = conn.execute("""
+                INSERT INTO provisioning_jobs (name, template_id, job_type, fabric_config, status)
+                VALUES (?, ?, 'ndo', ?, 'pending')
+            """, (job_data.name, job_data.template_id, json.dumps(ndo_config.dict())))
+            
+            job_id = cursor.lastrowid
         
-        cursor = conn.execute("""
-            SELECT id, name, status, progress, created_at, started_at, completed_at
-            FROM provisioning_jobs
-            ORDER BY created_at DESC
-        """)
+        job_queue = get_job_queue()
+        await job_queue.ensure_started()
+        job_queue.submitted()
         
-        jobs = []
-        for row in cursor.fetchall():
-            jobs.append({
-                "id": row["id"],
-                "name": row["name"],
-                "status": row["status"],
-                "progress": row["progress"],
-                "created_at": row["created_at"],
-                "started_at": row["started_at"],
-                "completed_at": row["completed_at"]
-            })
+        return {
+            "job_id": job_id,
+            "status": "queued",
+            "message": "NDO job created and queued"
+        }
         
-        conn.close()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create job: {str(e)}")
+
+@router.get("/jobs", response_model=List[Dict[str, Any]])
+async def list_provisioning_jobs(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description="Return jobs older than this job id"),
+    stream: Optional[str] = Query(None, pattern=STREAM_FORMATS, description=STREAM_DESCRIPTION)
+):
+    """List provisioning jobs, newest first, optionally one page at a time"""
+    def query(conn):
+        condition, params = keyset_condition(conn, "provisioning_jobs", "created_at", after, descending=True)
+        return conn.execute(f"""
+            SELECT id, name, job_type, status, progress, created_at, started_at, completed_at
+            FROM provisioning_jobs
+            {"WHERE " + condition if condition else ""}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, (*params, limit or -1))
+    
+    if stream:
+        return stream_rows(query, ("id", "name", "job_type", "status", "progress", "created_at", "started_at", "completed_at"), stream)
+    
+    try:
+        db = get_database()
+        with db.connection() as conn:
+            cursor = query(conn)
+            
+            jobs = []
+            for row in cursor.fetchall():
+                jobs.append({
+                    "id": row["id"],
+                    "name": row["name"],
+                    "job_type": row["job_type"],
+                    "status": row["status"],
+                    "progress": row["progress"],
+                    "created_at": row["created_at"],
+                    "started_at": row["started_at"],
+                    "completed_at": row["completed_at"]
+                })
+        
+        set_next_cursor(response, jobs, limit)
         return jobs
         
     except Exception as e:
@@ -89,29 +222,28 @@ async def get_provisioning_job(job_id: int):
     """Get details of a specific provisioning job"""
     try:
         db = get_database()
-        conn = db.get_connection()
-        
-        cursor = conn.execute("""
-            SELECT * FROM provisioning_jobs WHERE id = ?
-        """, (job_id,))
-        
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Job not found")
-        
-        job_data = {
-            "id": row["id"],
-            "name": row["name"],
-            "template_id": row["template_id"],
-            "fabric_config": json.loads(row["fabric_config"]),
-            "status": row["status"],
-            "progress": row["progress"],
-            "created_at": row["created_at"],
-            "started_at": row["started_at"],
-            "completed_at": row["completed_at"]
-        }
-        
-        conn.close()
+        with db.connection() as conn:
+            cursor = conn.execute("""
+                SELECT * FROM provisioning_jobs WHERE id = ?
+            """, (job_id,))
+            
+            row = cursor.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Job not found")
+            
+            job_data = {
+                "id": row["id"],
+                "name": row["name"],
+                "template_id": row["template_id"],
+                "job_type": row["job_type"],
+                "fabric_config": json.loads(row["fabric_config"]),
+                "status": row["status"],
+                "progress": row["progress"],
+                "site_results": json.loads(row["site_results"]) if row["site_results"] else None,
+                "created_at": row["created_at"],
+                "started_at": row["started_at"],
+                "completed_at": row["completed_at"]
+            }
         return job_data
         
     except HTTPException:
@@ -120,52 +252,174 @@ async def get_provisioning_job(job_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to get job: {str(e)}")
 
 @router.get("/jobs/{job_id}/logs", response_model=List[Dict[str, Any]])
-async def get_job_logs(job_id: int):
-    """Get logs for a specific provisioning job"""
+async def get_job_logs(
+    job_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description="Return log entries after this log id"),
+    stream: Optional[str] = Query(None, pattern=STREAM_FORMATS, description=STREAM_DESCRIPTION)
+):
+    """Get logs for a specific provisioning job, optionally one page at a time"""
+    def query(conn):
+        condition, params = keyset_condition(conn, "task_logs", "timestamp", after)
+        return conn.execute(f"""
+            SELECT * FROM task_logs 
+            WHERE job_id = ? {"AND " + condition if condition else ""}
+            ORDER BY timestamp ASC, id ASC
+            LIMIT ?
+        """, (job_id, *params, limit or -1))
+    
+    if stream:
+        return stream_rows(query, ("id", "task_name", "status", "message", "details", "timestamp"), stream)
+    
     try:
         db = get_database()
-        conn = db.get_connection()
-        
-        cursor = conn.execute("""
-            SELECT * FROM task_logs 
-            WHERE job_id = ? 
-            ORDER BY timestamp ASC
-        """, (job_id,))
+        with db.connection() as conn:
+            cursor = query(conn)
+            
+            logs = []
+            for row in cursor.fetchall():
+                logs.append({
+                    "id": row["id"],
+                    "task_name": row["task_name"],
+                    "status": row["status"],
+                    "message": row["message"],
+                    "details": json.loads(row["details"]) if row["details"] else None,
+                    "timestamp": row["timestamp"]
+                })
         
-        logs = []
-        for row in cursor.fetchall():
-            logs.append({
-                "id": row["id"],
-                "task_name": row["task_name"],
-                "status": row["status"],
-                "message": row["message"],
-                "details": json.loads(row["details"]) if row["details"] else None,
-                "timestamp": row["timestamp"]
-            })
-        
-        conn.close()
+        set_next_cursor(response, logs, limit)
         return logs
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get logs: {str(e)}")
 
-@router.delete("/jobs/{job_id}")
-async def delete_provisioning_job(job_id: int):
-    """Delete a provisioning job and its logs"""
+@router.get("/jobs/{job_id}/slowest-calls", response_model=List[Dict[str, Any]])
+async def get_slowest_api_calls(
+    job_id: int,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Get the slowest APIC/NDO calls a job made"""
     try:
         db = get_database()
-        conn = db.get_connection()
-        
-        conn.execute("DELETE FROM task_logs WHERE job_id = ?", (job_id,))
-        conn.execute("DELETE FROM api_logs WHERE job_id = ?", (job_id,))
+        with db.connection() as conn:
+            cursor = conn.execute("""
+                SELECT id, host, endpoint, method, status_code, latency_ms,
+                       request_bytes, response_bytes, response_data, timestamp
+                FROM api_logs
+                WHERE job_id = ? AND latency_ms IS NOT NULL
+                ORDER BY latency_ms DESC
+                LIMIT ?
+            """, (job_id, limit))
+            
+            calls = []
+            for row in cursor.fetchall():
+                calls.append({
+                    "id": row["id"],
+                    "host": row["host"],
+                    "endpoint": row["endpoint"],
+                    "method": row["method"],
+                    "status_code": row["status_code"],
+                    "latency_ms": row["latency_ms"],
+                    "request_bytes": row["request_bytes"],
+                    "response_bytes": row["response_bytes"],
+                    "error": row["response_data"],
+                    "timestamp": row["timestamp"]
+                })
+        return calls
         
-        cursor = conn.execute("DELETE FROM provisioning_jobs WHERE id = ?", (job_id,))
-        
-        if cursor.rowcount == 0:
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get API calls: {str(e)}")
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: int,
+    request: Request,
+    after: Optional[int] = Query(None, description="Resume after this log id")
+):
+    """Stream new log entries and progress changes as server-sent events.
+
+    Resumes from ``after`` or the standard Last-Event-ID header, so a
+    reconnecting browser picks up exactly where it left off. The stream
+    ends with an ``end`` event once the job has completed or failed.
+    """
+    db = get_database()
+    with db.connection() as conn:
+        if conn.execute("SELECT 1 FROM provisioning_jobs WHERE id = ?", (job_id,)).fetchone() is None:
             raise HTTPException(status_code=404, detail="Job not found")
+    
+    last_event_id = request.headers.get("last-event-id")
+    last_log_id = after if after is not None else int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    
+    async def event_stream():
+        nonlocal last_log_id
+        last_state = None
         
-        conn.commit()
-        conn.close()
+        with job_events.subscribe(job_id) as subscription:
+            while True:
+                with db.connection() as conn:
+                    rows = conn.execute("""
+                        SELECT id, task_name, status, message, details, timestamp
+                        FROM task_logs
+                        WHERE id > ? AND job_id = ?
+                        ORDER BY id
+                    """, (last_log_id, job_id)).fetchall()
+                    job = conn.execute("""
+                        SELECT status, progress, site_results FROM provisioning_jobs WHERE id = ?
+                    """, (job_id,)).fetchone()
+                
+                for row in rows:
+                    last_log_id = row["id"]
+                    log = {
+                        "id": row["id"],
+                        "task_name": row["task_name"],
+                        "status": row["status"],
+                        "message": row["message"],
+                        "details": json.loads(row["details"]) if row["details"] else None,
+                        "timestamp": row["timestamp"]
+                    }
+                    yield f"id: {row['id']}\nevent: log\ndata: {json.dumps(log)}\n\n"
+                
+                if job is None:
+                    yield "event: end\ndata: {\"status\": \"deleted\"}\n\n"
+                    return
+                
+                state = {"status": job["status"], "progress": job["progress"]}
+                if job["site_results"]:
+                    state["sites"] = json.loads(job["site_results"])
+                if state != last_state:
+                    last_state = state
+                    yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+                
+                if job["status"] in ("completed", "failed"):
+                    yield f"event: end\ndata: {json.dumps(state)}\n\n"
+                    return
+                
+                if await request.is_disconnected():
+                    return
+                
+                if not await subscription.wait(SSE_KEEPALIVE_SECONDS):
+                    yield ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.delete("/jobs/{job_id}")
+async def delete_provisioning_job(job_id: int):
+    """Delete a provisioning job and its logs"""
+    try:
+        db = get_database()
+        with db.connection() as conn:
+            conn.execute("DELETE FROM task_logs WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM api_logs WHERE job_id = ?", (job_id,))
+            
+            cursor = conn.execute("DELETE FROM provisioning_jobs WHERE id = ?", (job_id,))
+            
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Job not found")
         
         return {"message": "Job deleted successfully"}
         
@@ -175,11 +429,14 @@ async def delete_provisioning_job(job_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to delete job: {str(e)}")
 
 @router.post("/validate-config")
-async def validate_configuration(config: FabricConfig):
+async def validate_configuration(
+    config: FabricConfig,
+    refresh: bool = Query(False, description="Query the fabric instead of using the cached inventory")
+):
     """Validate ACI configuration before provisioning"""
     try:
         provisioning_service = ProvisioningService()
-        validation_result = await provisioning_service.validate_configuration(config)
+        validation_result = await provisioning_service.validate_configuration(config, refresh=refresh)
         
         return {
             "valid": validation_result["valid"],
@@ -2,15 +2,30 @@
 Status and monitoring API endpoints
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import bisect
 import json
 from datetime import datetime, timedelta
 
-from ..models.database import get_database
+from ..models.aci_models import APICCredentials, TemplateUpdate
+from ..models.ndo_models import NDOCredentials
+from ..models.database import get_database, keyset_condition
+from ..services.job_queue import get_job_queue
+from ..services.inventory import get_fabric_inventory
+from ..services.ndo_cache import get_ndo_cache
+from ..services.templates import get_template_registry
+from ..clients.session_manager import get_session_manager, get_ndo_session_manager
+from ..clients.ndo_client import NDOClient
+from ..clients.throttle import throttle_metrics
+from .provisioning import MAX_PAGE_SIZE, STREAM_DESCRIPTION, STREAM_FORMATS, set_next_cursor, stream_rows
 
 router = APIRouter()
 
+# Upper bounds of the API latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -25,33 +40,30 @@ async def get_statistics():
     """Get provisioning statistics"""
     try:
         db = get_database()
-        conn = db.get_connection()
-        
-        cursor = conn.execute("""
-            SELECT 
-                status,
-                COUNT(*) as count
-            FROM provisioning_jobs
-            GROUP BY status
-        """)
-        
-        job_stats = {}
-        for row in cursor.fetchall():
-            job_stats[row["status"]] = row["count"]
-        
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        cursor = conn.execute("""
-            SELECT COUNT(*) as count
-            FROM provisioning_jobs
-            WHERE created_at > ?
-        """, (yesterday.isoformat(),))
-        
-        recent_jobs = cursor.fetchone()["count"]
-        
-        cursor = conn.execute("SELECT COUNT(*) as count FROM api_logs")
-        total_api_calls = cursor.fetchone()["count"]
-        
-        conn.close()
+        with db.connection() as conn:
+            # Reads only the stats_counters rows, however large the history grows
+            cursor = conn.execute("""
+                SELECT bucket, value FROM stats_counters
+                WHERE name = 'jobs_status' AND value > 0
+            """)
+            
+            job_stats = {}
+            for row in cursor.fetchall():
+                job_stats[row["bucket"]] = row["value"]
+            
+            # Jobs are counted per hour, so the window starts on the hour
+            since = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d %H")
+            cursor = conn.execute("""
+                SELECT COALESCE(SUM(value), 0) as count
+                FROM stats_counters
+                WHERE name = 'jobs_created' AND bucket >= ?
+            """, (since,))
+            
+            recent_jobs = cursor.fetchone()["count"]
+            
+            cursor = conn.execute("SELECT value FROM stats_counters WHERE name = 'api_calls' AND bucket = ''")
+            row = cursor.fetchone()
+            total_api_calls = row["value"] if row else 0
         
         return {
             "job_statistics": job_stats,
@@ -63,100 +75,248 @@ async def get_statistics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get statistics: {str(e)}")
 
-@router.get("/templates")
-async def list_templates():
-    """List available configuration templates"""
+@router.get("/api-calls/latency")
+async def get_api_latency(
+    minutes: int = Query(60, ge=1, le=7 * 24 * 60, description="Look-back window in minutes"),
+    host: Optional[str] = Query(None, description="Only calls to this controller host")
+):
+    """Get per-endpoint APIC/NDO call latency percentiles and histograms"""
     try:
+        cutoff = (datetime.utcnow() - timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
         db = get_database()
-        conn = db.get_connection()
-        
-        cursor = conn.execute("""
-            SELECT id, name, type, description, created_at, updated_at
-            FROM templates
-            ORDER BY name
-        """)
+        with db.connection() as conn:
+            cursor = conn.execute(f"""
+                SELECT endpoint, method, status_code, latency_ms
+                FROM api_logs
+                WHERE timestamp >= ? AND latency_ms IS NOT NULL {"AND host = ?" if host else ""}
+                ORDER BY endpoint, method, latency_ms
+            """, (cutoff, host) if host else (cutoff,))
+            
+            groups: Dict[tuple, Dict[str, Any]] = {}
+            for row in cursor:
+                group = groups.setdefault((row["endpoint"], row["method"]), {"latencies": [], "errors": 0})
+                group["latencies"].append(row["latency_ms"])
+                if row["status_code"] is None or row["status_code"] >= 400:
+                    group["errors"] += 1
         
-        templates = []
-        for row in cursor.fetchall():
-            templates.append({
-                "id": row["id"],
-                "name": row["name"],
-                "type": row["type"],
-                "description": row["description"],
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"]
+        endpoints = []
+        for (endpoint, method), group in groups.items():
+            latencies = group["latencies"]
+            histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            for latency in latencies:
+                histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency)] += 1
+            endpoints.append({
+                "endpoint": endpoint,
+                "method": method,
+                "count": len(latencies),
+                "errors": group["errors"],
+                "avg_ms": round(sum(latencies) / len(latencies), 3),
+                "p50_ms": latencies[len(latencies) // 2],
+                "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+                "max_ms": latencies[-1],
+                "histogram": histogram
             })
+        endpoints.sort(key=lambda e: e["p99_ms"], reverse=True)
         
-        conn.close()
-        return templates
+        return {
+            "window_minutes": minutes,
+            "bucket_upper_bounds_ms": LATENCY_BUCKETS_MS + [None],
+            "endpoints": endpoints
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get API latency: {str(e)}")
+
+@router.get("/controllers")
+async def get_controller_metrics():
+    """Get rate limiter, concurrency and retry statistics per controller host"""
+    return {"controllers": throttle_metrics()}
+
+@router.get("/inventory")
+async def list_fabric_inventories():
+    """List the fabrics held in the in-memory inventory"""
+    inventory = get_fabric_inventory()
+    return {"fabrics": inventory.fabrics(), **inventory.stats}
+
+@router.post("/inventory")
+async def load_fabric_inventory(
+    credentials: APICCredentials,
+    refresh: bool = Query(False, description="Reload the whole inventory instead of catching up with a delta query")
+):
+    """Load a fabric into the inventory, or bring it up to date"""
+    auth_result = await get_session_manager().get_client(
+        host=credentials.host,
+        username=credentials.username,
+        password=credentials.password,
+        port=credentials.port,
+        verify_ssl=credentials.verify_ssl
+    )
+    if not auth_result["success"]:
+        raise HTTPException(status_code=502, detail=f"APIC authentication failed: {auth_result['error']}")
+    
+    result = await get_fabric_inventory().get_snapshot(auth_result["client"], refresh=refresh)
+    if not result["success"]:
+        raise HTTPException(status_code=502, detail=f"Failed to load inventory: {result['error']}")
+    return {"host": credentials.host, "port": credentials.port, "cached": result["cached"], **result["snapshot"].summary()}
+
+@router.get("/inventory/{host}")
+async def get_fabric_inventory_snapshot(host: str, port: int = Query(443, description="APIC HTTPS port")):
+    """Get a fabric's nodes, tenants, VRFs, BDs, application profiles and EPGs from memory"""
+    snapshot = get_fabric_inventory().cached(host, port)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Fabric not in inventory; POST its credentials to /inventory first")
+    return {
+        "host": host,
+        "port": port,
+        "age_seconds": round(snapshot.age, 1),
+        "stale": snapshot.stale,
+        **snapshot.to_dict()
+    }
+
+@router.get("/ndo")
+async def list_ndo_caches():
+    """List the NDOs whose sites and schemas are cached"""
+    cache = get_ndo_cache()
+    return {"orchestrators": cache.summary(), **cache.stats}
+
+async def _with_ndo_session(credentials: NDOCredentials, call: Callable[[NDOClient], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Run ``call`` with the shared NDO session, logging in again once if it fails"""
+    manager = get_ndo_session_manager()
+    for _ in range(2):
+        auth_result = await manager.get_client(
+            host=credentials.host,
+            username=credentials.username,
+            password=credentials.password,
+            port=credentials.port,
+            verify_ssl=credentials.verify_ssl
+        )
+        if not auth_result["success"]:
+            raise HTTPException(status_code=502, detail=f"NDO authentication failed: {auth_result['error']}")
+        result = await call(auth_result["client"])
+        if result["success"]:
+            break
+        # Most likely an expired or revoked token
+        manager.discard(auth_result["client"])
+    return result
+
+@router.post("/ndo/sites")
+async def get_ndo_sites(
+    credentials: NDOCredentials,
+    refresh: bool = Query(False, description="Query the NDO even if the cached sites are recent")
+):
+    """Get the sites an NDO manages, from cache when current"""
+    result = await _with_ndo_session(credentials, lambda client: get_ndo_cache().get_sites(client, refresh=refresh))
+    if not result["success"]:
+        raise HTTPException(status_code=502, detail=f"Failed to get NDO sites: {result['error']}")
+    return {"sites": result["sites"], "cached": result["cached"]}
+
+@router.post("/ndo/schemas")
+async def list_ndo_schemas(
+    credentials: NDOCredentials,
+    refresh: bool = Query(False, description="Query the NDO even if the cached schema list is recent")
+):
+    """List an NDO's schemas (id, name, templates) without downloading their bodies"""
+    result = await _with_ndo_session(credentials, lambda client: get_ndo_cache().list_schemas(client, refresh=refresh))
+    if not result["success"]:
+        raise HTTPException(status_code=502, detail=f"Failed to list NDO schemas: {result['error']}")
+    return {"schemas": result["schemas"], "cached": result["cached"]}
+
+@router.get("/queue")
+async def get_queue_metrics():
+    """Get job queue depth, running jobs and wait times"""
+    try:
+        return get_job_queue().metrics()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get queue metrics: {str(e)}")
+
+@router.get("/templates")
+async def list_templates(request: Request, response: Response):
+    """List available configuration templates"""
+    try:
+        registry = get_template_registry()
+        etag = registry.list_etag
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return [template.summary() for template in registry.list()]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list templates: {str(e)}")
 
 @router.get("/templates/{template_id}")
-async def get_template(template_id: int):
+async def get_template(template_id: int, request: Request, response: Response):
     """Get a specific configuration template"""
     try:
-        db = get_database()
-        conn = db.get_connection()
-        
-        cursor = conn.execute("""
-            SELECT * FROM templates WHERE id = ?
-        """, (template_id,))
-        
-        row = cursor.fetchone()
-        if not row:
+        template = get_template_registry().get(template_id)
+        if template is None:
             raise HTTPException(status_code=404, detail="Template not found")
-        
-        template_data = {
-            "id": row["id"],
-            "name": row["name"],
-            "type": row["type"],
-            "description": row["description"],
-            "config": json.loads(row["config"]),
-            "created_at": row["created_at"],
-            "updated_at": row["updated_at"]
-        }
-        
-        conn.close()
-        return template_data
+        if request.headers.get("if-none-match") == template.etag:
+            return Response(status_code=304, headers={"ETag": template.etag})
+        response.headers["ETag"] = template.etag
+        return template.to_dict()
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get template: {str(e)}")
 
+@router.put("/templates/{template_id}")
+async def update_template(template_id: int, update: TemplateUpdate, response: Response):
+    """Replace a template's configuration after validating it"""
+    try:
+        template = get_template_registry().update(template_id, update.config, update.description)
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid template configuration: {str(e)}")
+    if template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    response.headers["ETag"] = template.etag
+    return template.to_dict()
+
 @router.get("/logs/recent")
-async def get_recent_logs(limit: int = 100):
+async def get_recent_logs(
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description="Return log entries older than this log id"),
+    stream: Optional[str] = Query(None, pattern=STREAM_FORMATS, description=STREAM_DESCRIPTION)
+):
     """Get recent task logs across all jobs"""
-    try:
-        db = get_database()
-        conn = db.get_connection()
-        
-        cursor = conn.execute("""
+    def query(conn):
+        condition, params = keyset_condition(conn, "task_logs", "timestamp", after, descending=True, alias="tl")
+        return conn.execute(f"""
             SELECT 
                 tl.*,
                 pj.name as job_name
             FROM task_logs tl
             JOIN provisioning_jobs pj ON tl.job_id = pj.id
-            ORDER BY tl.timestamp DESC
+            {"WHERE " + condition if condition else ""}
+            ORDER BY tl.timestamp DESC, tl.id DESC
             LIMIT ?
-        """, (limit,))
-        
-        logs = []
-        for row in cursor.fetchall():
-            logs.append({
-                "id": row["id"],
-                "job_id": row["job_id"],
-                "job_name": row["job_name"],
-                "task_name": row["task_name"],
-                "status": row["status"],
-                "message": row["message"],
-                "details": json.loads(row["details"]) if row["details"] else None,
-                "timestamp": row["timestamp"]
-            })
+        """, (*params, limit))
+    
+    if stream:
+        fields = ("id", "job_id", "job_name", "task_name", "status", "message", "details", "timestamp")
+        return stream_rows(query, fields, stream)
+    
+    try:
+        db = get_database()
+        with db.connection() as conn:
+            cursor = query(conn)
+            
+            logs = []
+            for row in cursor.fetchall():
+                logs.append({
+                    "id": row["id"],
+                    "job_id": row["job_id"],
+                    "job_name": row["job_name"],
+                    "task_name": row["task_name"],
+                    "status": row["status"],
+                    "message": row["message"],
+                    "details": json.loads(row["details"]) if row["details"] else None,
+                    "timestamp": row["timestamp"]
+                })
         
-        conn.close()
+        set_next_cursor(response, logs, limit)
         return logs
         
     except Exception as e:
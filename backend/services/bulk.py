@@ -0,0 +1,200 @@
+"""
+Bulk tree builder for single-transaction APIC provisioning
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Iterator, Tuple
+
+from ..models.aci_models import FabricConfig
+from ..clients.apic_client import (
+    build_tenant_mo,
+    build_vrf_mo,
+    build_bridge_domain_mo,
+    build_application_profile_mo,
+    build_epg_mo
+)
+
+# Bulk trees may be re-posted (retries, chunk wrappers), so every object is
+# written with an idempotent status instead of the plain "created".
+BULK_STATUS = "created,modified"
+
+DEFAULT_MAX_PAYLOAD_BYTES = 256 * 1024
+
+RN_FORMATS = {
+    "fvTenant": "tn-{name}",
+    "fvCtx": "ctx-{name}",
+    "fvBD": "BD-{name}",
+    "fvAp": "ap-{name}",
+    "fvAEPg": "epg-{name}"
+}
+
+OBJECT_KINDS = {
+    "fvTenant": "tenant",
+    "fvCtx": "vrf",
+    "fvBD": "bd",
+    "fvAp": "ap",
+    "fvAEPg": "epg"
+}
+
+KIND_LABELS = {
+    "tenant": "Tenant",
+    "vrf": "VRF",
+    "bd": "Bridge Domain",
+    "ap": "Application Profile",
+    "epg": "EPG"
+}
+
+@dataclass
+class BulkObject:
+    """A single provisionable object tracked through a bulk run"""
+    kind: str
+    name: str
+    tenant: str
+    dn: str
+
+    @property
+    def task_name(self) -> str:
+        return f"create_{self.kind}_{self.name}"
+
+    @property
+    def label(self) -> str:
+        return KIND_LABELS[self.kind]
+
+@dataclass
+class BulkChunk:
+    """One polUni document and the DNs of the objects it carries"""
+    payload: Dict[str, Any]
+    dns: List[str]
+    size: int
+
+@dataclass
+class BulkPlan:
+    objects: Dict[str, BulkObject] = field(default_factory=dict)
+    chunks: List[BulkChunk] = field(default_factory=list)
+
+def _wrapper(mo: Dict[str, Any], children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Copy a managed object with a different set of children"""
+    class_name, body = next(iter(mo.items()))
+    return {class_name: {"attributes": dict(body["attributes"]), "children": children}}
+
+def _size(mo: Dict[str, Any]) -> int:
+    return len(json.dumps(mo, separators=(",", ":")))
+
+def build_tenant_trees(config: FabricConfig) -> Dict[str, Dict[str, Any]]:
+    """Nest every object of a FabricConfig under its fvTenant, keyed by tenant name"""
+    trees: Dict[str, Dict[str, Any]] = {}
+
+    def tenant_tree(name: str) -> Dict[str, Any]:
+        if name not in trees:
+            # Tenants referenced but not declared are only used as containers
+            trees[name] = {"fvTenant": {"attributes": {"name": name}, "children": []}}
+        return trees[name]
+
+    for tenant in config.tenants:
+        mo = build_tenant_mo(tenant.dict(), status=BULK_STATUS)
+        mo["fvTenant"]["children"] = tenant_tree(tenant.name)["fvTenant"]["children"]
+        trees[tenant.name] = mo
+
+    for vrf in config.vrfs:
+        tenant_tree(vrf.tenant)["fvTenant"]["children"].append(build_vrf_mo(vrf.dict(), status=BULK_STATUS))
+
+    for bd in config.bridge_domains:
+        tenant_tree(bd.tenant)["fvTenant"]["children"].append(build_bridge_domain_mo(bd.dict(), status=BULK_STATUS))
+
+    app_profiles: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for app_profile in config.app_profiles:
+        mo = build_application_profile_mo(app_profile.dict(), status=BULK_STATUS)
+        mo["fvAp"]["children"] = []
+        app_profiles[(app_profile.tenant, app_profile.name)] = mo
+        tenant_tree(app_profile.tenant)["fvTenant"]["children"].append(mo)
+
+    for epg in config.epgs:
+        key = (epg.tenant, epg.app_profile)
+        if key not in app_profiles:
+            app_profiles[key] = {"fvAp": {"attributes": {"name": epg.app_profile}, "children": []}}
+            tenant_tree(epg.tenant)["fvTenant"]["children"].append(app_profiles[key])
+        app_profiles[key]["fvAp"]["children"].append(build_epg_mo(epg.dict(), status=BULK_STATUS))
+
+    return trees
+
+def walk_tracked(mo: Dict[str, Any], parent_dn: str = "uni") -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """Yield (class, dn, attributes) for every tracked object in a tree"""
+    class_name, body = next(iter(mo.items()))
+    dn = parent_dn
+    if class_name in RN_FORMATS:
+        dn = f"{parent_dn}/{RN_FORMATS[class_name].format(**body['attributes'])}"
+        yield class_name, dn, body["attributes"]
+    for child in body.get("children", []):
+        yield from walk_tracked(child, dn)
+
+def split_tree(mo: Dict[str, Any], max_bytes: int) -> List[Dict[str, Any]]:
+    """Split a tree into copies whose children fit in max_bytes each.
+
+    The parent's attributes are repeated in every piece, which is safe
+    because bulk objects carry an idempotent status. A leaf that is still
+    too large on its own is returned unchanged.
+    """
+    if _size(mo) <= max_bytes:
+        return [mo]
+
+    children = next(iter(mo.values())).get("children", [])
+    if not children:
+        return [mo]
+
+    overhead = _size(_wrapper(mo, []))
+    pieces: List[Dict[str, Any]] = []
+    current: List[Dict[str, Any]] = []
+    current_size = overhead
+
+    for child in children:
+        for part in split_tree(child, max_bytes - overhead):
+            part_size = _size(part) + 1
+            if current and current_size + part_size > max_bytes:
+                pieces.append(_wrapper(mo, current))
+                current, current_size = [], overhead
+            current.append(part)
+            current_size += part_size
+
+    if current:
+        pieces.append(_wrapper(mo, current))
+    return pieces
+
+def build_bulk_plan(config: FabricConfig, max_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES) -> BulkPlan:
+    """Build the polUni documents needed to push a FabricConfig"""
+    plan = BulkPlan()
+
+    uni = {"polUni": {"attributes": {}, "children": []}}
+    overhead = _size(uni)
+    pending: List[Dict[str, Any]] = []
+    pending_size = overhead
+
+    def flush():
+        nonlocal pending, pending_size
+        if pending:
+            payload = _wrapper(uni, pending)
+            dns = [dn for _, dn, _ in walk_tracked(payload)]
+            plan.chunks.append(BulkChunk(payload=payload, dns=dns, size=_size(payload)))
+        pending, pending_size = [], overhead
+
+    for tenant_name, tree in build_tenant_trees(config).items():
+        for class_name, dn, attributes in walk_tracked(tree):
+            if "status" not in attributes:
+                # Containers for objects that are not part of this config
+                continue
+            plan.objects[dn] = BulkObject(
+                kind=OBJECT_KINDS[class_name],
+                name=attributes["name"],
+                tenant=tenant_name,
+                dn=dn
+            )
+
+        for piece in split_tree(tree, max_bytes - overhead):
+            piece_size = _size(piece) + 1
+            if pending and pending_size + piece_size > max_bytes:
+                flush()
+            pending.append(piece)
+            pending_size += piece_size
+    flush()
+
+    return plan
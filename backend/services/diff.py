@@ -0,0 +1,114 @@
+"""
+Diff a desired FabricConfig against the objects already on the APIC
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Iterator, Tuple
+
+from ..models.aci_models import FabricConfig
+from ..clients.apic_client import (
+    build_tenant_mo,
+    build_vrf_mo,
+    build_bridge_domain_mo,
+    build_application_profile_mo,
+    build_epg_mo
+)
+from .bulk import KIND_LABELS, RN_FORMATS as TRACKED_RN_FORMATS
+
+# Every class the desired config sets attributes on, tracked objects and
+# their relation/subnet children alike.
+DIFF_CLASSES = ["fvTenant", "fvCtx", "fvBD", "fvSubnet", "fvRsCtx", "fvAp", "fvAEPg", "fvRsBd"]
+
+RN_FORMATS = {
+    **TRACKED_RN_FORMATS,
+    "fvSubnet": "subnet-[{ip}]",
+    "fvRsCtx": "rsctx",
+    "fvRsBd": "rsbd"
+}
+
+# Attributes that identify an object rather than describe it
+IGNORED_ATTRIBUTES = {"name", "ip", "status"}
+
+CREATE = "created"
+MODIFY = "modified"
+SKIP = "skipped"
+
+@dataclass
+class ObjectDiff:
+    """How one configured object compares with the fabric"""
+    kind: str
+    name: str
+    dn: str
+    action: str
+    changes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def label(self) -> str:
+        return KIND_LABELS[self.kind]
+
+def flatten_mo(mo: Dict[str, Any], parent_dn: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (dn, compared attributes) for an object and its children"""
+    class_name, body = next(iter(mo.items()))
+    attributes = body["attributes"]
+    dn = f"{parent_dn}/{RN_FORMATS[class_name].format(**attributes)}"
+    yield dn, {key: value for key, value in attributes.items() if key not in IGNORED_ATTRIBUTES}
+    for child in body.get("children", []):
+        yield from flatten_mo(child, dn)
+
+def _normalize(value: Any) -> str:
+    return "" if value is None else str(value)
+
+def diff_object(kind: str, name: str, mo: Dict[str, Any], parent_dn: str,
+                existing: Dict[str, Dict[str, Any]]) -> ObjectDiff:
+    """Compare one desired object (and its children) with the fabric state"""
+    desired = list(flatten_mo(mo, parent_dn))
+    dn = desired[0][0]
+    if dn not in existing:
+        return ObjectDiff(kind=kind, name=name, dn=dn, action=CREATE)
+
+    changes: Dict[str, Any] = {}
+    for child_dn, attributes in desired:
+        current = existing.get(child_dn)
+        if current is None:
+            changes[child_dn] = "missing"
+            continue
+        for key, value in attributes.items():
+            if _normalize(current.get(key)) != _normalize(value):
+                changes[f"{child_dn}.{key}"] = {"current": current.get(key), "desired": value}
+
+    return ObjectDiff(kind=kind, name=name, dn=dn, action=MODIFY if changes else SKIP, changes=changes)
+
+def diff_config(config: FabricConfig, existing: Dict[str, Dict[str, Any]]) -> Tuple[List[ObjectDiff], FabricConfig]:
+    """Diff every object of a config against existing attributes keyed by DN.
+
+    Returns the per-object diffs and a copy of the config that only holds
+    the objects that are missing or changed.
+    """
+    diffs: List[ObjectDiff] = []
+    delta: Dict[str, list] = {"tenants": [], "vrfs": [], "bridge_domains": [], "app_profiles": [], "epgs": []}
+
+    def check(field_name: str, kind: str, obj, mo: Dict[str, Any], parent_dn: str):
+        result = diff_object(kind, obj.name, mo, parent_dn, existing)
+        diffs.append(result)
+        if result.action != SKIP:
+            delta[field_name].append(obj)
+
+    for tenant in config.tenants:
+        check("tenants", "tenant", tenant, build_tenant_mo(tenant.dict()), "uni")
+    for vrf in config.vrfs:
+        check("vrfs", "vrf", vrf, build_vrf_mo(vrf.dict()), f"uni/tn-{vrf.tenant}")
+    for bd in config.bridge_domains:
+        check("bridge_domains", "bd", bd, build_bridge_domain_mo(bd.dict()), f"uni/tn-{bd.tenant}")
+    for app_profile in config.app_profiles:
+        check("app_profiles", "ap", app_profile, build_application_profile_mo(app_profile.dict()), f"uni/tn-{app_profile.tenant}")
+    for epg in config.epgs:
+        check("epgs", "epg", epg, build_epg_mo(epg.dict()), f"uni/tn-{epg.tenant}/ap-{epg.app_profile}")
+
+    return diffs, config.copy(update=delta)
+
+def referenced_tenants(config: FabricConfig) -> List[str]:
+    """Every tenant a config declares or places objects in"""
+    names = {t.name for t in config.tenants}
+    for objects in (config.vrfs, config.bridge_domains, config.app_profiles, config.epgs):
+        names.update(obj.tenant for obj in objects)
+    return sorted(names)
@@ -0,0 +1,75 @@
+"""
+In-process notifications for job log and progress changes
+"""
+
+import asyncio
+import threading
+from typing import Dict, Iterable, Set, Tuple
+
+class JobSubscription:
+    """Wakes an async consumer when a job's logs or progress change"""
+
+    def __init__(self, broker: "JobEventBroker", job_id: int):
+        self.broker = broker
+        self.job_id = job_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for the next change; returns False on timeout"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+    def __enter__(self):
+        self.broker._add(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.broker._remove(self)
+
+class JobEventBroker:
+    """Fan-out of "job changed" signals from writer threads to event loops.
+
+    Only the fact that something changed is published; subscribers read
+    the new rows from the database themselves, so a slow consumer never
+    holds up the writer and a missed signal cannot lose data.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[JobSubscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id: int) -> JobSubscription:
+        return JobSubscription(self, job_id)
+
+    def publish(self, job_ids: Iterable[int]):
+        """Signal every subscriber of the given jobs; safe from any thread"""
+        with self._lock:
+            targets: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {
+                (sub.loop, sub.event)
+                for job_id in set(job_ids)
+                for sub in self._subscribers.get(job_id, ())
+            }
+        for loop, event in targets:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    def _add(self, subscription: JobSubscription):
+        with self._lock:
+            self._subscribers.setdefault(subscription.job_id, set()).add(subscription)
+
+    def _remove(self, subscription: JobSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.job_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.job_id]
+
+job_events = JobEventBroker()
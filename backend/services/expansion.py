@@ -0,0 +1,416 @@
+"""
+Parametrized template expansion into ACI objects, one object at a time
+
+A parametrized template looks like::
+
+    {
+      "variables": {"tenant": "prod", "epgs": 500, "supernet": "10.{octet}.0.0/16"},
+      "fabric_types": {"ot": {"tenant": "scada"}},
+      "sites": {"AUNTH": {"octet": 10}, "AUSTH": {"octet": 20}},
+      "tenants": [{"name": "{tenant}"}],
+      "vrfs": [{"name": "{tenant}_vrf", "tenant": "{tenant}"}],
+      "bridge_domains": [{
+        "for_each": {"i": {"start": 1, "count": "{epgs}"}},
+        "name": "bd_{i:03}", "tenant": "{tenant}", "vrf": "{tenant}_vrf",
+        "subnet": "{gateway(subnet(supernet, i, 24))}"
+      }]
+    }
+
+Variables are layered: the template's own, then those of the job's fabric
+type, then those of its site, then the job's parameters. Any string may
+hold ``{expression}`` or ``{expression:format}`` placeholders; a string
+that is a single placeholder keeps the expression's type. Expressions are
+variable names, integer arithmetic (+ - * // %) and calls to ``subnet``
+and ``gateway``. ``for_each`` repeats an object for every value of one
+or more loop variables (a list, or a range given as start/count/step).
+
+Templates come from users, so expansion is bounded: arithmetic works on
+integers only, loops and format widths are capped, and a template may
+expand to at most MAX_OBJECTS objects.
+"""
+
+import ast
+import ipaddress
+import json
+import operator
+import re
+import string
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+from pydantic import BaseModel
+
+from ..models.aci_models import (
+    FabricConfig,
+    TenantConfig,
+    VRFConfig,
+    BridgeDomainConfig,
+    ApplicationProfileConfig,
+    EPGConfig
+)
+from .validation import subnet_range
+
+# FabricConfig list, object kind and model, in the order objects are pushed
+CONFIG_KINDS = [
+    ("tenants", "tenant", TenantConfig),
+    ("vrfs", "vrf", VRFConfig),
+    ("bridge_domains", "bd", BridgeDomainConfig),
+    ("app_profiles", "ap", ApplicationProfileConfig),
+    ("epgs", "epg", EPGConfig)
+]
+
+MAX_OBJECTS = 100000
+MAX_LOOP_VALUES = 100000
+MAX_FORMAT_WIDTH = 64
+# Large enough for any IPv6 address
+MAX_INTEGER = 1 << 128
+
+def _format_address(version: int, value: int) -> str:
+    if version == 4:
+        return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+    return str(ipaddress.IPv6Address(value))
+
+def _parse_network(network: str) -> Tuple[int, int, int, int]:
+    """(IP version, first address, last address, prefix length)"""
+    parsed = subnet_range(network)
+    if parsed is None:
+        raise ValueError(f"invalid network '{network}'")
+    version, first, last = parsed
+    bits = 32 if version == 4 else 128
+    return version, first, last, bits - (last - first).bit_length()
+
+def subnet(network: str, index: int, prefix: int) -> str:
+    """The ``index``-th /``prefix`` network inside ``network``, e.g. subnet("10.0.0.0/16", 5, 24) is 10.0.5.0/24"""
+    version, first, last, length = _parse_network(network)
+    bits = 32 if version == 4 else 128
+    if not length <= prefix <= bits:
+        raise ValueError(f"cannot split /{length} network '{network}' into /{prefix}s")
+    size = 1 << (bits - prefix)
+    start = first + index * size
+    if index < 0 or start + size - 1 > last:
+        raise ValueError(f"subnet {index} of /{prefix} is outside '{network}'")
+    return f"{_format_address(version, start)}/{prefix}"
+
+def gateway(network: str, host: int = 1) -> str:
+    """Address number ``host`` of a network in gateway form, e.g. gateway("10.0.5.0/24") is 10.0.5.1/24"""
+    version, first, last, length = _parse_network(network)
+    if not 0 <= host <= last - first:
+        raise ValueError(f"host {host} is outside '{network}'")
+    return f"{_format_address(version, first + host)}/{length}"
+
+FUNCTIONS = {"subnet": subnet, "gateway": gateway}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.Name, ast.Load, ast.Constant, ast.Call,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.FloorDiv, ast.Mod,
+    ast.UnaryOp, ast.USub, ast.UAdd
+)
+
+_OPERATORS = {
+    "Add": operator.add,
+    "Sub": operator.sub,
+    "Mult": operator.mul,
+    "FloorDiv": operator.floordiv,
+    "Mod": operator.mod
+}
+
+def _arithmetic(op: str, left: Any, right: Any) -> int:
+    """One binary operation, on bounded integers only (so "ab" * 10**8 cannot build a huge string)"""
+    for operand in (left, right):
+        if not isinstance(operand, int) or isinstance(operand, bool):
+            raise TypeError(f"arithmetic needs integers, not {operand!r}")
+        if abs(operand) > MAX_INTEGER:
+            raise ValueError("integer is too large")
+    result = _OPERATORS[op](left, right)
+    if abs(result) > MAX_INTEGER:
+        raise ValueError("integer is too large")
+    return result
+
+class _CheckedArithmetic(ast.NodeTransformer):
+    """Route every binary operation through _arithmetic"""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.Call:
+        self.generic_visit(node)
+        call = ast.Call(
+            func=ast.Name(id="_arithmetic", ctx=ast.Load()),
+            args=[ast.Constant(type(node.op).__name__), node.left, node.right],
+            keywords=[]
+        )
+        return ast.copy_location(call, node)
+
+def _compile_expression(source: str):
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError(f"invalid expression '{source}'")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"'{source}' uses {type(node).__name__}, which templates do not allow")
+        if isinstance(node, ast.Call) and (node.keywords or not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS):
+            raise ValueError(f"'{source}' calls something other than {', '.join(FUNCTIONS)}")
+        if isinstance(node, ast.Name) and node.id.startswith("_"):
+            raise ValueError(f"'{source}' uses a private name")
+    tree = ast.fix_missing_locations(_CheckedArithmetic().visit(tree))
+    return compile(tree, "<template>", "eval")
+
+_GLOBALS = {"__builtins__": {}, **FUNCTIONS, "_arithmetic": _arithmetic}
+
+def _check_name(name: Any, what: str):
+    # Expressions cannot refer to private names, and one must not shadow _arithmetic
+    if not isinstance(name, str) or name.startswith("_"):
+        raise ValueError(f"{what} '{name}' must not start with an underscore")
+
+class TemplateString:
+    """A string with {expression[:format]} placeholders, compiled once"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.parts: List[Tuple[str, Any, str]] = []
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError as e:
+            raise ValueError(f"invalid template string '{text}': {e}")
+        for literal, field, spec, conversion in parsed:
+            if conversion:
+                raise ValueError(f"'{text}' uses a !{conversion} conversion, which templates do not allow")
+            if spec and any(int(width) > MAX_FORMAT_WIDTH for width in re.findall(r"\d+", spec)):
+                raise ValueError(f"'{text}' formats wider than {MAX_FORMAT_WIDTH} characters")
+            self.parts.append((literal, _compile_expression(field) if field is not None else None, spec or ""))
+        # A lone placeholder keeps the expression's own type (e.g. an int)
+        self.single = len(self.parts) == 1 and not self.parts[0][0] and self.parts[0][1] is not None and not self.parts[0][2]
+
+    def render(self, env: Dict[str, Any]) -> Any:
+        try:
+            if self.single:
+                return eval(self.parts[0][1], _GLOBALS, env)
+            return "".join(
+                literal + (format(eval(code, _GLOBALS, env), spec) if code is not None else "")
+                for literal, code, spec in self.parts
+            )
+        except (NameError, TypeError, ValueError, ZeroDivisionError) as e:
+            raise ValueError(f"'{self.text}': {e}")
+
+def _compile_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return TemplateString(value) if "{" in value or "}" in value else value
+    if isinstance(value, list):
+        return [_compile_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _compile_value(item) for key, item in value.items()}
+    return value
+
+def _render(value: Any, env: Dict[str, Any]) -> Any:
+    if isinstance(value, TemplateString):
+        return value.render(env)
+    if isinstance(value, list):
+        return [_render(item, env) for item in value]
+    if isinstance(value, dict):
+        return {key: _render(item, env) for key, item in value.items()}
+    return value
+
+def _as_int(value: Any, what: str) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} must be an integer, not {value!r}")
+
+class ObjectSpec:
+    """One entry of a template object list, with its optional for_each loops"""
+
+    def __init__(self, kind: str, spec: Dict[str, Any]):
+        if not isinstance(spec, dict):
+            raise ValueError(f"{kind} entries must be objects")
+        self.kind = kind
+        loops = spec.get("for_each") or {}
+        if not isinstance(loops, dict):
+            raise ValueError(f"{kind} for_each must map loop variables to values")
+        for name in loops:
+            _check_name(name, f"{kind} loop variable")
+        self.loops = [(name, _compile_value(values)) for name, values in loops.items()]
+        self.fields = {key: _compile_value(value) for key, value in spec.items() if key != "for_each"}
+
+    def _values(self, name: str, values: Any, env: Dict[str, Any]):
+        values = _render(values, env)
+        if isinstance(values, dict):
+            start = _as_int(values.get("start", 1), f"for_each '{name}' start")
+            count = _as_int(values.get("count", 0), f"for_each '{name}' count")
+            step = _as_int(values.get("step", 1), f"for_each '{name}' step")
+        elif isinstance(values, list):
+            start, count, step = 0, len(values), 1
+        else:
+            # A bare number repeats 1..n
+            start, count, step = 1, _as_int(values, f"for_each '{name}'"), 1
+        if count > MAX_LOOP_VALUES:
+            raise ValueError(f"for_each '{name}' has {count} values, more than {MAX_LOOP_VALUES}")
+        if isinstance(values, list):
+            return values
+        return range(start, start + count * step, step) if step else range(0)
+
+    def _walk(self, env: Dict[str, Any], loops: List[Tuple[str, Any]]) -> Iterator[None]:
+        """Bind each combination of loop values into ``env`` in turn"""
+        if not loops:
+            yield
+            return
+        (name, values), *inner = loops
+        for value in self._values(name, values, env):
+            env[name] = value
+            yield from self._walk(env, inner)
+
+    def expand(self, env: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for _ in self._walk(env, self.loops):
+            yield _render(self.fields, env)
+
+    def count(self, env: Dict[str, Any]) -> int:
+        """How many objects the entry expands to; raises ValueError past MAX_OBJECTS"""
+        if not self.loops:
+            return 1
+        # Only the outer loops are walked; the innermost one is just measured.
+        # Walking is capped too, since empty inner loops yield no objects.
+        name, values = self.loops[-1]
+        total = 0
+        for walked, _ in enumerate(self._walk(env, self.loops[:-1]), start=1):
+            total += len(self._values(name, values, env))
+            if total > MAX_OBJECTS or walked > MAX_OBJECTS:
+                raise ValueError(f"{self.kind} entry expands to more than {MAX_OBJECTS} objects")
+        return total
+
+class _Variables(dict):
+    """Resolves variables on first use, so they may refer to each other in any order"""
+
+    def __init__(self, compiled: Dict[str, Any]):
+        super().__init__()
+        self.compiled = compiled
+        self.resolving = set()
+
+    def __missing__(self, name: str) -> Any:
+        if name not in self.compiled:
+            raise KeyError(name)
+        if name in self.resolving:
+            raise ValueError(f"variable '{name}' refers to itself")
+        self.resolving.add(name)
+        value = self[name] = _render(self.compiled[name], self)
+        self.resolving.discard(name)
+        return value
+
+class ExpansionTemplate:
+    """A parametrized template compiled once, expanded lazily per job and site"""
+
+    def __init__(self, template: Dict[str, Any]):
+        if not isinstance(template, dict):
+            raise ValueError("A parametrized template must be an object")
+        self.variables = {key: _compile_value(value) for key, value in (template.get("variables") or {}).items()}
+        self.fabric_types = {
+            fabric_type: {key: _compile_value(value) for key, value in layer.items()}
+            for fabric_type, layer in (template.get("fabric_types") or {}).items()
+        }
+        self.sites = {
+            site: {key: _compile_value(value) for key, value in layer.items()}
+            for site, layer in (template.get("sites") or {}).items()
+        }
+        self.objects = {
+            field: [ObjectSpec(kind, spec) for spec in template.get(field) or []]
+            for field, kind, _ in CONFIG_KINDS
+        }
+        for layer in (self.variables, *self.fabric_types.values(), *self.sites.values()):
+            for name in layer:
+                _check_name(name, "variable")
+
+    def resolve(self, site_code: str = "", fabric_type: str = "",
+                parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Every variable's value for one site and fabric type"""
+        layers = {
+            **self.variables,
+            **self.fabric_types.get(fabric_type, {}),
+            **self.sites.get(site_code, {}),
+            **{key: _compile_value(value) for key, value in (parameters or {}).items()}
+        }
+        for name in parameters or {}:
+            _check_name(name, "parameter")
+        variables = _Variables({**layers, "site_code": site_code, "fabric_type": fabric_type})
+        for name in layers:
+            variables[name]
+        return {**variables, "site_code": site_code, "fabric_type": fabric_type}
+
+    def iter_objects(self, variables: Dict[str, Any], field: str, limit: Optional[int] = None) -> Iterator[BaseModel]:
+        """Generate the objects of one FabricConfig list, validated one at a time.
+
+        Callers bound the expansion with ``count`` first; ``limit`` keeps
+        only the first objects of each entry.
+        """
+        model = next(model for name, _, model in CONFIG_KINDS if name == field)
+        env = dict(variables)
+        for number, spec in enumerate(self.objects[field], start=1):
+            for values in islice(spec.expand(env), limit):
+                try:
+                    yield model(**values)
+                except ValueError as e:
+                    raise ValueError(f"{field} entry {number} expands to an invalid object {values}: {e}")
+
+    def count(self, variables: Dict[str, Any]) -> int:
+        """How many objects the template expands to, without building them; raises ValueError past MAX_OBJECTS"""
+        env = dict(variables)
+        total = sum(spec.count(env) for specs in self.objects.values() for spec in specs)
+        if total > MAX_OBJECTS:
+            raise ValueError(f"template expands to {total} objects, more than {MAX_OBJECTS}")
+        return total
+
+@lru_cache(maxsize=64)
+def _compile_cached(text: str) -> ExpansionTemplate:
+    return ExpansionTemplate(json.loads(text))
+
+def compile_expansion(template: Dict[str, Any]) -> ExpansionTemplate:
+    """Compile a parametrized template, reusing the compiled form of an identical one"""
+    return _compile_cached(json.dumps(template, sort_keys=True))
+
+def expansion_variables(config: FabricConfig) -> Tuple[ExpansionTemplate, Dict[str, Any]]:
+    """A config's compiled template and its variables for the config's site and fabric type"""
+    template = compile_expansion(config.expansion.template)
+    return template, template.resolve(config.site_code.value, config.fabric_type.value, config.expansion.parameters)
+
+def iter_config_objects(config: FabricConfig) -> Iterator[Tuple[str, BaseModel]]:
+    """Every (kind, object) of a config in push order, expanding its template as it goes"""
+    template, variables = expansion_variables(config) if config.expansion is not None else (None, None)
+    if template is not None:
+        template.count(variables)
+    for field, kind, _ in CONFIG_KINDS:
+        for obj in getattr(config, field):
+            yield kind, obj
+        if template is not None:
+            for obj in template.iter_objects(variables, field):
+                yield kind, obj
+
+def count_config_objects(config: FabricConfig) -> int:
+    """How many objects a config provisions, template included"""
+    listed = sum(len(getattr(config, field)) for field, _, _ in CONFIG_KINDS)
+    if config.expansion is None:
+        return listed
+    template, variables = expansion_variables(config)
+    return listed + template.count(variables)
+
+def check_config_expansion(config: FabricConfig) -> int:
+    """Count a config's objects and build the first object of each template entry.
+
+    Cheap enough to run when a job is created: catches templates that are
+    too large or do not render, without expanding them in full.
+    """
+    total = count_config_objects(config)
+    if config.expansion is not None:
+        template, variables = expansion_variables(config)
+        for field, _, _ in CONFIG_KINDS:
+            for _ in template.iter_objects(variables, field, limit=1):
+                pass
+    return total
+
+def expand_config(config: FabricConfig) -> FabricConfig:
+    """A copy of a config with its template expanded into the object lists"""
+    if config.expansion is None:
+        return config
+    template, variables = expansion_variables(config)
+    template.count(variables)
+    return config.copy(update={
+        **{field: getattr(config, field) + list(template.iter_objects(variables, field)) for field, _, _ in CONFIG_KINDS},
+        "expansion": None
+    })
@@ -0,0 +1,235 @@
+"""
+In-memory inventory of each fabric's nodes and tenant objects, kept current with delta queries
+"""
+
+import asyncio
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set, Tuple, AsyncIterator
+
+from ..clients.apic_client import APICClient
+
+# A snapshot older than this is brought up to date with a modTs delta query.
+# Deltas cannot see deletions, so the whole inventory is reloaded every
+# RESYNC_INTERVAL.
+DELTA_INTERVAL = 30.0
+RESYNC_INTERVAL = 600.0
+
+INVENTORY_CLASSES = ["fvTenant", "fvCtx", "fvBD", "fvRsCtx", "fvSubnet", "fvAp", "fvAEPg"]
+
+# uni/tn-<tenant>[/<ctx|BD|ap>-<name>[/rsctx | /subnet-[<ip>] | /epg-<name>]]
+_DN_PATTERN = re.compile(
+    r"^uni/tn-([^/]+)(?:/(ctx|BD|ap)-([^/]+)(?:/(rsctx|subnet-\[([^\]]+)\]|epg-([^/]+)))?)?$"
+)
+
+NODE_ATTRIBUTES = ("id", "name", "role", "model", "serial")
+
+InventoryKey = Tuple[str, int]
+
+def mod_ts_filter(classes: List[str], since: str) -> str:
+    """query-target-filter selecting objects of ``classes`` modified at or after ``since``"""
+    terms = [f'ge({class_name}.modTs,"{since}")' for class_name in classes]
+    return terms[0] if len(terms) == 1 else f"or({','.join(terms)})"
+
+@dataclass
+class FabricSnapshot:
+    """The nodes and tenant-level objects one APIC has"""
+    nodes: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    tenants: Set[str] = field(default_factory=set)
+    vrfs: Set[Tuple[str, str]] = field(default_factory=set)
+    app_profiles: Set[Tuple[str, str]] = field(default_factory=set)
+    # (tenant, BD) -> name of the VRF it is bound to ("" if unbound)
+    bridge_domains: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    # (tenant, BD, gateway ip)
+    subnets: Set[Tuple[str, str, str]] = field(default_factory=set)
+    # (tenant, application profile, EPG)
+    epgs: Set[Tuple[str, str, str]] = field(default_factory=set)
+    # Latest modTs seen; the next delta query starts here
+    watermark: str = ""
+    loaded_at: float = field(default_factory=time.monotonic)
+    updated_at: float = field(default_factory=time.monotonic)
+    # Set when the fabric is known to have changed (we pushed to it)
+    stale: bool = False
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.updated_at
+
+    def add(self, class_name: str, attributes: Dict[str, Any]):
+        """Add or update one queried object"""
+        mod_ts = attributes.get("modTs", "")
+        if mod_ts > self.watermark:
+            self.watermark = mod_ts
+        if class_name == "fabricNode":
+            self.nodes[attributes["id"]] = {key: attributes.get(key) for key in NODE_ATTRIBUTES}
+            return
+
+        match = _DN_PATTERN.match(attributes.get("dn", ""))
+        if match is None:
+            return
+        tenant, container, name, child, ip, epg = match.groups()
+        if class_name == "fvTenant":
+            self.tenants.add(tenant)
+        elif class_name == "fvCtx":
+            self.vrfs.add((tenant, name))
+        elif class_name == "fvAp":
+            self.app_profiles.add((tenant, name))
+        elif class_name == "fvBD":
+            self.bridge_domains.setdefault((tenant, name), "")
+        elif class_name == "fvRsCtx" and container == "BD":
+            self.bridge_domains[(tenant, name)] = attributes.get("tnFvCtxName", "")
+        elif class_name == "fvSubnet" and container == "BD" and ip:
+            self.subnets.add((tenant, name, ip))
+        elif class_name == "fvAEPg" and container == "ap" and epg:
+            self.epgs.add((tenant, name, epg))
+
+    def apply(self, objects: List[Dict[str, Any]]):
+        for obj in objects:
+            self.add(obj["class"], obj["attributes"])
+        self.mark_updated()
+
+    def mark_updated(self):
+        """Record that the snapshot has caught up with the fabric"""
+        self.updated_at = time.monotonic()
+        self.stale = False
+
+    @classmethod
+    def from_objects(cls, objects: List[Dict[str, Any]]) -> "FabricSnapshot":
+        snapshot = cls()
+        snapshot.apply(objects)
+        return snapshot
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "nodes": len(self.nodes),
+            "tenants": len(self.tenants),
+            "vrfs": len(self.vrfs),
+            "bridge_domains": len(self.bridge_domains),
+            "subnets": len(self.subnets),
+            "app_profiles": len(self.app_profiles),
+            "epgs": len(self.epgs)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        subnets: Dict[Tuple[str, str], List[str]] = {}
+        for tenant, bd, ip in self.subnets:
+            subnets.setdefault((tenant, bd), []).append(ip)
+        return {
+            "nodes": sorted(self.nodes.values(), key=lambda node: node["id"] or ""),
+            "tenants": sorted(self.tenants),
+            "vrfs": [{"tenant": tenant, "name": name} for tenant, name in sorted(self.vrfs)],
+            "bridge_domains": [
+                {"tenant": tenant, "name": name, "vrf": vrf or None,
+                 "subnets": sorted(subnets.get((tenant, name), []))}
+                for (tenant, name), vrf in sorted(self.bridge_domains.items())
+            ],
+            "app_profiles": [{"tenant": tenant, "name": name} for tenant, name in sorted(self.app_profiles)],
+            "epgs": [{"tenant": tenant, "app_profile": ap, "name": name} for tenant, ap, name in sorted(self.epgs)]
+        }
+
+class FabricInventory:
+    """Keeps one FabricSnapshot per APIC in memory.
+
+    The first read of a fabric loads it in full. After that, reads are
+    answered from memory: a snapshot older than DELTA_INTERVAL is brought
+    up to date in the background with a query for objects whose modTs is
+    at or past the last one seen, and is reloaded in full every
+    RESYNC_INTERVAL so deletions drop out. A snapshot marked stale (after a
+    job pushed to the fabric) is caught up before it is returned.
+    Concurrent callers share a single query per fabric.
+    """
+
+    def __init__(self, delta_interval: float = DELTA_INTERVAL, resync_interval: float = RESYNC_INTERVAL):
+        self.delta_interval = delta_interval
+        self.resync_interval = resync_interval
+        self._snapshots: Dict[InventoryKey, FabricSnapshot] = {}
+        self._locks: Dict[Tuple[int, InventoryKey], asyncio.Lock] = {}
+        self._refreshing: Dict[InventoryKey, asyncio.Task] = {}
+        self._guard = threading.Lock()
+        self.stats = {"full_loads": 0, "delta_queries": 0, "delta_objects": 0}
+
+    def cached(self, host: str, port: int = 443) -> Optional[FabricSnapshot]:
+        """The in-memory snapshot of a fabric, however old"""
+        return self._snapshots.get((host, port))
+
+    def fabrics(self) -> List[Dict[str, Any]]:
+        """Summary of every fabric held in memory"""
+        return [
+            {"host": host, "port": port, "age_seconds": round(snapshot.age, 1), "stale": snapshot.stale,
+             "watermark": snapshot.watermark or None, **snapshot.summary()}
+            for (host, port), snapshot in list(self._snapshots.items())
+        ]
+
+    async def get_snapshot(self, client: APICClient, refresh: bool = False) -> Dict[str, Any]:
+        """Return the client's fabric inventory, querying the APIC only when needed"""
+        key = (client.host, client.port)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and not refresh and not snapshot.stale:
+            if snapshot.age >= self.delta_interval:
+                self._refresh_in_background(client)
+            return {"success": True, "snapshot": snapshot, "cached": True}
+        return await self._refresh(client, full=refresh)
+
+    def invalidate(self, host: str, port: int = 443):
+        """Mark a fabric's snapshot stale, e.g. after objects were pushed to it"""
+        snapshot = self._snapshots.get((host, port))
+        if snapshot is not None:
+            snapshot.stale = True
+
+    def _refresh_in_background(self, client: APICClient):
+        key = (client.host, client.port)
+        task = self._refreshing.get(key)
+        if task is None or task.done():
+            self._refreshing[key] = asyncio.get_running_loop().create_task(self._refresh(client))
+
+    async def _refresh(self, client: APICClient, full: bool = False) -> Dict[str, Any]:
+        key = (client.host, client.port)
+        with self._guard:
+            lock = self._locks.setdefault((id(asyncio.get_running_loop()), key), asyncio.Lock())
+
+        async with lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and not full and not snapshot.stale and snapshot.age < self.delta_interval:
+                # Another caller refreshed it while we waited
+                return {"success": True, "snapshot": snapshot, "cached": True}
+
+            try:
+                if snapshot is None or full or not snapshot.watermark or time.monotonic() - snapshot.loaded_at >= self.resync_interval:
+                    # Streamed page by page into a new snapshot; the old one
+                    # keeps answering until this one is complete
+                    loaded = FabricSnapshot()
+                    async for obj in self._iter_objects(client):
+                        loaded.add(obj["class"], obj["attributes"])
+                    loaded.mark_updated()
+                    snapshot = loaded
+                    self.stats["full_loads"] += 1
+                else:
+                    # Collected first so a failed delta cannot move the watermark
+                    # past objects it never saw
+                    objects = [obj async for obj in self._iter_objects(client, since=snapshot.watermark)]
+                    snapshot.apply(objects)
+                    self.stats["delta_queries"] += 1
+                    self.stats["delta_objects"] += len(objects)
+            except Exception as e:
+                return {"success": False, "error": f"Inventory query error: {str(e)}"}
+
+            self._snapshots[key] = snapshot
+            return {"success": True, "snapshot": snapshot, "cached": False}
+
+    async def _iter_objects(self, client: APICClient, since: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Tenant objects then fabric nodes, only those modified since ``since`` if given"""
+        async for obj in client.iter_subtree("uni", INVENTORY_CLASSES, mod_ts_filter(INVENTORY_CLASSES, since) if since else None):
+            yield obj
+        async for obj in client.iter_class("fabricNode", mod_ts_filter(["fabricNode"], since) if since else None):
+            yield obj
+
+_inventory_instance = None
+
+def get_fabric_inventory() -> FabricInventory:
+    """Get singleton fabric inventory cache instance"""
+    global _inventory_instance
+    if _inventory_instance is None:
+        _inventory_instance = FabricInventory()
+    return _inventory_instance
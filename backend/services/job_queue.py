@@ -0,0 +1,216 @@
+"""
+Durable provisioning job queue backed by the provisioning_jobs table
+"""
+
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, Set
+
+from ..models.aci_models import FabricConfig
+from ..models.ndo_models import NDOJobConfig
+from ..models.database import get_database
+from .provisioning import ProvisioningService, site_targets
+from . import metrics
+
+DEFAULT_WORKERS = 4
+DEFAULT_PER_HOST_LIMIT = 2
+POLL_INTERVAL = 5.0
+WAIT_SAMPLES = 500
+
+class JobQueue:
+    """Runs pending jobs from the database with a bounded worker pool.
+
+    Jobs stay in provisioning_jobs with status 'pending' until a worker
+    claims them, so nothing is lost on restart. At most ``per_host_limit``
+    jobs run against the same APIC host at once (a multi-site job counts
+    against every host it targets, an NDO job against its NDO); jobs for a
+    busy host wait while jobs for other hosts go ahead.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, per_host_limit: int = DEFAULT_PER_HOST_LIMIT):
+        self.db = get_database()
+        self.workers = workers
+        self.per_host_limit = per_host_limit
+        self._running_by_host: Dict[str, int] = {}
+        self._active_jobs: Set[int] = set()
+        self._wait_times: deque = deque(maxlen=WAIT_SAMPLES)
+        self._tasks = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._started = False
+
+    async def ensure_started(self):
+        """Recover interrupted jobs and start the workers, once per process"""
+        if self._started:
+            return
+        self._started = True
+        self._wakeup = asyncio.Event()
+        self._requeue_interrupted()
+        self._refresh_depth()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers; claimed jobs are requeued on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._started = False
+
+    def notify(self):
+        """Wake idle workers after a job has been enqueued"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def submitted(self):
+        """Count a newly inserted pending job and wake idle workers"""
+        metrics.queue_depth.inc()
+        self.notify()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, running jobs and recent wait times"""
+        with self.db.connection() as conn:
+            row = conn.execute("""
+                SELECT COUNT(*) AS depth, MIN(created_at) AS oldest
+                FROM provisioning_jobs
+                WHERE status = 'pending'
+            """).fetchone()
+
+        waits = sorted(self._wait_times)
+        oldest_wait = _seconds_since(row["oldest"]) if row["oldest"] else 0.0
+        return {
+            "queue_depth": row["depth"],
+            "oldest_pending_seconds": round(oldest_wait, 3),
+            "running_jobs": len(self._active_jobs),
+            "running_by_host": dict(self._running_by_host),
+            "workers": self.workers,
+            "per_host_limit": self.per_host_limit,
+            "wait_time_seconds": {
+                "samples": len(waits),
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p50": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                "max": round(waits[-1], 3) if waits else 0.0
+            }
+        }
+
+    def _requeue_interrupted(self):
+        """Put jobs left 'running' by a previous process back in the queue"""
+        with self.db.connection() as conn:
+            rows = conn.execute("SELECT id FROM provisioning_jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                if row["id"] in self._active_jobs:
+                    continue
+                conn.execute("UPDATE provisioning_jobs SET status = 'pending', progress = 0 WHERE id = ?", (row["id"],))
+                conn.execute("""
+                    INSERT INTO task_logs (job_id, task_name, status, message)
+                    VALUES (?, 'job_requeued', 'warning', 'Job was interrupted by a restart and has been requeued')
+                """, (row["id"],))
+
+    def _refresh_depth(self):
+        """Resynchronise the queue depth gauge with the table"""
+        with self.db.connection() as conn:
+            depth = conn.execute("SELECT COUNT(*) FROM provisioning_jobs WHERE status = 'pending'").fetchone()[0]
+        metrics.queue_depth.set(depth)
+
+    def _claim_next(self) -> Optional[Dict[str, Any]]:
+        """Atomically claim the oldest pending job whose APIC host has capacity"""
+        busy_hosts = [host for host, count in self._running_by_host.items() if count >= self.per_host_limit]
+        placeholders = ",".join("?" for _ in busy_hosts)
+        host_filter = f"""
+            AND COALESCE(json_extract(fabric_config, '$.apic_credentials.host'),
+                         json_extract(fabric_config, '$.ndo_credentials.host')) NOT IN ({placeholders})
+            AND NOT EXISTS (
+                SELECT 1 FROM json_each(fabric_config, '$.sites')
+                WHERE json_extract(value, '$.apic_credentials.host') IN ({placeholders})
+            )
+        """ if busy_hosts else ""
+
+        with self.db.connection() as conn:
+            candidates = conn.execute(f"""
+                SELECT id, job_type, fabric_config, created_at
+                FROM provisioning_jobs
+                WHERE status = 'pending' {host_filter}
+                ORDER BY id
+                LIMIT 10
+            """, busy_hosts * 2).fetchall()
+
+            for row in candidates:
+                claimed = conn.execute("""
+                    UPDATE provisioning_jobs SET status = 'running' WHERE id = ? AND status = 'pending'
+                """, (row["id"],)).rowcount
+                if claimed:
+                    metrics.queue_depth.dec()
+                    return {"id": row["id"], "job_type": row["job_type"], "fabric_config": row["fabric_config"],
+                            "created_at": row["created_at"]}
+        return None
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            job = self._claim_next()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Idle; correct any drift from jobs deleted while pending
+                    self._refresh_depth()
+                continue
+
+            await self._run_job(job)
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        wait = _seconds_since(job["created_at"])
+        self._wait_times.append(wait)
+        metrics.queue_wait.observe(wait)
+        service = ProvisioningService()
+        try:
+            if job["job_type"] == "ndo":
+                config = NDOJobConfig(**json.loads(job["fabric_config"]))
+                hosts = {config.ndo_credentials.host}
+                run = service.execute_ndo_schema(job_id, config)
+            else:
+                config = FabricConfig(**json.loads(job["fabric_config"]))
+                # A multi-site job holds a slot on every APIC it targets
+                hosts = {target.apic_credentials.host for target in site_targets(config)}
+                run = service.execute_provisioning(job_id, config)
+        except Exception as e:
+            service._log_task(job_id, "provisioning_error", "error", f"Invalid stored configuration: {str(e)}")
+            service._update_job_status(job_id, "failed", None)
+            return
+
+        for host in hosts:
+            self._running_by_host[host] = self._running_by_host.get(host, 0) + 1
+        self._active_jobs.add(job_id)
+        metrics.jobs_started.inc()
+        metrics.jobs_running.set(len(self._active_jobs))
+        try:
+            await run
+        finally:
+            self._active_jobs.discard(job_id)
+            metrics.jobs_running.set(len(self._active_jobs))
+            for host in hosts:
+                self._running_by_host[host] -= 1
+                if self._running_by_host[host] == 0:
+                    del self._running_by_host[host]
+            # A host slot has freed up, which may unblock a waiting job
+            self.notify()
+
+def _seconds_since(timestamp: str) -> float:
+    """Seconds since a SQLite CURRENT_TIMESTAMP value (UTC)"""
+    try:
+        created = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, (datetime.utcnow() - created).total_seconds())
+
+_queue_instance = None
+
+def get_job_queue() -> JobQueue:
+    """Get singleton job queue instance"""
+    global _queue_instance
+    if _queue_instance is None:
+        _queue_instance = JobQueue()
+    return _queue_instance
@@ -0,0 +1,200 @@
+"""
+Batched background writer for task logs, API call logs and job progress
+"""
+
+import atexit
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..models.database import Database, get_database
+from .events import job_events
+from . import metrics
+from ..clients.instrumentation import add_api_call_recorder
+
+FLUSH_INTERVAL = 0.5
+MAX_BATCH_SIZE = 500
+TERMINAL_STATUSES = ("completed", "failed")
+
+INSERT_TASK_LOG_SQL = """
+    INSERT INTO task_logs (job_id, task_name, status, message, details, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_API_LOG_SQL = """
+    INSERT INTO api_logs (job_id, host, endpoint, method, status_code, latency_ms,
+                          request_bytes, response_bytes, response_data, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE_SITE_RESULTS_SQL = """
+    UPDATE provisioning_jobs SET site_results = ? WHERE id = ?
+"""
+
+UPDATE_JOB_STATUS_SQL = """
+    UPDATE provisioning_jobs
+    SET status = ?1, progress = COALESCE(?2, progress),
+        started_at = CASE WHEN started_at IS NULL AND ?1 = 'running' THEN CURRENT_TIMESTAMP ELSE started_at END,
+        completed_at = CASE WHEN ?1 IN ('completed', 'failed') THEN CURRENT_TIMESTAMP ELSE completed_at END
+    WHERE id = ?3
+"""
+
+class TaskLogWriter:
+    """Buffers task_logs rows, api_logs rows and job progress updates in memory.
+
+    A background thread flushes the buffer with executemany in a single
+    transaction every ``flush_interval`` seconds, or as soon as
+    ``max_batch_size`` rows are waiting. Progress updates and multi-site
+    results are coalesced so only the latest state of each job is written. Terminal status changes
+    flush everything buffered before them and are written immediately.
+    """
+
+    def __init__(self, db: Database, flush_interval: float = FLUSH_INTERVAL, max_batch_size: int = MAX_BATCH_SIZE):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._logs: List[Tuple[int, str, str, str, Optional[str], str]] = []
+        self._job_updates: Dict[int, Tuple[str, Optional[int]]] = {}
+        self._site_results: Dict[int, str] = {}
+        self._api_calls: List[Tuple] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._buffer_lock)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self):
+        """Start the background flush thread"""
+        with self._buffer_lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="task-log-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flush thread and write out anything still buffered"""
+        with self._buffer_lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._wakeup.notify()
+        if thread is not None:
+            thread.join(timeout=5)
+        self.flush()
+
+    def log(self, job_id: int, task_name: str, status: str, message: str, details: Dict[str, Any] = None):
+        """Queue a task_logs row, stamped with the time of the event rather than of the flush"""
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        row = (job_id, task_name, status, message, json.dumps(details) if details else None, timestamp)
+        with self._buffer_lock:
+            self._logs.append(row)
+            if len(self._logs) >= self.max_batch_size:
+                self._wakeup.notify()
+
+    def update_job_status(self, job_id: int, status: str, progress: int = None):
+        """Queue a job progress update; terminal statuses are written at once"""
+        if status in TERMINAL_STATUSES:
+            self.flush()
+            with self._buffer_lock:
+                self._job_updates.pop(job_id, None)
+            with self.db.connection() as conn:
+                conn.execute(UPDATE_JOB_STATUS_SQL, (status, progress, job_id))
+            job_events.publish([job_id])
+            return
+
+        with self._buffer_lock:
+            previous = self._job_updates.get(job_id)
+            if progress is None and previous is not None:
+                progress = previous[1]
+            self._job_updates[job_id] = (status, progress)
+
+    def log_api_call(self, job_id: Optional[int], host: str, endpoint: str, method: str, status_code: Optional[int],
+                     latency_ms: float, request_bytes: int, response_bytes: int, response_data: Optional[str],
+                     timestamp: str):
+        """Queue an api_logs row for one APIC/NDO request"""
+        row = (job_id, host, endpoint, method, status_code, latency_ms, request_bytes, response_bytes,
+               response_data, timestamp)
+        with self._buffer_lock:
+            self._api_calls.append(row)
+            if len(self._api_calls) >= self.max_batch_size:
+                self._wakeup.notify()
+
+    def update_site_results(self, job_id: int, site_results: Dict[str, Any]):
+        """Queue the per-site results of a multi-site job (latest wins)"""
+        with self._buffer_lock:
+            self._site_results[job_id] = json.dumps(site_results)
+
+    def flush(self):
+        """Write every buffered row and progress update in one transaction"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                logs, self._logs = self._logs, []
+                job_updates, self._job_updates = self._job_updates, {}
+                site_results, self._site_results = self._site_results, {}
+                api_calls, self._api_calls = self._api_calls, []
+
+            if not logs and not job_updates and not site_results and not api_calls:
+                return
+
+            started = time.perf_counter()
+            try:
+                with self.db.connection() as conn:
+                    if logs:
+                        conn.executemany(INSERT_TASK_LOG_SQL, logs)
+                    if job_updates:
+                        conn.executemany(UPDATE_JOB_STATUS_SQL, [
+                            (status, progress, job_id) for job_id, (status, progress) in job_updates.items()
+                        ])
+                    if site_results:
+                        conn.executemany(UPDATE_SITE_RESULTS_SQL, [
+                            (results, job_id) for job_id, results in site_results.items()
+                        ])
+                    if api_calls:
+                        conn.executemany(INSERT_API_LOG_SQL, api_calls)
+            except Exception:
+                # Put the batch back in front of anything queued meanwhile
+                with self._buffer_lock:
+                    self._logs[:0] = logs
+                    for job_id, update in job_updates.items():
+                        self._job_updates.setdefault(job_id, update)
+                    for job_id, results in site_results.items():
+                        self._site_results.setdefault(job_id, results)
+                    self._api_calls[:0] = api_calls
+                raise
+
+            metrics.db_flush_duration.observe(time.perf_counter() - started)
+            metrics.db_rows_written.inc(len(logs), table="task_logs")
+            metrics.db_rows_written.inc(len(api_calls), table="api_logs")
+            metrics.db_rows_written.inc(len(job_updates) + len(site_results), table="provisioning_jobs")
+            job_events.publish([row[0] for row in logs] + list(job_updates) + list(site_results))
+
+    def _run(self):
+        while True:
+            with self._buffer_lock:
+                if not self._stopping and len(self._logs) < self.max_batch_size and len(self._api_calls) < self.max_batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Task log flush failed: {e}")
+                time.sleep(self.flush_interval)
+
+_writer_instance = None
+_writer_lock = threading.Lock()
+
+def get_log_writer() -> TaskLogWriter:
+    """Get the singleton task log writer, starting it on first use"""
+    global _writer_instance
+    if _writer_instance is None:
+        with _writer_lock:
+            if _writer_instance is None:
+                writer = TaskLogWriter(get_database())
+                writer.start()
+                add_api_call_recorder(writer.log_api_call)
+                _writer_instance = writer
+    return _writer_instance
@@ -0,0 +1,208 @@
+"""
+Per-NDO cache of sites and schemas, refreshed by update version and ETag
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..clients.ndo_client import NDOClient
+
+# Sites rarely change; they are revalidated with If-None-Match after this long.
+# The schema identity list (ids, names and update versions, no bodies) is
+# re-read after SCHEMA_LIST_TTL and decides which cached schemas are current.
+SITES_TTL = 300.0
+SCHEMA_LIST_TTL = 15.0
+
+# Host, port and username: what an NDO returns depends on who asks, so one
+# user's cached sites and schemas are never served to another
+CacheKey = Tuple[str, int, str]
+
+def schema_version(schema: Dict[str, Any]) -> Optional[str]:
+    """The version marker NDO bumps on every schema write, if it reports one"""
+    for key in ("_updateVersion", "_updatedAt"):
+        if schema.get(key) is not None:
+            return str(schema[key])
+    return None
+
+@dataclass
+class CachedSchema:
+    document: Dict[str, Any]
+    version: Optional[str]
+    etag: Optional[str]
+    # Set when we wrote to the schema ourselves
+    stale: bool = False
+
+@dataclass
+class NDOState:
+    """What one NDO has, as last seen"""
+    sites: List[Dict[str, Any]] = field(default_factory=list)
+    sites_etag: Optional[str] = None
+    sites_at: Optional[float] = None
+    # Schema id -> identity entry (id, displayName, templates, update version)
+    schemas: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    schemas_at: Optional[float] = None
+    documents: Dict[str, CachedSchema] = field(default_factory=dict)
+
+class NDOCache:
+    """Keeps each NDO's sites and schemas in memory, per user.
+
+    Schema bodies run to megabytes, so a cached schema is only downloaded
+    again when the identity list shows a newer update version, or when we
+    wrote to it ourselves; even then it is fetched with If-None-Match so an
+    unchanged schema costs a 304. Concurrent callers share one query per
+    NDO and kind.
+    """
+
+    def __init__(self, sites_ttl: float = SITES_TTL, schema_list_ttl: float = SCHEMA_LIST_TTL):
+        self.sites_ttl = sites_ttl
+        self.schema_list_ttl = schema_list_ttl
+        self._states: Dict[CacheKey, NDOState] = {}
+        self._locks: Dict[Tuple[int, CacheKey, str], asyncio.Lock] = {}
+        self._guard = threading.Lock()
+        self.stats = {"hits": 0, "site_queries": 0, "schema_list_queries": 0, "schema_downloads": 0, "not_modified": 0}
+
+    @staticmethod
+    def _key(client: NDOClient) -> CacheKey:
+        return client.host, client.port, client.username
+
+    def _state(self, client: NDOClient) -> NDOState:
+        return self._states.setdefault(self._key(client), NDOState())
+
+    def _lock(self, client: NDOClient, kind: str) -> asyncio.Lock:
+        with self._guard:
+            return self._locks.setdefault((id(asyncio.get_running_loop()), self._key(client), kind), asyncio.Lock())
+
+    @staticmethod
+    def _fresh(loaded_at: Optional[float], ttl: float) -> bool:
+        return loaded_at is not None and time.monotonic() - loaded_at < ttl
+
+    async def get_sites(self, client: NDOClient, refresh: bool = False) -> Dict[str, Any]:
+        """Sites managed by the NDO"""
+        state = self._state(client)
+        async with self._lock(client, "sites"):
+            if not refresh and self._fresh(state.sites_at, self.sites_ttl):
+                self.stats["hits"] += 1
+                return {"success": True, "sites": state.sites, "cached": True}
+
+            result = await client.get_sites(etag=None if refresh else state.sites_etag)
+            self.stats["site_queries"] += 1
+            if not result["success"]:
+                return result
+            if result["not_modified"]:
+                self.stats["not_modified"] += 1
+            else:
+                state.sites = result["sites"]
+            state.sites_etag = result["etag"]
+            state.sites_at = time.monotonic()
+            return {"success": True, "sites": state.sites, "cached": result["not_modified"]}
+
+    async def site_ids(self, client: NDOClient) -> Dict[str, Any]:
+        """Map site names to NDO site ids"""
+        result = await self.get_sites(client)
+        if not result["success"]:
+            return result
+        return {"success": True, "site_ids": {site.get("name"): site.get("id") for site in result["sites"]}}
+
+    async def list_schemas(self, client: NDOClient, refresh: bool = False) -> Dict[str, Any]:
+        """Identity (id, name, templates, version) of every schema, without bodies"""
+        state = self._state(client)
+        async with self._lock(client, "schemas"):
+            if not refresh and self._fresh(state.schemas_at, self.schema_list_ttl):
+                self.stats["hits"] += 1
+                return {"success": True, "schemas": list(state.schemas.values()), "cached": True}
+
+            result = await client.list_schemas()
+            self.stats["schema_list_queries"] += 1
+            if not result["success"]:
+                return result
+            state.schemas = {schema["id"]: schema for schema in result["schemas"]}
+            state.schemas_at = time.monotonic()
+            # Schemas deleted on the NDO drop out of the cache too
+            for schema_id in list(state.documents):
+                if schema_id not in state.schemas:
+                    del state.documents[schema_id]
+            return {"success": True, "schemas": result["schemas"], "cached": False}
+
+    async def find_schema(self, client: NDOClient, name: str) -> Dict[str, Any]:
+        """Look up a schema id by display name; schema_id is None if there is none"""
+        result = await self.list_schemas(client)
+        if not result["success"]:
+            return result
+        schema_id = next((schema["id"] for schema in result["schemas"] if schema.get("displayName") == name), None)
+        return {"success": True, "schema_id": schema_id}
+
+    async def get_schema(self, client: NDOClient, schema_id: str, refresh: bool = False) -> Dict[str, Any]:
+        """A whole schema document, downloaded only if it changed since it was cached"""
+        state = self._state(client)
+        listed = await self.list_schemas(client)
+        if not listed["success"]:
+            return listed
+
+        async with self._lock(client, f"schema:{schema_id}"):
+            cached = state.documents.get(schema_id)
+            version = schema_version(state.schemas.get(schema_id, {}))
+            if cached is not None and not refresh and not cached.stale and version is not None and version == cached.version:
+                self.stats["hits"] += 1
+                return {"success": True, "schema": cached.document, "cached": True}
+
+            # Without a version to compare (or once it moved on) ask the NDO,
+            # which answers 304 if our copy is still current
+            result = await client.get_schema(schema_id, etag=cached.etag if cached is not None and not refresh else None)
+            if not result["success"]:
+                return result
+            if result["not_modified"]:
+                self.stats["not_modified"] += 1
+                cached.stale = False
+                cached.version = version or cached.version
+            else:
+                self.stats["schema_downloads"] += 1
+                cached = CachedSchema(document=result["schema"], version=schema_version(result["schema"]), etag=result["etag"])
+                state.documents[schema_id] = cached
+            return {"success": True, "schema": cached.document, "cached": result["not_modified"]}
+
+    def invalidate(self, host: str, port: int = 443, schema_id: Optional[str] = None):
+        """Forget what changed after one of our own writes to an NDO.
+
+        A write changes the NDO for every user, so every user's cache of
+        it is affected. The schema list is re-read on next use; a written
+        schema is revalidated, and kept if the NDO says it is unchanged.
+        """
+        for (state_host, state_port, _), state in list(self._states.items()):
+            if (state_host, state_port) != (host, port):
+                continue
+            state.schemas_at = None
+            if schema_id is None:
+                state.sites_at = None
+                for cached in state.documents.values():
+                    cached.stale = True
+            elif schema_id in state.documents:
+                state.documents[schema_id].stale = True
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """What is cached for each NDO and user"""
+        now = time.monotonic()
+        return [
+            {
+                "host": host,
+                "port": port,
+                "username": username,
+                "sites": len(state.sites),
+                "schemas": len(state.schemas),
+                "schema_documents": len(state.documents),
+                "sites_age_seconds": round(now - state.sites_at, 1) if state.sites_at is not None else None,
+                "schemas_age_seconds": round(now - state.schemas_at, 1) if state.schemas_at is not None else None
+            }
+            for (host, port, username), state in list(self._states.items())
+        ]
+
+_cache_instance = None
+
+def get_ndo_cache() -> NDOCache:
+    """Get singleton NDO site and schema cache instance"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = NDOCache()
+    return _cache_instance
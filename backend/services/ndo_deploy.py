@@ -0,0 +1,155 @@
+"""
+Concurrent NDO template deployment with one shared status watcher
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..models.ndo_models import SchemaConfig
+from ..clients.ndo_client import NDOClient
+from ..clients.instrumentation import current_job_id
+from .log_writer import get_log_writer
+
+# Deployment status polling backs off while nothing finishes and starts
+# over at POLL_INITIAL whenever a deployment completes or a new one is added
+POLL_INITIAL = 0.5
+POLL_MAX = 10.0
+POLL_BACKOFF = 1.5
+DEPLOY_TIMEOUT = 1800.0
+
+SUCCEEDED_STATUSES = {"succeeded", "success", "completed", "deployed"}
+FAILED_STATUSES = {"failed", "failure", "error", "aborted"}
+
+class DeploymentWatcher:
+    """Polls every in-flight deployment of one NDO from a single task.
+
+    ``watch`` returns a future that resolves to {"success", "status",
+    "deployment"/"error", "seconds"} once the deployment succeeds, fails
+    or runs past ``timeout``. All pending ids are polled together each
+    round, so many deployments cost one polling loop rather than one each.
+    Each deployment is polled with the client that started it, so every
+    job's requests carry its own session token.
+    """
+
+    def __init__(self, initial_interval: float = POLL_INITIAL,
+                 max_interval: float = POLL_MAX, timeout: float = DEPLOY_TIMEOUT):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.interval = initial_interval
+        self._pending: Dict[str, Tuple[asyncio.Future, float, NDOClient]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"polls": 0, "status_requests": 0}
+
+    def watch(self, deployment_id: str, client: NDOClient) -> "asyncio.Future[Dict[str, Any]]":
+        """Track a deployment until it finishes, polling its status with ``client``"""
+        loop = asyncio.get_running_loop()
+        if deployment_id in self._pending:
+            future, started, _ = self._pending[deployment_id]
+            # The newest caller's session is the one most likely still valid
+            self._pending[deployment_id] = (future, started, client)
+            return future
+        future = loop.create_future()
+        self._pending[deployment_id] = (future, time.monotonic(), client)
+        self.interval = self.initial_interval
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return future
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            deployment_ids = list(self._pending)
+            results = await asyncio.gather(*(
+                self._pending[i][2].get_deployment_status(i) for i in deployment_ids
+            ))
+            self.stats["polls"] += 1
+            self.stats["status_requests"] += len(deployment_ids)
+
+            finished = False
+            for deployment_id, result in zip(deployment_ids, results):
+                outcome = self._outcome(deployment_id, result)
+                if outcome is not None:
+                    future, _, _ = self._pending.pop(deployment_id)
+                    if not future.done():
+                        future.set_result(outcome)
+                    finished = True
+            self.interval = self.initial_interval if finished else min(self.max_interval, self.interval * POLL_BACKOFF)
+
+    def _outcome(self, deployment_id: str, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The final result of a deployment, or None while it is still running"""
+        seconds = round(time.monotonic() - self._pending[deployment_id][1], 3)
+        if result["success"]:
+            deployment = result["deployment"]
+            status = str(deployment.get("status", "")).lower()
+            if status in SUCCEEDED_STATUSES:
+                return {"success": True, "status": status, "deployment": deployment, "seconds": seconds}
+            if status in FAILED_STATUSES:
+                error = deployment.get("message") or deployment.get("error") or f"Deployment {status}"
+                return {"success": False, "status": status, "error": error, "seconds": seconds}
+        if seconds >= self.timeout:
+            error = result.get("error") or f"Deployment still {result.get('deployment', {}).get('status', 'pending')}"
+            return {"success": False, "status": "timeout", "error": f"Timed out after {seconds:.0f}s: {error}", "seconds": seconds}
+        # Still running, or a status query failed; try again next round
+        return None
+
+_watchers: Dict[Tuple[int, str, int], DeploymentWatcher] = {}
+_watchers_lock = threading.Lock()
+
+def get_deployment_watcher(client: NDOClient) -> DeploymentWatcher:
+    """Get the watcher shared by every deployment to ``client``'s NDO on this event loop"""
+    key = (id(asyncio.get_running_loop()), client.host, client.port)
+    with _watchers_lock:
+        watcher = _watchers.get(key)
+        if watcher is None:
+            watcher = DeploymentWatcher()
+            _watchers[key] = watcher
+        return watcher
+
+async def deploy_schema(client: NDOClient, schema_id: str, config: SchemaConfig,
+                        site_ids: Optional[Dict[str, str]] = None, job_id: Optional[int] = None) -> Dict[str, Any]:
+    """Deploy every template of a schema to each of its sites concurrently.
+
+    Each (template, site) pair is its own deployment, so all of them run
+    side by side and complete independently. Starts and completions are
+    written to task_logs as deploy_<template>_<site> when there is a job
+    (``job_id``, or the job the caller is running for).
+    """
+    site_ids = site_ids or {}
+    job_id = job_id if job_id is not None else current_job_id.get()
+    watcher = get_deployment_watcher(client)
+    log_writer = get_log_writer()
+
+    def log(task_name: str, status: str, message: str, details: Dict[str, Any] = None):
+        if job_id is not None:
+            log_writer.log(job_id, task_name, status, message, details)
+
+    async def deploy(template_name: str, site: str) -> Dict[str, Any]:
+        task_name = f"deploy_{template_name}_{site}"
+        record = {"template": template_name, "site": site, "deployment_id": None}
+        started = await client.deploy_template(schema_id, template_name, [site_ids.get(site, site)])
+        if not started["success"]:
+            log(task_name, "error", f"Failed to start deployment of '{template_name}' to {site}: {started['error']}", record)
+            return {**record, "success": False, "status": "not_started", "error": started["error"]}
+
+        record["deployment_id"] = started["deployment_id"]
+        log(task_name, "info", f"Deploying template '{template_name}' to {site}", record)
+        outcome = await watcher.watch(started["deployment_id"], client)
+        if outcome["success"]:
+            log(task_name, "success", f"Template '{template_name}' deployed to {site} in {outcome['seconds']:.1f}s", record)
+        else:
+            log(task_name, "error", f"Deployment of '{template_name}' to {site} failed: {outcome['error']}", record)
+        return {**record, "success": outcome["success"], "status": outcome["status"],
+                "error": outcome.get("error"), "seconds": outcome["seconds"]}
+
+    deployments: List[Dict[str, Any]] = await asyncio.gather(*(
+        deploy(template.name, site) for template in config.templates for site in template.sites
+    ))
+    failed = [d for d in deployments if not d["success"]]
+    return {
+        "success": not failed,
+        "deployments": deployments,
+        "error": f"{len(failed)} of {len(deployments)} deployments failed" if failed else None
+    }
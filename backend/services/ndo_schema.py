@@ -0,0 +1,192 @@
+"""
+Compile a SchemaConfig into one NDO schema document or one JSON-Patch batch
+"""
+
+from typing import Dict, Any, List, Optional
+
+from ..models.ndo_models import SchemaConfig, SchemaTemplate
+from ..clients.ndo_client import (
+    NDOClient,
+    build_template_vrf,
+    build_template_bd,
+    build_template_anp
+)
+from .ndo_cache import get_ndo_cache
+
+# Template collections of named objects the builder manages
+TEMPLATE_COLLECTIONS = ["vrfs", "bds", "anps"]
+
+def build_template(template: SchemaTemplate, tenant_ids: Dict[str, str],
+                   schema_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build one template with all its VRFs, BDs, ANPs and EPGs"""
+    tenant = template.tenants[0] if template.tenants else ""
+    return {
+        "name": template.name,
+        "displayName": template.name,
+        "description": template.description or "",
+        "tenantId": tenant_ids.get(tenant, tenant),
+        "vrfs": [build_template_vrf(vrf.dict()) for vrf in template.vrfs],
+        "bds": [build_template_bd(bd.dict(), template.name, schema_id) for bd in template.bds],
+        "anps": [build_template_anp(anp.dict(), template.name, schema_id) for anp in template.anps],
+        "contracts": [],
+        "filters": [],
+        "externalEpgs": [],
+        "serviceGraphs": [],
+        "intersiteL3outs": []
+    }
+
+def build_schema_document(config: SchemaConfig, site_ids: Optional[Dict[str, str]] = None,
+                          tenant_ids: Optional[Dict[str, str]] = None,
+                          schema_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build a complete schema document that creates everything in one POST.
+
+    ``site_ids`` and ``tenant_ids`` map names to NDO ids; names without an
+    entry are used as ids.
+    """
+    site_ids = site_ids or {}
+    tenant_ids = tenant_ids or {}
+    return {
+        "displayName": config.name,
+        "description": config.description or "",
+        "templates": [build_template(template, tenant_ids, schema_id) for template in config.templates],
+        "sites": [
+            {"siteId": site_ids.get(site, site), "templateName": template.name}
+            for template in config.templates
+            for site in template.sites
+        ]
+    }
+
+def _ref_key(value: Any) -> Any:
+    """Compare references whether NDO returned them as paths or objects"""
+    if isinstance(value, dict) and "templateName" in value:
+        named = next(((key, item) for key, item in value.items() if key.endswith("Name") and key != "templateName"), None)
+        if named is None:
+            return value
+        return (value["templateName"], *named)
+    if isinstance(value, str) and value.startswith("/schemas/"):
+        parts = value.strip("/").split("/")
+        if len(parts) == 6:
+            return (parts[3], parts[4].rstrip("s") + "Name", parts[5])
+    return value
+
+def _matches(current: Any, desired: Any) -> bool:
+    """Whether the schema's copy of a value has everything the builder set.
+
+    NDO fills in defaults (a subnet's querier or noDefaultGateway, say), so
+    only the keys we set are compared; list entries are paired by ip or
+    name when they have one, otherwise by position.
+    """
+    desired_key, current_key = _ref_key(desired), _ref_key(current)
+    if isinstance(desired_key, tuple) or isinstance(current_key, tuple):
+        return desired_key == current_key
+    if isinstance(desired, dict):
+        return isinstance(current, dict) and all(_matches(current.get(key), value) for key, value in desired.items())
+    if isinstance(desired, list):
+        current = [] if current is None else current
+        if not isinstance(current, list) or len(current) != len(desired):
+            return False
+        identity = next((key for key in ("ip", "name") if all(isinstance(item, dict) and key in item for item in desired)), None)
+        if identity is not None:
+            by_identity = {item.get(identity): item for item in current if isinstance(item, dict)}
+            return all(_matches(by_identity.get(item[identity]), item) for item in desired)
+        return all(_matches(item, value) for item, value in zip(current, desired))
+    return current == desired
+
+def _differs(current: Dict[str, Any], desired: Dict[str, Any], ignore: tuple = ()) -> bool:
+    """Whether any attribute the builder sets differs from the schema's copy"""
+    return any(not _matches(current.get(key), value) for key, value in desired.items() if key not in ignore)
+
+def build_schema_patch(config: SchemaConfig, existing: Dict[str, Any], site_ids: Optional[Dict[str, str]] = None,
+                       tenant_ids: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """JSON-Patch operations that bring an existing schema in line with the config.
+
+    Missing templates, objects, EPGs and site associations are added and
+    changed objects replaced; nothing the config leaves out is removed.
+    """
+    desired = build_schema_document(config, site_ids, tenant_ids, schema_id=existing.get("id"))
+    current_templates = {template["name"]: template for template in existing.get("templates", [])}
+    operations: List[Dict[str, Any]] = []
+
+    if existing.get("description", "") != desired["description"]:
+        operations.append({"op": "replace", "path": "/description", "value": desired["description"]})
+
+    for template in desired["templates"]:
+        name = template["name"]
+        current = current_templates.get(name)
+        if current is None:
+            operations.append({"op": "add", "path": "/templates/-", "value": template})
+            continue
+
+        if current.get("tenantId") != template["tenantId"]:
+            operations.append({"op": "replace", "path": f"/templates/{name}/tenantId", "value": template["tenantId"]})
+
+        for collection in TEMPLATE_COLLECTIONS:
+            current_objects = {obj["name"]: obj for obj in current.get(collection) or []}
+            for obj in template[collection]:
+                path = f"/templates/{name}/{collection}"
+                current_obj = current_objects.get(obj["name"])
+                if current_obj is None:
+                    operations.append({"op": "add", "path": f"{path}/-", "value": obj})
+                elif collection != "anps":
+                    if _differs(current_obj, obj):
+                        operations.append({"op": "replace", "path": f"{path}/{obj['name']}", "value": obj})
+                else:
+                    operations.extend(_anp_operations(f"{path}/{obj['name']}", current_obj, obj))
+
+    current_sites = {(site.get("siteId"), site.get("templateName")) for site in existing.get("sites") or []}
+    for site in desired["sites"]:
+        if (site["siteId"], site["templateName"]) not in current_sites:
+            operations.append({"op": "add", "path": "/sites/-", "value": site})
+
+    return operations
+
+def _anp_operations(path: str, current: Dict[str, Any], desired: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Patch an existing ANP EPG by EPG so EPGs the config omits are kept"""
+    operations = []
+    for key in ("displayName", "description"):
+        if current.get(key) != desired[key]:
+            operations.append({"op": "replace", "path": f"{path}/{key}", "value": desired[key]})
+    current_epgs = {epg["name"]: epg for epg in current.get("epgs") or []}
+    for epg in desired["epgs"]:
+        current_epg = current_epgs.get(epg["name"])
+        if current_epg is None:
+            operations.append({"op": "add", "path": f"{path}/epgs/-", "value": epg})
+        elif _differs(current_epg, epg):
+            operations.append({"op": "replace", "path": f"{path}/epgs/{epg['name']}", "value": epg})
+    return operations
+
+async def apply_schema(client: NDOClient, config: SchemaConfig, schema_id: Optional[str] = None,
+                       site_ids: Optional[Dict[str, str]] = None,
+                       tenant_ids: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Create or update a whole schema in as few requests as possible.
+
+    A new schema is one lookup plus one POST of the complete document; an
+    existing one is read once and patched with a single JSON-Patch batch
+    (no request at all if nothing changed). Lookups and reads go through
+    the NDO cache, so an unchanged schema is not downloaded again. Passing
+    ``schema_id`` skips the lookup.
+    """
+    cache = get_ndo_cache()
+    if schema_id is None:
+        lookup = await cache.find_schema(client, config.name)
+        if not lookup["success"]:
+            return lookup
+        schema_id = lookup["schema_id"]
+
+    if schema_id is None:
+        result = await client.post_schema(build_schema_document(config, site_ids, tenant_ids))
+        cache.invalidate(client.host, client.port, result.get("schema_id"))
+        if not result["success"]:
+            return result
+        return {"success": True, "schema_id": result["schema_id"], "created": True, "operations": 0}
+
+    current = await cache.get_schema(client, schema_id)
+    if not current["success"]:
+        return current
+    operations = build_schema_patch(config, {"id": schema_id, **current["schema"]}, site_ids, tenant_ids)
+    if operations:
+        result = await client.patch_schema(schema_id, operations)
+        cache.invalidate(client.host, client.port, schema_id)
+        if not result["success"]:
+            return result
+    return {"success": True, "schema_id": schema_id, "created": False, "operations": len(operations)}
@@ -3,91 +3,167 @@ Core provisioning service
 """
 
 import asyncio
-import json
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Union
 import traceback
 
-from ..models.aci_models import FabricConfig
+from ..models.aci_models import FabricConfig, ExecutionMode, SiteTarget, APICCredentials
+from ..models.ndo_models import NDOJobConfig
 from ..models.database import get_database
 from ..clients.apic_client import APICClient
+from ..clients.session_manager import get_session_manager, get_ndo_session_manager
+from ..clients.instrumentation import current_job_id
 from ..clients.ndo_client import NDOClient
+from .bulk import build_bulk_plan, RN_FORMATS, KIND_LABELS
+from .scheduler import build_task_graph, DependencyScheduler
+from .log_writer import get_log_writer
+from .inventory import FabricSnapshot, get_fabric_inventory
+from .validation import ConfigValidator
+from .expansion import iter_config_objects, count_config_objects, expand_config
+from .ndo_cache import get_ndo_cache
+from .ndo_schema import apply_schema
+from .ndo_deploy import deploy_schema
+from . import metrics
+from .diff import (
+    diff_config,
+    referenced_tenants,
+    DIFF_CLASSES,
+    CREATE as DIFF_CREATE,
+    MODIFY as DIFF_MODIFY,
+    SKIP as DIFF_SKIP
+)
+
+# APICClient method that creates each kind of object
+CREATE_METHODS = {
+    "tenant": "create_tenant",
+    "vrf": "create_vrf",
+    "bd": "create_bridge_domain",
+    "ap": "create_application_profile",
+    "epg": "create_epg"
+}
+
+# Modes that can push a parametrized template's objects as they are generated;
+# bulk trees and diffs need the whole object set up front
+STREAMING_MODES = (ExecutionMode.SEQUENTIAL, ExecutionMode.PARALLEL)
 
 class ProvisioningService:
     """Core service for ACI/NDO provisioning"""
     
     def __init__(self):
         self.db = get_database()
+        self.log_writer = get_log_writer()
     
     async def execute_provisioning(self, job_id: int, config: FabricConfig):
         """Execute provisioning workflow"""
+        # Tags every APIC call made on behalf of this job in api_logs
+        job_token = current_job_id.set(job_id)
+        try:
+            if config.sites:
+                await self._execute_multi_site(job_id, config)
+            else:
+                await self._execute_single_site(job_id, config)
+        finally:
+            current_job_id.reset(job_token)
+    
+    async def execute_ndo_schema(self, job_id: int, config: NDOJobConfig):
+        """Apply a whole NDO schema, then deploy its templates to their sites.
+
+        The schema is one POST if it is new and one JSON-Patch batch if not.
+        Every (template, site) deployment then runs concurrently, and each
+        one's completion is logged as deploy_<template>_<site>.
+        """
+        job_token = current_job_id.set(job_id)
+        credentials = config.ndo_credentials
+        schema = config.ndo_schema
+        ndo_client = None
+        try:
+            self._update_job_status(job_id, "running", 0)
+            self._log_task(job_id, "provisioning_start", "info", f"Applying NDO schema '{schema.name}'")
+            
+            self._log_task(job_id, "ndo_auth", "info", "Authenticating with NDO")
+            auth_result = await get_ndo_session_manager().get_client(
+                host=credentials.host,
+                username=credentials.username,
+                password=credentials.password,
+                port=credentials.port,
+                verify_ssl=credentials.verify_ssl
+            )
+            if not auth_result["success"]:
+                raise Exception(f"NDO authentication failed: {auth_result['error']}")
+            ndo_client = auth_result["client"]
+            
+            sites = await get_ndo_cache().site_ids(ndo_client)
+            if not sites["success"]:
+                raise Exception(f"Failed to read NDO sites: {sites['error']}")
+            self._update_job_status(job_id, "running", 20)
+            
+            result = await apply_schema(ndo_client, schema, site_ids=sites["site_ids"])
+            if not result["success"]:
+                raise Exception(f"Failed to apply schema '{schema.name}': {result['error']}")
+            if result["created"]:
+                message = f"Schema '{schema.name}' created"
+            elif result["operations"]:
+                message = f"Schema '{schema.name}' updated with {result['operations']} patch operation(s)"
+            else:
+                message = f"Schema '{schema.name}' already up to date"
+            self._log_task(job_id, "apply_schema", "success", message,
+                           {"schema_id": result["schema_id"], "operations": result["operations"]})
+            
+            if config.deploy:
+                self._update_job_status(job_id, "running", 40)
+                deployed = await deploy_schema(ndo_client, result["schema_id"], schema, sites["site_ids"], job_id)
+                if not deployed["success"]:
+                    raise Exception(deployed["error"])
+                self._log_task(job_id, "deploy_schema", "success",
+                               f"{len(deployed['deployments'])} deployment(s) completed")
+            
+            self._update_job_status(job_id, "completed", 100)
+            self._log_task(job_id, "provisioning_complete", "success", "Provisioning workflow completed successfully")
+            
+        except Exception as e:
+            if ndo_client is not None:
+                # The session may be what failed; the next job logs in afresh
+                get_ndo_session_manager().discard(ndo_client)
+            self._log_task(job_id, "provisioning_error", "error", f"Provisioning failed: {str(e)}",
+                           {"traceback": traceback.format_exc()})
+            self._update_job_status(job_id, "failed", None)
+        finally:
+            current_job_id.reset(job_token)
+            self.log_writer.flush()
+    
+    async def _execute_single_site(self, job_id: int, config: FabricConfig):
+        """Provision one APIC"""
         try:
             self._update_job_status(job_id, "running", 0)
             self._log_task(job_id, "provisioning_start", "info", "Starting provisioning workflow")
             
-            apic_client = APICClient(
+            self._log_task(job_id, "apic_auth", "info", "Authenticating with APIC")
+            auth_result = await get_session_manager().get_client(
                 host=config.apic_credentials.host,
                 username=config.apic_credentials.username,
                 password=config.apic_credentials.password,
                 port=config.apic_credentials.port,
                 verify_ssl=config.apic_credentials.verify_ssl
             )
-            
-            self._log_task(job_id, "apic_auth", "info", "Authenticating with APIC")
-            auth_result = await apic_client.authenticate()
             if not auth_result["success"]:
                 raise Exception(f"APIC authentication failed: {auth_result['error']}")
+            apic_client = auth_result["client"]
             
             self._update_job_status(job_id, "running", 10)
             
-            for i, tenant in enumerate(config.tenants):
-                self._log_task(job_id, f"create_tenant_{tenant.name}", "info", f"Creating tenant: {tenant.name}")
-                result = await apic_client.create_tenant(tenant.dict())
-                if not result["success"]:
-                    self._log_task(job_id, f"create_tenant_{tenant.name}", "error", f"Failed: {result['error']}")
-                else:
-                    self._log_task(job_id, f"create_tenant_{tenant.name}", "success", "Tenant created successfully")
-                
-                progress = 10 + (20 * (i + 1) / len(config.tenants))
-                self._update_job_status(job_id, "running", int(progress))
-            
-            for i, vrf in enumerate(config.vrfs):
-                self._log_task(job_id, f"create_vrf_{vrf.name}", "info", f"Creating VRF: {vrf.name}")
-                result = await apic_client.create_vrf(vrf.dict())
-                if not result["success"]:
-                    self._log_task(job_id, f"create_vrf_{vrf.name}", "error", f"Failed: {result['error']}")
-                else:
-                    self._log_task(job_id, f"create_vrf_{vrf.name}", "success", "VRF created successfully")
-                
-                progress = 30 + (30 * (i + 1) / len(config.vrfs))
-                self._update_job_status(job_id, "running", int(progress))
-            
-            for i, bd in enumerate(config.bridge_domains):
-                self._log_task(job_id, f"create_bd_{bd.name}", "info", f"Creating Bridge Domain: {bd.name}")
-                result = await apic_client.create_bridge_domain(bd.dict())
-                if not result["success"]:
-                    self._log_task(job_id, f"create_bd_{bd.name}", "error", f"Failed: {result['error']}")
-                else:
-                    self._log_task(job_id, f"create_bd_{bd.name}", "success", "Bridge Domain created successfully")
-                
-                progress = 60 + (30 * (i + 1) / len(config.bridge_domains))
-                self._update_job_status(job_id, "running", int(progress))
-            
-            for i, app_profile in enumerate(config.app_profiles):
-                self._log_task(job_id, f"create_ap_{app_profile.name}", "info", f"Creating Application Profile: {app_profile.name}")
-                result = await apic_client.create_application_profile(app_profile.dict())
-                if not result["success"]:
-                    self._log_task(job_id, f"create_ap_{app_profile.name}", "error", f"Failed: {result['error']}")
-                else:
-                    self._log_task(job_id, f"create_ap_{app_profile.name}", "success", "Application Profile created successfully")
-            
-            for i, epg in enumerate(config.epgs):
-                self._log_task(job_id, f"create_epg_{epg.name}", "info", f"Creating EPG: {epg.name}")
-                result = await apic_client.create_epg(epg.dict())
-                if not result["success"]:
-                    self._log_task(job_id, f"create_epg_{epg.name}", "error", f"Failed: {result['error']}")
-                else:
-                    self._log_task(job_id, f"create_epg_{epg.name}", "success", "EPG created successfully")
+            if config.expansion is not None and config.execution_mode not in STREAMING_MODES:
+                config = expand_config(config)
+            
+            if config.expansion is not None:
+                await self._execute_streaming(job_id, config, apic_client)
+            elif config.execution_mode == ExecutionMode.BULK:
+                await self._execute_bulk(job_id, config, apic_client)
+            elif config.execution_mode == ExecutionMode.PARALLEL:
+                await self._execute_parallel(job_id, config, apic_client)
+            elif config.execution_mode == ExecutionMode.DIFF:
+                await self._execute_diff(job_id, config, apic_client)
+            else:
+                await self._execute_sequential(job_id, config, apic_client)
             
             self._update_job_status(job_id, "completed", 100)
             self._log_task(job_id, "provisioning_complete", "success", "Provisioning workflow completed successfully")
@@ -96,44 +172,296 @@ class ProvisioningService:
             error_msg = f"Provisioning failed: {str(e)}"
             self._log_task(job_id, "provisioning_error", "error", error_msg, {"traceback": traceback.format_exc()})
             self._update_job_status(job_id, "failed", None)
+        finally:
+            # Objects were (or may have been) pushed; the cached inventory is stale
+            get_fabric_inventory().invalidate(config.apic_credentials.host, config.apic_credentials.port)
+            self.log_writer.flush()
     
-    async def validate_configuration(self, config: FabricConfig) -> Dict[str, Any]:
-        """Validate configuration before provisioning"""
-        errors = []
-        warnings = []
+    async def _execute_multi_site(self, job_id: int, config: FabricConfig):
+        """Run the same configuration against every site's APIC concurrently"""
+        targets = site_targets(config)
+        results = {
+            target.site_code.value: {"host": target.apic_credentials.host, "status": "pending", "progress": 0, "error": None}
+            for target in targets
+        }
+        
+        def report(site_code: str, status: str, progress: int = None, error: str = None):
+            result = results[site_code]
+            result["status"] = status
+            if progress is not None:
+                result["progress"] = progress
+            if error:
+                result["error"] = error
+            self.log_writer.update_site_results(job_id, results)
+            if status == "running":
+                # Overall progress is the average over sites
+                self._update_job_status(job_id, "running", sum(r["progress"] for r in results.values()) // len(results))
         
-        if not config.tenants:
-            errors.append("At least one tenant must be specified")
+        try:
+            self._update_job_status(job_id, "running", 0)
+            if len(results) != len(targets):
+                raise Exception("Each site may only be targeted once")
+            self.log_writer.update_site_results(job_id, results)
+            self._log_task(job_id, "multi_site_start", "info", f"Provisioning {len(targets)} sites concurrently: {', '.join(results)}")
+            
+            await asyncio.gather(*(
+                SiteProvisioningService(target.site_code.value, report).execute_provisioning(job_id, site_config(config, target))
+                for target in targets
+            ))
+            
+            failed = [site_code for site_code, result in results.items() if result["status"] != "completed"]
+            if failed:
+                self._log_task(job_id, "multi_site_complete", "error", f"{len(failed)} of {len(results)} sites failed: {', '.join(failed)}", {"sites": results})
+                self._update_job_status(job_id, "failed", None)
+            else:
+                self._log_task(job_id, "multi_site_complete", "success", f"All {len(results)} sites provisioned successfully", {"sites": results})
+                self._update_job_status(job_id, "completed", 100)
+            
+        except Exception as e:
+            error_msg = f"Multi-site provisioning failed: {str(e)}"
+            self._log_task(job_id, "provisioning_error", "error", error_msg, {"traceback": traceback.format_exc()})
+            self._update_job_status(job_id, "failed", None)
+        finally:
+            self.log_writer.flush()
+    
+    async def _execute_sequential(self, job_id: int, config: FabricConfig, apic_client: APICClient):
+        """Push objects one POST at a time, in dependency order"""
+        for i, tenant in enumerate(config.tenants):
+            self._log_task(job_id, f"create_tenant_{tenant.name}", "info", f"Creating tenant: {tenant.name}")
+            result = await apic_client.create_tenant(tenant.dict())
+            if not result["success"]:
+                self._log_task(job_id, f"create_tenant_{tenant.name}", "error", f"Failed: {result['error']}")
+            else:
+                self._log_task(job_id, f"create_tenant_{tenant.name}", "success", "Tenant created successfully")
+            
+            progress = 10 + (20 * (i + 1) / len(config.tenants))
+            self._update_job_status(job_id, "running", int(progress))
         
-        tenant_names = {t.name for t in config.tenants}
-        for vrf in config.vrfs:
-            if vrf.tenant not in tenant_names:
-                errors.append(f"VRF '{vrf.name}' references non-existent tenant '{vrf.tenant}'")
+        for i, vrf in enumerate(config.vrfs):
+            self._log_task(job_id, f"create_vrf_{vrf.name}", "info", f"Creating VRF: {vrf.name}")
+            result = await apic_client.create_vrf(vrf.dict())
+            if not result["success"]:
+                self._log_task(job_id, f"create_vrf_{vrf.name}", "error", f"Failed: {result['error']}")
+            else:
+                self._log_task(job_id, f"create_vrf_{vrf.name}", "success", "VRF created successfully")
+            
+            progress = 30 + (30 * (i + 1) / len(config.vrfs))
+            self._update_job_status(job_id, "running", int(progress))
         
-        vrf_keys = {f"{vrf.tenant}.{vrf.name}" for vrf in config.vrfs}
-        for bd in config.bridge_domains:
-            if bd.tenant not in tenant_names:
-                errors.append(f"Bridge Domain '{bd.name}' references non-existent tenant '{bd.tenant}'")
+        for i, bd in enumerate(config.bridge_domains):
+            self._log_task(job_id, f"create_bd_{bd.name}", "info", f"Creating Bridge Domain: {bd.name}")
+            result = await apic_client.create_bridge_domain(bd.dict())
+            if not result["success"]:
+                self._log_task(job_id, f"create_bd_{bd.name}", "error", f"Failed: {result['error']}")
+            else:
+                self._log_task(job_id, f"create_bd_{bd.name}", "success", "Bridge Domain created successfully")
             
-            vrf_key = f"{bd.tenant}.{bd.vrf}"
-            if vrf_key not in vrf_keys:
-                errors.append(f"Bridge Domain '{bd.name}' references non-existent VRF '{bd.vrf}' in tenant '{bd.tenant}'")
+            progress = 60 + (30 * (i + 1) / len(config.bridge_domains))
+            self._update_job_status(job_id, "running", int(progress))
         
+        for i, app_profile in enumerate(config.app_profiles):
+            self._log_task(job_id, f"create_ap_{app_profile.name}", "info", f"Creating Application Profile: {app_profile.name}")
+            result = await apic_client.create_application_profile(app_profile.dict())
+            if not result["success"]:
+                self._log_task(job_id, f"create_ap_{app_profile.name}", "error", f"Failed: {result['error']}")
+            else:
+                self._log_task(job_id, f"create_ap_{app_profile.name}", "success", "Application Profile created successfully")
+        
+        for i, epg in enumerate(config.epgs):
+            self._log_task(job_id, f"create_epg_{epg.name}", "info", f"Creating EPG: {epg.name}")
+            result = await apic_client.create_epg(epg.dict())
+            if not result["success"]:
+                self._log_task(job_id, f"create_epg_{epg.name}", "error", f"Failed: {result['error']}")
+            else:
+                self._log_task(job_id, f"create_epg_{epg.name}", "success", "EPG created successfully")
+    
+    async def _execute_streaming(self, job_id: int, config: FabricConfig, apic_client: APICClient):
+        """Push objects as a parametrized template generates them.
+
+        Only the objects in flight are held in memory: one at a time in
+        sequential mode, up to max_concurrency in parallel mode. Every
+        object of a kind finishes before the next kind starts, so parents
+        always exist before their children are pushed.
+        """
+        total = count_config_objects(config)
+        window = config.max_concurrency if config.execution_mode == ExecutionMode.PARALLEL else 1
+        self._log_task(job_id, "template_expansion", "info", f"Streaming {total} objects from the parametrized template")
+        completed = 0
+        
+        async def push(kind: str, obj):
+            nonlocal completed
+            task_name = f"create_{kind}_{obj.name}"
+            label = KIND_LABELS[kind]
+            self._log_task(job_id, task_name, "info", f"Creating {label}: {obj.name}")
+            result = await getattr(apic_client, CREATE_METHODS[kind])(obj.dict())
+            if not result["success"]:
+                self._log_task(job_id, task_name, "error", f"Failed: {result['error']}")
+            else:
+                self._log_task(job_id, task_name, "success", f"{label} created successfully")
+            
+            completed += 1
+            progress = 10 + (80 * completed / max(total, 1))
+            self._update_job_status(job_id, "running", int(progress))
+        
+        in_flight = set()
+        current_kind = None
         try:
-            apic_client = APICClient(
-                host=config.apic_credentials.host,
-                username=config.apic_credentials.username,
-                password=config.apic_credentials.password,
-                port=config.apic_credentials.port,
-                verify_ssl=config.apic_credentials.verify_ssl
-            )
+            for kind, obj in iter_config_objects(config):
+                if kind != current_kind and in_flight:
+                    await asyncio.gather(*in_flight)
+                    in_flight.clear()
+                current_kind = kind
+                if len(in_flight) >= window:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                in_flight.add(asyncio.ensure_future(push(kind, obj)))
+        finally:
+            # Let pushes already started finish even if expansion failed
+            await asyncio.gather(*in_flight, return_exceptions=True)
+    
+    async def _execute_parallel(self, job_id: int, config: FabricConfig, apic_client: APICClient):
+        """Push independent objects concurrently, waiting only on their parents"""
+        tasks = build_task_graph(config, apic_client)
+        scheduler = DependencyScheduler(tasks, max_concurrency=config.max_concurrency)
+        completed = 0
+        
+        def on_start(task):
+            self._log_task(job_id, task.task_name, "info", f"Creating {task.label}: {task.name}")
+        
+        def on_complete(task, result):
+            nonlocal completed
+            completed += 1
+            if not result["success"]:
+                self._log_task(job_id, task.task_name, "error", f"Failed: {result['error']}")
+            else:
+                self._log_task(job_id, task.task_name, "success", f"{task.label} created successfully")
             
-            connectivity_result = await apic_client.test_connectivity()
-            if not connectivity_result["success"]:
-                errors.append(f"APIC connectivity test failed: {connectivity_result['error']}")
+            progress = 10 + (80 * completed / len(tasks))
+            self._update_job_status(job_id, "running", int(progress))
+        
+        await scheduler.run(on_start=on_start, on_complete=on_complete)
+    
+    async def _execute_diff(self, job_id: int, config: FabricConfig, apic_client: APICClient):
+        """Read each tenant subtree once and push only missing or changed objects"""
+        existing = {}
+        for tenant in referenced_tenants(config):
+            result = await apic_client.query_subtree(f"uni/tn-{tenant}", DIFF_CLASSES)
+            if not result["success"]:
+                raise Exception(f"Failed to read tenant '{tenant}' from APIC: {result['error']}")
+            for mo in result["objects"]:
+                existing[mo["attributes"]["dn"]] = mo["attributes"]
+        
+        diffs, delta = diff_config(config, existing)
+        summary = {action: 0 for action in (DIFF_CREATE, DIFF_MODIFY, DIFF_SKIP)}
+        for diff in diffs:
+            summary[diff.action] += 1
+            if diff.action == DIFF_MODIFY:
+                self._log_task(job_id, f"diff_{diff.kind}_{diff.name}", "info",
+                               f"{diff.label} '{diff.name}' differs from desired state", {"changes": diff.changes})
+            elif diff.action == DIFF_SKIP:
+                self._log_task(job_id, f"create_{diff.kind}_{diff.name}", "info",
+                               f"{diff.label} unchanged, already matches desired state", {"dn": diff.dn})
+        
+        self._log_task(job_id, "diff_summary", "info",
+                       f"{summary[DIFF_CREATE]} to create, {summary[DIFF_MODIFY]} to modify, {summary[DIFF_SKIP]} unchanged",
+                       summary)
+        self._update_job_status(job_id, "running", 20)
+        
+        if summary[DIFF_CREATE] or summary[DIFF_MODIFY]:
+            actions = {diff.dn: diff.action for diff in diffs if diff.action != DIFF_SKIP}
+            await self._execute_bulk(job_id, delta, apic_client, actions)
+    
+    async def _execute_bulk(self, job_id: int, config: FabricConfig, apic_client: APICClient,
+                            actions: Dict[str, str] = None):
+        """Push the whole config as nested tenant trees in as few POSTs as possible.
+
+        ``actions`` maps DNs to the diff action (created or modified) they
+        are pushed for; objects without one are logged as created.
+        """
+        plan = build_bulk_plan(config)
+        self._log_task(job_id, "bulk_plan", "info",
+                       f"Posting {len(plan.objects)} objects in {len(plan.chunks)} request(s)",
+                       {"chunk_sizes": [chunk.size for chunk in plan.chunks]})
+        
+        posted = set()
+        chunk_errors = {}
+        for i, chunk in enumerate(plan.chunks):
+            result = await apic_client.post_tree("uni", chunk.payload)
+            if result["success"]:
+                posted.update(chunk.dns)
+            else:
+                self._log_task(job_id, f"bulk_chunk_{i + 1}", "error", f"Failed: {result['error']}")
+                for dn in chunk.dns:
+                    chunk_errors.setdefault(dn, result["error"])
             
-        except Exception as e:
-            errors.append(f"APIC connectivity test error: {str(e)}")
+            progress = 10 + (80 * (i + 1) / len(plan.chunks))
+            self._update_job_status(job_id, "running", int(progress))
+        
+        # A rejected chunk is rolled back as a whole, so ask the APIC which of
+        # its objects actually exist before reporting per-object failures.
+        existing = set()
+        unconfirmed_tenants = {obj.tenant for dn, obj in plan.objects.items() if dn not in posted}
+        for tenant in sorted(unconfirmed_tenants):
+            result = await apic_client.query_subtree(f"uni/tn-{tenant}", list(RN_FORMATS))
+            if result["success"]:
+                existing.update(mo["attributes"].get("dn") for mo in result["objects"])
+        
+        for dn, obj in plan.objects.items():
+            if dn in posted:
+                action = (actions or {}).get(dn, DIFF_CREATE)
+                self._log_task(job_id, obj.task_name, "success", f"{obj.label} {action} successfully", {"dn": dn})
+            elif dn in existing:
+                self._log_task(job_id, obj.task_name, "warning",
+                               f"{obj.label} exists on fabric but was not updated: {chunk_errors.get(dn)}", {"dn": dn})
+            else:
+                self._log_task(job_id, obj.task_name, "error", f"Failed: {chunk_errors.get(dn, 'object missing after bulk push')}", {"dn": dn})
+        
+        if len(posted) == 0 and plan.chunks:
+            raise Exception("No bulk chunk was accepted by the APIC")
+    
+    async def validate_configuration(self, config: FabricConfig, refresh: bool = False) -> Dict[str, Any]:
+        """Validate configuration before provisioning.
+
+        The config is checked on its own once, then against a cached
+        snapshot of every target fabric; ``refresh`` forces new snapshots.
+        """
+        targets = site_targets(config)
+        if config.expansion is None:
+            validators = [ConfigValidator(config)] * len(targets)
+        else:
+            # Per-site template variables give every site its own objects
+            try:
+                validators = [ConfigValidator(expand_config(site_config(config, target))) for target in targets]
+            except ValueError as e:
+                return {"valid": False, "errors": [f"Template expansion failed: {str(e)}"], "warnings": []}
+        
+        errors, warnings = [], []
+        for validator in {id(validator): validator for validator in validators}.values():
+            structure_errors, structure_warnings = validator.check_structure()
+            errors.extend(error for error in structure_errors if error not in errors)
+            warnings.extend(warning for warning in structure_warnings if warning not in warnings)
+        
+        site_codes = [target.site_code.value for target in targets]
+        for site_code in sorted(set(site_codes)):
+            if site_codes.count(site_code) > 1:
+                errors.append(f"Site '{site_code}' is targeted more than once")
+        
+        snapshots = await asyncio.gather(*(self._fabric_snapshot(target.apic_credentials, refresh) for target in targets))
+        if all(isinstance(snapshot, str) for snapshot in snapshots):
+            # No fabric reachable; references must resolve within the config
+            site_errors, site_warnings = validators[0].check_fabric(None)
+            errors.extend(site_errors)
+            warnings.extend(site_warnings)
+        
+        for target, validator, snapshot in zip(targets, validators, snapshots):
+            prefix = f"{target.site_code.value}: " if config.sites else ""
+            if isinstance(snapshot, str):
+                errors.append(prefix + snapshot)
+                continue
+            site_errors, site_warnings = validator.check_fabric(snapshot)
+            errors.extend(prefix + error for error in site_errors)
+            warnings.extend(prefix + warning for warning in site_warnings)
         
         return {
             "valid": len(errors) == 0,
@@ -141,44 +469,66 @@ class ProvisioningService:
             "warnings": warnings
         }
     
+    async def _fabric_snapshot(self, credentials: APICCredentials, refresh: bool = False) -> Union[FabricSnapshot, str]:
+        """Log in to an APIC and get its inventory snapshot; returns an error message on failure"""
+        try:
+            auth_result = await get_session_manager().get_client(
+                host=credentials.host,
+                username=credentials.username,
+                password=credentials.password,
+                port=credentials.port,
+                verify_ssl=credentials.verify_ssl
+            )
+            if not auth_result["success"]:
+                return f"APIC connectivity test failed: {auth_result['error']}"
+            
+            snapshot_result = await get_fabric_inventory().get_snapshot(auth_result["client"], refresh=refresh)
+            if not snapshot_result["success"]:
+                return f"APIC connectivity test failed: {snapshot_result['error']}"
+            
+        except Exception as e:
+            return f"APIC connectivity test error: {str(e)}"
+        return snapshot_result["snapshot"]
+    
     def _update_job_status(self, job_id: int, status: str, progress: int = None):
         """Update job status in database"""
-        conn = self.db.get_connection()
-        try:
-            if progress is not None:
-                conn.execute("""
-                    UPDATE provisioning_jobs 
-                    SET status = ?, progress = ?, 
-                        started_at = CASE WHEN started_at IS NULL AND status = 'running' THEN CURRENT_TIMESTAMP ELSE started_at END,
-                        completed_at = CASE WHEN status IN ('completed', 'failed') THEN CURRENT_TIMESTAMP ELSE completed_at END
-                    WHERE id = ?
-                """, (status, progress, job_id))
-            else:
-                conn.execute("""
-                    UPDATE provisioning_jobs 
-                    SET status = ?,
-                        started_at = CASE WHEN started_at IS NULL AND status = 'running' THEN CURRENT_TIMESTAMP ELSE started_at END,
-                        completed_at = CASE WHEN status IN ('completed', 'failed') THEN CURRENT_TIMESTAMP ELSE completed_at END
-                    WHERE id = ?
-                """, (status, job_id))
-            conn.commit()
-        finally:
-            conn.close()
+        if status in ("completed", "failed"):
+            metrics.jobs_finished.inc(status=status)
+        self.log_writer.update_job_status(job_id, status, progress)
     
     def _log_task(self, job_id: int, task_name: str, status: str, message: str, details: Dict[str, Any] = None):
         """Log task execution"""
-        conn = self.db.get_connection()
-        try:
-            conn.execute("""
-                INSERT INTO task_logs (job_id, task_name, status, message, details)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                job_id,
-                task_name,
-                status,
-                message,
-                json.dumps(details) if details else None
-            ))
-            conn.commit()
-        finally:
-            conn.close()
+        if task_name.startswith("create_") and status in ("success", "error", "warning"):
+            # Per-object outcomes are logged as create_<kind>_<name> in every mode
+            metrics.objects_provisioned.inc(kind=task_name.split("_")[1], result=status)
+        self.log_writer.log(job_id, task_name, status, message, details)
+
+class SiteProvisioningService(ProvisioningService):
+    """Provisions one site of a multi-site job.
+
+    Logs go to the parent job tagged with the site code, and status and
+    progress changes are handed to ``report`` instead of being written to
+    the job row, which the multi-site run aggregates across sites.
+    """
+    
+    def __init__(self, site_code: str, report: Callable[..., None]):
+        super().__init__()
+        self.site_code = site_code
+        self.report = report
+        self.last_error = None
+    
+    def _update_job_status(self, job_id: int, status: str, progress: int = None):
+        self.report(self.site_code, status, progress, self.last_error if status == "failed" else None)
+    
+    def _log_task(self, job_id: int, task_name: str, status: str, message: str, details: Dict[str, Any] = None):
+        if status == "error":
+            self.last_error = message
+        super()._log_task(job_id, task_name, status, f"[{self.site_code}] {message}", {**(details or {}), "site": self.site_code})
+
+def site_targets(config: FabricConfig) -> List[SiteTarget]:
+    """The primary site of a config followed by any additional sites"""
+    return [SiteTarget(site_code=config.site_code, apic_credentials=config.apic_credentials), *config.sites]
+
+def site_config(config: FabricConfig, target: SiteTarget) -> FabricConfig:
+    """A single-site copy of a config aimed at one target"""
+    return config.copy(update={"site_code": target.site_code, "apic_credentials": target.apic_credentials, "sites": []})
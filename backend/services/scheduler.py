@@ -0,0 +1,132 @@
+"""
+Dependency-aware parallel scheduler for APIC object provisioning
+"""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+
+from ..models.aci_models import FabricConfig
+from ..clients.apic_client import APICClient
+from .bulk import KIND_LABELS
+
+TaskKey = Tuple[str, str, str]  # (kind, tenant, name)
+
+@dataclass
+class ProvisioningTask:
+    """One APIC object push and the objects it has to wait for"""
+    key: TaskKey
+    run: Callable[[], Awaitable[Dict[str, Any]]]
+    depends_on: List[TaskKey] = field(default_factory=list)
+
+    @property
+    def kind(self) -> str:
+        return self.key[0]
+
+    @property
+    def name(self) -> str:
+        return self.key[2]
+
+    @property
+    def task_name(self) -> str:
+        return f"create_{self.kind}_{self.name}"
+
+    @property
+    def label(self) -> str:
+        return KIND_LABELS[self.kind]
+
+def build_task_graph(config: FabricConfig, apic_client: APICClient) -> Dict[TaskKey, ProvisioningTask]:
+    """Build the object dependency graph for a FabricConfig.
+
+    Edges follow the references checked by validation: VRF and AP on their
+    tenant, BD on its VRF, EPG on its BD and AP. References to objects that
+    are not part of the config are assumed to exist on the fabric already.
+    """
+    tasks: Dict[TaskKey, ProvisioningTask] = {}
+
+    def add(key: TaskKey, run, depends_on: List[TaskKey]):
+        tasks[key] = ProvisioningTask(key=key, run=run, depends_on=depends_on)
+
+    for tenant in config.tenants:
+        add(("tenant", tenant.name, tenant.name), lambda c=tenant.dict(): apic_client.create_tenant(c), [])
+
+    for vrf in config.vrfs:
+        add(("vrf", vrf.tenant, vrf.name), lambda c=vrf.dict(): apic_client.create_vrf(c),
+            [("tenant", vrf.tenant, vrf.tenant)])
+
+    for bd in config.bridge_domains:
+        add(("bd", bd.tenant, bd.name), lambda c=bd.dict(): apic_client.create_bridge_domain(c),
+            [("tenant", bd.tenant, bd.tenant), ("vrf", bd.tenant, bd.vrf)])
+
+    for app_profile in config.app_profiles:
+        add(("ap", app_profile.tenant, app_profile.name), lambda c=app_profile.dict(): apic_client.create_application_profile(c),
+            [("tenant", app_profile.tenant, app_profile.tenant)])
+
+    for epg in config.epgs:
+        add(("epg", epg.tenant, epg.name), lambda c=epg.dict(): apic_client.create_epg(c),
+            [("ap", epg.tenant, epg.app_profile), ("bd", epg.tenant, epg.bridge_domain)])
+
+    for task in tasks.values():
+        task.depends_on = [key for key in task.depends_on if key in tasks]
+
+    return tasks
+
+class DependencyScheduler:
+    """Run a task graph with bounded concurrency, parents before children.
+
+    Independent subtrees (for example different tenants) are pushed at the
+    same time. When a task fails, everything that depends on it is skipped.
+    """
+
+    def __init__(self, tasks: Dict[TaskKey, ProvisioningTask], max_concurrency: int = 8):
+        self.tasks = tasks
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def run(
+        self,
+        on_start: Optional[Callable[[ProvisioningTask], None]] = None,
+        on_complete: Optional[Callable[[ProvisioningTask, Dict[str, Any]], None]] = None
+    ) -> Dict[TaskKey, Dict[str, Any]]:
+        """Run every task and return the result of each, keyed by task key"""
+        results: Dict[TaskKey, Dict[str, Any]] = {}
+        waiting = {key: len(task.depends_on) for key, task in self.tasks.items()}
+        dependents: Dict[TaskKey, List[TaskKey]] = {key: [] for key in self.tasks}
+        for key, task in self.tasks.items():
+            for parent in task.depends_on:
+                dependents[parent].append(key)
+
+        ready = deque(key for key, count in waiting.items() if count == 0)
+        running: Dict[asyncio.Task, TaskKey] = {}
+
+        def finish(key: TaskKey, result: Dict[str, Any]):
+            results[key] = result
+            if on_complete:
+                on_complete(self.tasks[key], result)
+            for child in dependents[key]:
+                if not result["success"] and child not in results:
+                    label = self.tasks[key].label
+                    finish(child, {"success": False, "skipped": True,
+                                   "error": f"Skipped because {label} '{key[2]}' failed"})
+                    continue
+                waiting[child] -= 1
+                if waiting[child] == 0 and child not in results:
+                    ready.append(child)
+
+        while ready or running:
+            while ready and len(running) < self.max_concurrency:
+                key = ready.popleft()
+                if on_start:
+                    on_start(self.tasks[key])
+                running[asyncio.create_task(self.tasks[key].run())] = key
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+                finish(key, result)
+
+        return results
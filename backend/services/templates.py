@@ -0,0 +1,165 @@
+"""
+In-memory registry of configuration templates, validated once and served with ETags
+"""
+
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Union
+
+from pydantic import ValidationError
+
+from ..models.aci_models import FabricTemplate
+from ..models.ndo_models import SchemaConfig
+from ..models.database import get_database
+from .expansion import ExpansionTemplate, compile_expansion
+
+FABRIC_OBJECT_KINDS = ["tenants", "vrfs", "bridge_domains", "app_profiles", "epgs"]
+
+def compile_template(template_type: str, config: Dict[str, Any]) -> Union[FabricTemplate, SchemaConfig, ExpansionTemplate, None]:
+    """Validate a template's config into its model; raises ValueError if it is invalid"""
+    if template_type == "fabric":
+        return FabricTemplate(**config)
+    if template_type == "ndo":
+        if "schema" not in config:
+            raise ValueError("NDO template config has no 'schema'")
+        return SchemaConfig(**config["schema"])
+    if template_type == "parametrized":
+        return compile_expansion(config)
+    return None
+
+@dataclass
+class CompiledTemplate:
+    """One templates row, parsed and validated"""
+    id: int
+    name: str
+    type: str
+    description: Optional[str]
+    config: Dict[str, Any]
+    compiled: Union[FabricTemplate, SchemaConfig, ExpansionTemplate, None]
+    error: Optional[str]
+    etag: str
+    created_at: str
+    updated_at: str
+
+    @classmethod
+    def from_row(cls, row) -> "CompiledTemplate":
+        config = json.loads(row["config"])
+        try:
+            compiled, error = compile_template(row["type"], config), None
+        except (ValidationError, ValueError, TypeError) as e:
+            compiled, error = None, str(e)
+        digest = hashlib.sha1(f"{row['updated_at']}\0{row['description']}\0{row['config']}".encode()).hexdigest()
+        return cls(
+            id=row["id"],
+            name=row["name"],
+            type=row["type"],
+            description=row["description"],
+            config=config,
+            compiled=compiled,
+            error=error,
+            etag=f'"{digest[:20]}"',
+            created_at=row["created_at"],
+            updated_at=row["updated_at"]
+        )
+
+    def fabric_objects(self) -> Dict[str, list]:
+        """The validated object lists of a fabric template"""
+        return {kind: getattr(self.compiled, kind) for kind in FABRIC_OBJECT_KINDS}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "type": self.type,
+            "description": self.description,
+            "valid": self.error is None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.summary(), "config": self.config, "error": self.error}
+
+class TemplateRegistry:
+    """Loads every template from the templates table once and keeps it compiled.
+
+    Listing and fetching are answered from memory; a template is re-read
+    only after ``update`` or ``invalidate``.
+    """
+
+    def __init__(self):
+        self._templates: Optional[Dict[int, CompiledTemplate]] = None
+        self._list_etag = ""
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[int, CompiledTemplate]:
+        with self._lock:
+            if self._templates is None:
+                with get_database().connection() as conn:
+                    cursor = conn.execute("SELECT * FROM templates ORDER BY name")
+                    self._set_templates({row["id"]: CompiledTemplate.from_row(row) for row in cursor.fetchall()})
+            return self._templates
+
+    def _set_templates(self, templates: Dict[int, CompiledTemplate]):
+        self._templates = templates
+        etags = ",".join(f"{t.id}:{t.etag}" for t in sorted(templates.values(), key=lambda t: t.id))
+        self._list_etag = f'"{hashlib.sha1(etags.encode()).hexdigest()[:20]}"'
+
+    def list(self) -> List[CompiledTemplate]:
+        """Every template, by name"""
+        return sorted(self._load().values(), key=lambda t: t.name)
+
+    @property
+    def list_etag(self) -> str:
+        """ETag of the template listing; changes whenever any template does"""
+        self._load()
+        return self._list_etag
+
+    def get(self, template_id: int) -> Optional[CompiledTemplate]:
+        template = self._load().get(template_id)
+        if template is None:
+            # Added to the table since we loaded it
+            with get_database().connection() as conn:
+                row = conn.execute("SELECT * FROM templates WHERE id = ?", (template_id,)).fetchone()
+            if row is not None:
+                template = self._store(CompiledTemplate.from_row(row))
+        return template
+
+    def update(self, template_id: int, config: Dict[str, Any], description: Optional[str] = None) -> Optional[CompiledTemplate]:
+        """Validate and save a template's new config; None if there is no such template"""
+        current = self.get(template_id)
+        if current is None:
+            return None
+        compile_template(current.type, config)
+        with get_database().connection() as conn:
+            conn.execute("""
+                UPDATE templates SET config = ?, description = COALESCE(?, description), updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (json.dumps(config), description, template_id))
+            row = conn.execute("SELECT * FROM templates WHERE id = ?", (template_id,)).fetchone()
+        return self._store(CompiledTemplate.from_row(row))
+
+    def invalidate(self, template_id: Optional[int] = None):
+        """Drop one template (or all of them) so it is re-read on next use"""
+        with self._lock:
+            if template_id is None or self._templates is None:
+                self._templates = None
+            elif template_id in self._templates:
+                self._set_templates({k: v for k, v in self._templates.items() if k != template_id})
+
+    def _store(self, template: CompiledTemplate) -> CompiledTemplate:
+        templates = self._load()
+        with self._lock:
+            self._set_templates({**templates, template.id: template})
+        return template
+
+_registry_instance = None
+
+def get_template_registry() -> TemplateRegistry:
+    """Get singleton template registry instance"""
+    global _registry_instance
+    if _registry_instance is None:
+        _registry_instance = TemplateRegistry()
+    return _registry_instance
@@ -0,0 +1,175 @@
+"""
+Configuration validation against itself and a snapshot of the fabric
+"""
+
+import ipaddress
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from ..models.aci_models import FabricConfig
+from .inventory import FabricSnapshot
+
+# (first address, last address, description) of one subnet
+Interval = Tuple[int, int, str]
+
+@lru_cache(maxsize=65536)
+def subnet_range(subnet: str) -> Optional[Tuple[int, int, int]]:
+    """(IP version, first address, last address) of a gateway subnet, or None if invalid.
+
+    Dotted IPv4 is parsed directly since ipaddress is slow enough to dominate
+    validation of large configs; anything else goes through ipaddress.
+    """
+    address, slash, prefix = subnet.partition("/")
+    octets = address.split(".")
+    if len(octets) == 4 and all(octet.isdigit() and len(octet) <= 3 for octet in octets) and (prefix.isdigit() or not slash):
+        value = 0
+        for octet in octets:
+            if int(octet) > 255:
+                return None
+            value = value << 8 | int(octet)
+        length = int(prefix) if prefix else 32
+        if length > 32:
+            return None
+        host_mask = (1 << (32 - length)) - 1
+        return 4, value & ~host_mask, value | host_mask
+    try:
+        network = ipaddress.ip_interface(subnet).network
+    except ValueError:
+        return None
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+class ConfigValidator:
+    """Checks a FabricConfig using hashed name lookups.
+
+    Every check is a set or dict lookup per object, plus one sort per VRF
+    for subnet overlaps, so a 10k-object config validates in milliseconds.
+    ``check_structure`` covers the config on its own; ``check_fabric``
+    resolves references and overlaps against what a fabric already has.
+    """
+
+    def __init__(self, config: FabricConfig):
+        self.config = config
+        self.tenants = {t.name for t in config.tenants}
+        self.vrfs = {(vrf.tenant, vrf.name) for vrf in config.vrfs}
+        self.app_profiles = {(ap.tenant, ap.name) for ap in config.app_profiles}
+        self.bridge_domains = {(bd.tenant, bd.name): bd.vrf for bd in config.bridge_domains}
+        # (tenant, BD) -> (subnet as configured, (IP version, first, last))
+        self.subnets: Dict[Tuple[str, str], Tuple[str, Tuple[int, int, int]]] = {}
+        self.subnet_errors: List[str] = []
+        for bd in config.bridge_domains:
+            if not bd.subnet:
+                continue
+            subnet = subnet_range(bd.subnet)
+            if subnet is None:
+                self.subnet_errors.append(f"Bridge Domain '{bd.name}' has an invalid subnet '{bd.subnet}'")
+            else:
+                self.subnets[(bd.tenant, bd.name)] = (bd.subnet, subnet)
+
+    def check_structure(self) -> Tuple[List[str], List[str]]:
+        """Errors and warnings that do not depend on any fabric"""
+        errors = []
+        warnings = []
+
+        if not self.config.tenants:
+            errors.append("At least one tenant must be specified")
+
+        duplicates = [
+            ("Tenant", [t.name for t in self.config.tenants]),
+            ("VRF", [f"{vrf.tenant}/{vrf.name}" for vrf in self.config.vrfs]),
+            ("Bridge Domain", [f"{bd.tenant}/{bd.name}" for bd in self.config.bridge_domains]),
+            ("Application Profile", [f"{ap.tenant}/{ap.name}" for ap in self.config.app_profiles]),
+            ("EPG", [f"{epg.tenant}/{epg.app_profile}/{epg.name}" for epg in self.config.epgs])
+        ]
+        for label, names in duplicates:
+            for name, count in Counter(names).items():
+                if count > 1:
+                    errors.append(f"{label} '{name}' is defined {count} times")
+
+        errors.extend(self.subnet_errors)
+        return errors, warnings
+
+    def check_fabric(self, snapshot: Optional[FabricSnapshot] = None) -> Tuple[List[str], List[str]]:
+        """Errors and warnings for references, existing objects and subnet overlaps.
+
+        Without a snapshot, references must resolve within the config itself.
+        """
+        snapshot = snapshot or FabricSnapshot()
+        errors = []
+        warnings = []
+        tenants = self.tenants | snapshot.tenants
+        vrfs = self.vrfs | snapshot.vrfs
+        app_profiles = self.app_profiles | snapshot.app_profiles
+
+        for tenant in self.config.tenants:
+            if tenant.name in snapshot.tenants:
+                warnings.append(f"Tenant '{tenant.name}' already exists on the fabric")
+
+        for vrf in self.config.vrfs:
+            if vrf.tenant not in tenants:
+                errors.append(f"VRF '{vrf.name}' references non-existent tenant '{vrf.tenant}'")
+            elif (vrf.tenant, vrf.name) in snapshot.vrfs:
+                warnings.append(f"VRF '{vrf.name}' already exists in tenant '{vrf.tenant}'")
+
+        for bd in self.config.bridge_domains:
+            if bd.tenant not in tenants:
+                errors.append(f"Bridge Domain '{bd.name}' references non-existent tenant '{bd.tenant}'")
+            if (bd.tenant, bd.vrf) not in vrfs:
+                errors.append(f"Bridge Domain '{bd.name}' references non-existent VRF '{bd.vrf}' in tenant '{bd.tenant}'")
+            existing_vrf = snapshot.bridge_domains.get((bd.tenant, bd.name))
+            if existing_vrf is not None:
+                if existing_vrf and existing_vrf != bd.vrf:
+                    warnings.append(f"Bridge Domain '{bd.name}' in tenant '{bd.tenant}' will move from VRF '{existing_vrf}' to '{bd.vrf}'")
+                else:
+                    warnings.append(f"Bridge Domain '{bd.name}' already exists in tenant '{bd.tenant}'")
+
+        for ap in self.config.app_profiles:
+            if ap.tenant not in tenants:
+                errors.append(f"Application Profile '{ap.name}' references non-existent tenant '{ap.tenant}'")
+
+        for epg in self.config.epgs:
+            if epg.tenant not in tenants:
+                errors.append(f"EPG '{epg.name}' references non-existent tenant '{epg.tenant}'")
+            elif (epg.tenant, epg.app_profile) not in app_profiles:
+                errors.append(f"EPG '{epg.name}' references non-existent application profile '{epg.app_profile}' in tenant '{epg.tenant}'")
+            if (epg.tenant, epg.bridge_domain) not in self.bridge_domains and (epg.tenant, epg.bridge_domain) not in snapshot.bridge_domains:
+                errors.append(f"EPG '{epg.name}' references non-existent bridge domain '{epg.bridge_domain}' in tenant '{epg.tenant}'")
+
+        errors.extend(self._check_overlaps(snapshot))
+        return errors, warnings
+
+    def _check_overlaps(self, snapshot: FabricSnapshot) -> List[str]:
+        """Subnets that overlap another subnet in the same VRF"""
+        index: Dict[Tuple[str, str, int], List[Interval]] = {}
+
+        def add(tenant: str, vrf: str, subnet: Tuple[int, int, int], label: str):
+            version, first, last = subnet
+            index.setdefault((tenant, vrf, version), []).append((first, last, label))
+
+        for (tenant, bd), (text, subnet) in self.subnets.items():
+            add(tenant, self.bridge_domains[(tenant, bd)], subnet, f"'{text}' on Bridge Domain '{bd}'")
+
+        for tenant, bd, ip in snapshot.subnets:
+            configured = self.subnets.get((tenant, bd))
+            if configured is not None and configured[0] == ip:
+                continue  # The configured subnet itself
+            subnet = subnet_range(ip)
+            if subnet is None:
+                continue
+            vrf = self.bridge_domains.get((tenant, bd), snapshot.bridge_domains.get((tenant, bd), ""))
+            add(tenant, vrf, subnet, f"'{ip}' on existing Bridge Domain '{bd}'")
+
+        errors = []
+        for (tenant, vrf, _), intervals in index.items():
+            if len(intervals) < 2:
+                continue
+            # Sweep in start order; an interval overlaps when it starts before
+            # the furthest end seen so far
+            intervals.sort()
+            widest = intervals[0]
+            for interval in intervals[1:]:
+                if interval[0] <= widest[1]:
+                    errors.append(f"Subnet {interval[2]} overlaps {widest[2]} in VRF '{vrf}' of tenant '{tenant}'")
+                if interval[1] > widest[1]:
+                    widest = interval
+        return errors
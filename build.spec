@@ -53,6 +53,10 @@ hiddenimports = [
     'sqlite3',
     'json',
     'threading',
+    'httpx',
+    'httpcore',
+    'h11',
+    'anyio',
     'requests.adapters',
     'urllib3.util.retry',
     'urllib3.util.connection',
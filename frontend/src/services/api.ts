@@ -5,7 +5,8 @@ import {
   Template, 
   ValidationResult, 
   Statistics,
-  FabricConfig 
+  FabricConfig,
+  JobProgress
 } from '../types'
 
 class ApiService {
@@ -88,6 +89,28 @@ class ApiService {
     return response.data
   }
 
+  subscribeToJobEvents(
+    jobId: number,
+    handlers: {
+      onLog?: (log: TaskLog) => void
+      onProgress?: (progress: JobProgress) => void
+      onEnd?: (progress: JobProgress) => void
+    },
+    after?: number
+  ): () => void {
+    const query = after !== undefined ? `?after=${after}` : ''
+    const source = new EventSource(`/api/provisioning/jobs/${jobId}/events${query}`)
+
+    source.addEventListener('log', (event) => handlers.onLog?.(JSON.parse((event as MessageEvent).data)))
+    source.addEventListener('progress', (event) => handlers.onProgress?.(JSON.parse((event as MessageEvent).data)))
+    source.addEventListener('end', (event) => {
+      handlers.onEnd?.(JSON.parse((event as MessageEvent).data))
+      source.close()
+    })
+
+    return () => source.close()
+  }
+
   async validateConfiguration(config: FabricConfig): Promise<ValidationResult> {
     const response = await this.client.post('/provisioning/validate-config', config)
     return response.data
@@ -48,10 +48,25 @@ export interface EPGConfig {
   description?: string
 }
 
+export type SiteCode = 'AUNTH' | 'AUSTH' | 'AUTER'
+
+export interface SiteTarget {
+  site_code: SiteCode
+  apic_credentials: APICCredentials
+}
+
+export interface SiteResult {
+  host: string
+  status: 'pending' | 'running' | 'completed' | 'failed'
+  progress: number
+  error: string | null
+}
+
 export interface FabricConfig {
-  site_code: 'AUNTH' | 'AUSTH' | 'AUTER'
+  site_code: SiteCode
   fabric_type: 'it' | 'ot'
   apic_credentials: APICCredentials
+  sites?: SiteTarget[]
   tenants: TenantConfig[]
   vrfs: VRFConfig[]
   bridge_domains: BridgeDomainConfig[]
@@ -66,6 +81,7 @@ export interface ProvisioningJob {
   fabric_config: FabricConfig
   status: 'pending' | 'running' | 'completed' | 'failed'
   progress: number
+  site_results?: Record<string, SiteResult> | null
   created_at?: string
   started_at?: string
   completed_at?: string
@@ -81,6 +97,12 @@ export interface TaskLog {
   timestamp: string
 }
 
+export interface JobProgress {
+  status: ProvisioningJob['status'] | 'deleted'
+  progress?: number
+  sites?: Record<string, SiteResult>
+}
+
 export interface Template {
   id: number
   name: string
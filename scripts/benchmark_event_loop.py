@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Event loop responsiveness benchmark
+
+Starts a mock APIC with artificial latency and the real backend, launches N
+provisioning jobs against the mock, and measures how many /api/status/health
+requests per second the backend still answers while those jobs run.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mock_controller import MockServer, create_app
+
+def build_job(index: int, apic_port: int, objects: int):
+    tenant = f"bench_tn_{index}"
+    return {
+        "name": f"benchmark-job-{index}",
+        "fabric_config": {
+            "site_code": "AUNTH",
+            "fabric_type": "it",
+            "apic_credentials": {
+                "host": "127.0.0.1",
+                "port": apic_port,
+                "username": "admin",
+                "password": "password"
+            },
+            "tenants": [{"name": tenant}],
+            "vrfs": [{"name": f"vrf_{i}", "tenant": tenant} for i in range(objects)]
+        }
+    }
+
+async def measure_health(base_url: str, duration: float, concurrency: int) -> float:
+    """Hammer the health endpoint and return requests per second"""
+    completed = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            response = await client.get(f"{base_url}/api/status/health")
+            response.raise_for_status()
+            completed += 1
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return completed / elapsed
+
+async def run_scenario(base_url: str, apic_port: int, jobs: int, objects: int, duration: float, concurrency: int) -> float:
+    async with httpx.AsyncClient(timeout=60) as client:
+        for i in range(jobs):
+            response = await client.post(f"{base_url}/api/provisioning/jobs", json=build_job(i, apic_port, objects))
+            response.raise_for_status()
+    await asyncio.sleep(0.5)
+    return await measure_health(base_url, duration, concurrency)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[0, 1, 5, 20], help="Concurrent job counts to test")
+    parser.add_argument("--objects", type=int, default=50, help="VRFs per job")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock APIC latency per request (seconds)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Measurement window per scenario (seconds)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent health check clients")
+    parser.add_argument("--apic-port", type=int, default=18443)
+    parser.add_argument("--app-port", type=int, default=18080)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+
+    from backend.main import app
+
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=args.app_port, log_level="critical", access_log=False, lifespan="off"
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+
+    with MockServer(create_app(latency=args.latency), port=args.apic_port):
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        base_url = f"http://127.0.0.1:{args.app_port}"
+        print(f"Mock APIC latency: {args.latency * 1000:.0f} ms, {args.objects} objects per job")
+        print(f"{'jobs':>6} {'health req/s':>14}")
+        for jobs in args.jobs:
+            rps = asyncio.run(run_scenario(base_url, args.apic_port, jobs, args.objects, args.duration, args.concurrency))
+            print(f"{jobs:>6} {rps:>14.1f}")
+
+        server.should_exit = True
+        thread.join(timeout=5)
+    workdir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Task log write throughput benchmark
+
+Compares the old per-row INSERT + COMMIT pattern against the batched
+TaskLogWriter for the same number of task_logs rows and progress updates.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.models.database import Database
+from backend.services.log_writer import TaskLogWriter, INSERT_TASK_LOG_SQL, UPDATE_JOB_STATUS_SQL
+
+def create_job(db: Database) -> int:
+    with db.connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO provisioning_jobs (name, fabric_config, status) VALUES (?, ?, ?)",
+            ("benchmark", "{}", "pending")
+        )
+        return cursor.lastrowid
+
+def per_row_commits(db: Database, job_id: int, rows: int) -> float:
+    start = time.perf_counter()
+    for i in range(rows):
+        with db.connection() as conn:
+            conn.execute(INSERT_TASK_LOG_SQL, (job_id, f"create_bd_{i}", "success", "Bridge Domain created successfully", None))
+        with db.connection() as conn:
+            conn.execute(UPDATE_JOB_STATUS_SQL, ("running", i * 100 // rows, job_id))
+    return time.perf_counter() - start
+
+def batched_writer(db: Database, job_id: int, rows: int, flush_interval: float, batch_size: int) -> float:
+    writer = TaskLogWriter(db, flush_interval=flush_interval, max_batch_size=batch_size)
+    writer.start()
+    start = time.perf_counter()
+    for i in range(rows):
+        writer.log(job_id, f"create_bd_{i}", "success", "Bridge Domain created successfully")
+        writer.update_job_status(job_id, "running", i * 100 // rows)
+    writer.update_job_status(job_id, "completed", 100)
+    elapsed = time.perf_counter() - start
+    writer.stop()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = Database(os.path.join(workdir, "benchmark.db"))
+        print(f"{'rows':>8} {'per-row rows/s':>16} {'batched rows/s':>16} {'speedup':>9}")
+        for rows in args.rows:
+            baseline = per_row_commits(db, create_job(db), rows)
+            batched = batched_writer(db, create_job(db), rows, args.flush_interval, args.batch_size)
+            print(f"{rows:>8} {rows / baseline:>16.0f} {rows / batched:>16.0f} {baseline / batched:>8.1f}x")
+        db.close()
+
+if __name__ == "__main__":
+    main()
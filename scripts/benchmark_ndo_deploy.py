@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+NDO deployment benchmark against the mock NDO
+
+Builds a schema of N templates, each deployed to the three mock sites, and
+runs it as an NDO job (ProvisioningService.execute_ndo_schema): the schema
+is applied, then every (template, site) deployment starts at once and one
+shared watcher polls them together. For comparison the same deployments
+are run one after another, each waited for before the next starts.
+Reports wall time and the number of deployment status requests.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mock_controller import MockServer, create_app
+
+from backend.clients.ndo_client import NDOClient
+from backend.models.database import get_database
+from backend.models.ndo_models import NDOJobConfig, SchemaConfig
+from backend.services.ndo_cache import get_ndo_cache
+from backend.services.ndo_deploy import deploy_schema
+from backend.services.ndo_schema import apply_schema
+
+# The sites the mock NDO manages
+SITES = ["AUNTH", "AUSTH", "AUTER"]
+
+class StatusCounter:
+    """Counts deployment status requests"""
+
+    requests = 0
+
+    @classmethod
+    def install(cls):
+        get_status = NDOClient.get_deployment_status
+
+        async def counted(client, deployment_id):
+            cls.requests += 1
+            return await get_status(client, deployment_id)
+
+        NDOClient.get_deployment_status = counted
+
+def schema_config(templates: int) -> SchemaConfig:
+    return SchemaConfig(name="bench_deploy_schema", templates=[
+        {"name": f"template_{t}", "tenants": ["bench"], "sites": SITES, "vrfs": [{"name": f"vrf_{t}"}]}
+        for t in range(templates)
+    ])
+
+async def run_job(templates: int, port: int) -> str:
+    from backend.services.provisioning import ProvisioningService
+
+    config = NDOJobConfig(
+        ndo_credentials={"host": "127.0.0.1", "port": port, "username": "admin", "password": "password"},
+        ndo_schema=schema_config(templates)
+    )
+    with get_database().connection() as conn:
+        job_id = conn.execute(
+            "INSERT INTO provisioning_jobs (name, job_type, fabric_config, status) VALUES (?, 'ndo', ?, 'pending')",
+            ("ndo-deploy-benchmark", json.dumps(config.dict()))
+        ).lastrowid
+    await ProvisioningService().execute_ndo_schema(job_id, config)
+    with get_database().connection() as conn:
+        return conn.execute("SELECT status FROM provisioning_jobs WHERE id = ?", (job_id,)).fetchone()["status"]
+
+async def run_sequential(templates: int, port: int) -> str:
+    client = NDOClient(host="127.0.0.1", username="admin", password="password", port=port)
+    if not (await client.authenticate())["success"]:
+        return "failed"
+    config = schema_config(templates)
+    site_ids = (await get_ndo_cache().site_ids(client))["site_ids"]
+    applied = await apply_schema(client, config, site_ids=site_ids)
+    if not applied["success"]:
+        return "failed"
+    for template in config.templates:
+        for site in template.sites:
+            single = SchemaConfig(name=config.name, templates=[template.copy(update={"sites": [site]})])
+            result = await deploy_schema(client, applied["schema_id"], single, site_ids)
+            if not result["success"]:
+                return "failed"
+    return "completed"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", type=int, nargs="+", default=[1, 2, 5], help="Templates per schema")
+    parser.add_argument("--deploy-seconds", type=float, default=1.0, help="How long each mock deployment runs")
+    parser.add_argument("--port", type=int, default=18446)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+    StatusCounter.install()
+
+    print(f"Mock deployment time {args.deploy_seconds:.1f} s, {len(SITES)} sites per template")
+    print(f"{'mode':>10} {'templates':>9} {'deploys':>8} {'status':>10} {'seconds':>8} {'status reqs':>12}")
+    incomplete = []
+    for mode, run in (("job", run_job), ("sequential", run_sequential)):
+        for templates in args.templates:
+            app = create_app(apic=False, deploy_seconds=args.deploy_seconds)
+            with MockServer(app, port=args.port):
+                StatusCounter.requests = 0
+                started = time.perf_counter()
+                status = asyncio.run(run(templates, args.port))
+                elapsed = time.perf_counter() - started
+            if status != "completed":
+                incomplete.append(f"{mode}/{templates}")
+            print(f"{mode:>10} {templates:>9} {templates * len(SITES):>8} {status:>10} {elapsed:>8.2f} "
+                  f"{StatusCounter.requests:>12}")
+
+    get_database().close()
+    workdir.cleanup()
+    if incomplete:
+        sys.exit(f"Runs that did not complete: {', '.join(incomplete)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+End-to-end provisioning benchmark against the mock APIC/NDO
+
+Generates synthetic configurations of 10 to 10,000 objects and runs each
+through ProvisioningService (APIC execution modes), NDOClient (NDO
+template VRFs, one request each) or apply_schema (the same VRFs compiled
+into one schema document) against a local mock controller. Reports objects per
+second, p50/p99 per-object latency and the time spent writing task logs
+and job progress to SQLite.
+
+Per-object latency is the duration of the controller request that carried
+the object, so in bulk mode every object of a chunk shares its latency.
+With --expand the same configs are written as parametrized templates and
+expanded while the job runs (streamed in sequential and parallel modes).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mock_controller import MockServer, create_app
+
+from backend.clients.apic_client import APICClient
+from backend.clients.ndo_client import NDOClient
+from backend.models.aci_models import FabricConfig
+from backend.models.database import get_database
+from backend.models.ndo_models import SchemaConfig
+from backend.services.bulk import RN_FORMATS as TRACKED_CLASSES
+from backend.services.expansion import count_config_objects
+from backend.services.log_writer import TaskLogWriter
+from backend.services.ndo_schema import apply_schema
+
+APIC_MODES = ["sequential", "bulk", "parallel", "diff"]
+NDO_MODES = ["ndo", "ndo-schema"]
+
+class Recorder:
+    """Collects per-object request latencies and database write time"""
+
+    current: "Recorder" = None
+
+    def __init__(self):
+        self.object_latencies: List[float] = []
+        self.db_seconds = 0.0
+
+    def reset(self):
+        self.object_latencies = []
+        self.db_seconds = 0.0
+
+    def install(self):
+        recorder = self
+        Recorder.current = self
+        send = APICClient._send
+        ndo_request = NDOClient._request
+        flush = TaskLogWriter.flush
+
+        async def timed_send(client, method, url, **kwargs):
+            started = time.perf_counter()
+            response = await send(client, method, url, **kwargs)
+            if method == "POST" and "/mo/" in url:
+                objects = count_objects(json.loads(kwargs.get("content") or "{}"))
+                recorder.object_latencies.extend([time.perf_counter() - started] * objects)
+            return response
+
+        async def timed_ndo_request(client, method, url, **kwargs):
+            started = time.perf_counter()
+            response = await ndo_request(client, method, url, **kwargs)
+            if method == "POST" and url.endswith("/vrfs"):
+                recorder.object_latencies.append(time.perf_counter() - started)
+            return response
+
+        def timed_flush(writer):
+            started = time.perf_counter()
+            try:
+                flush(writer)
+            finally:
+                recorder.db_seconds += time.perf_counter() - started
+
+        APICClient._send = timed_send
+        NDOClient._request = timed_ndo_request
+        TaskLogWriter.flush = timed_flush
+
+def count_objects(mo: Dict[str, Any]) -> int:
+    """Count the tracked objects a payload creates or modifies"""
+    class_name, body = next(iter(mo.items()))
+    own = 1 if class_name in TRACKED_CLASSES and body.get("attributes", {}).get("status") else 0
+    return own + sum(count_objects(child) for child in body.get("children", []))
+
+def synthetic_config(objects: int, port: int, mode: str, max_concurrency: int, expand: bool = False) -> FabricConfig:
+    """A config with exactly ``objects`` tenants, VRFs, BDs, APs and EPGs"""
+    tenant_count = max(1, objects // 200)
+    remaining = max(0, objects - 3 * tenant_count)
+    bd_count = max(tenant_count, remaining // 2) if remaining else 0
+    epg_count = max(0, remaining - bd_count)
+    if expand:
+        return synthetic_template_config(tenant_count, bd_count, epg_count, port, mode, max_concurrency)
+
+    tenants = [f"bench_tn_{t}" for t in range(tenant_count)]
+    bridge_domains = [
+        {"name": f"bd_{i}", "tenant": tenants[i % tenant_count], "vrf": "vrf", "subnet": f"10.{i // 250 % 256}.{i % 250}.1/24"}
+        for i in range(bd_count)
+    ]
+    epgs = [
+        {"name": f"epg_{i}", "tenant": tenants[i % tenant_count], "app_profile": "ap",
+         "bridge_domain": f"bd_{i % tenant_count + tenant_count * (i // tenant_count % (bd_count // tenant_count))}"}
+        for i in range(epg_count)
+    ]
+    return FabricConfig(
+        site_code="AUNTH",
+        fabric_type="it",
+        execution_mode=mode,
+        max_concurrency=max_concurrency,
+        apic_credentials={"host": "127.0.0.1", "port": port, "username": "admin", "password": "password"},
+        tenants=[{"name": name} for name in tenants],
+        vrfs=[{"name": "vrf", "tenant": name} for name in tenants],
+        app_profiles=[{"name": "ap", "tenant": name} for name in tenants],
+        bridge_domains=bridge_domains,
+        epgs=epgs
+    )
+
+def synthetic_template_config(tenant_count: int, bd_count: int, epg_count: int, port: int,
+                              mode: str, max_concurrency: int) -> FabricConfig:
+    """The objects of synthetic_config, as a parametrized template"""
+    tenant = "bench_tn_{i % tenants}"
+    template = {
+        "variables": {"tenants": tenant_count, "bds": bd_count, "epgs": epg_count},
+        "tenants": [{"for_each": {"t": {"start": 0, "count": "{tenants}"}}, "name": "bench_tn_{t}"}],
+        "vrfs": [{"for_each": {"t": {"start": 0, "count": "{tenants}"}}, "name": "vrf", "tenant": "bench_tn_{t}"}],
+        "app_profiles": [{"for_each": {"t": {"start": 0, "count": "{tenants}"}}, "name": "ap", "tenant": "bench_tn_{t}"}],
+        "bridge_domains": [{
+            "for_each": {"i": {"start": 0, "count": "{bds}"}},
+            "name": "bd_{i}", "tenant": tenant, "vrf": "vrf", "subnet": "10.{i // 250 % 256}.{i % 250}.1/24"
+        }],
+        "epgs": [{
+            "for_each": {"i": {"start": 0, "count": "{epgs}"}},
+            "name": "epg_{i}", "tenant": tenant, "app_profile": "ap",
+            "bridge_domain": "bd_{i % tenants + tenants * (i // tenants % (bds // tenants))}"
+        }]
+    }
+    return FabricConfig(
+        site_code="AUNTH",
+        fabric_type="it",
+        execution_mode=mode,
+        max_concurrency=max_concurrency,
+        apic_credentials={"host": "127.0.0.1", "port": port, "username": "admin", "password": "password"},
+        expansion={"template": template}
+    )
+
+async def run_apic(config: FabricConfig) -> str:
+    from backend.services.provisioning import ProvisioningService
+
+    with get_database().connection() as conn:
+        job_id = conn.execute(
+            "INSERT INTO provisioning_jobs (name, fabric_config, status) VALUES (?, ?, 'pending')",
+            ("provisioning-benchmark", json.dumps(config.dict()))
+        ).lastrowid
+    await ProvisioningService().execute_provisioning(job_id, config)
+    with get_database().connection() as conn:
+        return conn.execute("SELECT status FROM provisioning_jobs WHERE id = ?", (job_id,)).fetchone()["status"]
+
+async def run_ndo(objects: int, port: int) -> str:
+    client = NDOClient(host="127.0.0.1", username="admin", password="password", port=port)
+    auth_result = await client.authenticate()
+    if not auth_result["success"]:
+        return "failed"
+    schema = await client.create_schema({"name": "bench_schema", "templates": [{"name": "bench_template"}]})
+    for i in range(objects):
+        result = await client.create_vrf_in_template(schema["schema_id"], "bench_template", {"name": f"vrf_{i}"})
+        if not result["success"]:
+            return "failed"
+    return "completed"
+
+async def run_ndo_schema(objects: int, port: int) -> str:
+    client = NDOClient(host="127.0.0.1", username="admin", password="password", port=port)
+    auth_result = await client.authenticate()
+    if not auth_result["success"]:
+        return "failed"
+    config = SchemaConfig(name="bench_schema", templates=[{
+        "name": "bench_template", "tenants": ["bench"], "sites": ["AUNTH"],
+        "vrfs": [{"name": f"vrf_{i}"} for i in range(objects)]
+    }])
+    started = time.perf_counter()
+    result = await apply_schema(client, config)
+    # The whole schema is one request, so every VRF shares its latency
+    Recorder.current.object_latencies.extend([time.perf_counter() - started] * objects)
+    return "completed" if result["success"] else "failed"
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Objects per config")
+    parser.add_argument("--modes", nargs="+", default=APIC_MODES + NDO_MODES, choices=APIC_MODES + NDO_MODES)
+    parser.add_argument("--latency", type=float, default=0.002, help="Mock controller latency per request (seconds)")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Fraction of requests answered 429/503")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Concurrency for parallel mode")
+    parser.add_argument("--port", type=int, default=18445)
+    parser.add_argument("--expand", action="store_true", help="Describe APIC configs as parametrized templates")
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+    recorder = Recorder()
+    recorder.install()
+
+    print(f"Mock latency {args.latency * 1000:.1f} ms, fault rate {args.fault_rate:.0%}")
+    print(f"{'mode':>10} {'objects':>8} {'status':>10} {'seconds':>8} {'objects/s':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'db ms':>8} {'db us/obj':>10}")
+    incomplete = []
+    for mode in args.modes:
+        for size in args.sizes:
+            # A fresh controller per run, so diff mode starts from an empty fabric
+            app = create_app(latency=args.latency, fault_rate=args.fault_rate)
+            with MockServer(app, port=args.port):
+                recorder.reset()
+                started = time.perf_counter()
+                if mode == "ndo":
+                    status = asyncio.run(run_ndo(size, args.port))
+                    objects = size
+                elif mode == "ndo-schema":
+                    status = asyncio.run(run_ndo_schema(size, args.port))
+                    objects = size
+                else:
+                    config = synthetic_config(size, args.port, mode, args.max_concurrency, args.expand)
+                    status = asyncio.run(run_apic(config))
+                    objects = count_config_objects(config)
+                elapsed = time.perf_counter() - started
+            if status != "completed":
+                incomplete.append(f"{mode}/{size}")
+
+            latencies = recorder.object_latencies
+            print(f"{mode:>10} {objects:>8} {status:>10} {elapsed:>8.2f} {objects / elapsed:>10.0f} "
+                  f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                  f"{recorder.db_seconds * 1000:>8.1f} {recorder.db_seconds * 1e6 / objects:>10.1f}")
+
+    get_database().close()
+    workdir.cleanup()
+    if incomplete:
+        # A timing for a run that did not finish proves nothing
+        sys.exit(f"Runs that did not complete: {', '.join(incomplete)}")
+
+if __name__ == "__main__":
+    main()
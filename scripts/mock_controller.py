@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Local stand-in APIC and NDO for benchmarks and offline development
+"""
+
+import argparse
+import asyncio
+import copy
+import datetime
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+def _write_self_signed_cert(directory: str):
+    """Write a throwaway self-signed certificate for localhost"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    key_path = os.path.join(directory, "mock.key")
+    cert_path = os.path.join(directory, "mock.crt")
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        ))
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    return key_path, cert_path
+
+RN_FORMATS = {
+    "polUni": "uni",
+    "fvTenant": "tn-{name}",
+    "fvCtx": "ctx-{name}",
+    "fvBD": "BD-{name}",
+    "fvSubnet": "subnet-[{ip}]",
+    "fvRsCtx": "rsctx",
+    "fvAp": "ap-{name}",
+    "fvAEPg": "epg-{name}",
+    "fvRsBd": "rsbd"
+}
+
+# ge(<class>.modTs,"<timestamp>") / gt(...) terms of a query-target-filter
+_MOD_TS_TERM = re.compile(r'(ge|gt)\((\w+)\.modTs,"([^"]+)"\)')
+
+def _mod_ts() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="microseconds")
+
+def _matches_filter(class_name: str, attributes: Dict[str, Any], query_filter: Optional[str]) -> bool:
+    """Evaluate the modTs delta filters an APIC client sends; other filters match everything"""
+    terms = _MOD_TS_TERM.findall(query_filter or "")
+    if not terms:
+        return True
+    mod_ts = attributes.get("modTs", "")
+    return any(
+        term_class == class_name and (mod_ts >= since if op == "ge" else mod_ts > since)
+        for op, term_class, since in terms
+    )
+
+def _query_response(request: Request, matches: list) -> Dict[str, Any]:
+    """Apply order-by, rsp-prop-include and page/page-size the way an APIC does"""
+    params = request.query_params
+    if params.get("order-by"):
+        matches.sort(key=lambda mo: next(iter(mo.values()))["attributes"].get("dn", ""))
+    if params.get("rsp-prop-include") == "naming-only":
+        for mo in matches:
+            body = next(iter(mo.values()))
+            body["attributes"] = {key: body["attributes"][key] for key in ("dn", "name", "id") if key in body["attributes"]}
+    total = len(matches)
+    if params.get("page-size"):
+        size = int(params["page-size"])
+        start = int(params.get("page", 0)) * size
+        matches = matches[start:start + size]
+    return {"totalCount": str(total), "imdata": matches}
+
+def _apply_json_patch(document: Dict[str, Any], operations: list):
+    """Apply NDO-style JSON-Patch operations, where list items are addressed by name"""
+    for operation in operations:
+        parts = operation["path"].strip("/").split("/")
+        parent = document
+        for part in parts[:-1]:
+            parent = _patch_child(parent, part)
+        last = parts[-1]
+        if isinstance(parent, list):
+            if operation["op"] == "add" and last == "-":
+                parent.append(operation["value"])
+                continue
+            index = parent.index(_patch_child(parent, last))
+            if operation["op"] == "remove":
+                del parent[index]
+            else:
+                parent[index] = operation["value"]
+        elif operation["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = operation["value"]
+
+def _patch_child(container: Any, part: str) -> Any:
+    if isinstance(container, list):
+        if part.isdigit():
+            return container[int(part)]
+        return next(item for item in container if item.get("name") == part)
+    return container[part]
+
+def _store_tree(mos: Dict[str, Dict[str, Any]], mo: Dict[str, Any], parent_dn: str):
+    """Flatten a posted managed object tree into the DN-keyed store"""
+    class_name, body = next(iter(mo.items()))
+    attributes = dict(body.get("attributes", {}))
+    rn = RN_FORMATS.get(class_name, class_name).format(**attributes)
+    dn = rn if class_name == "polUni" else f"{parent_dn}/{rn}"
+    if class_name != "polUni":
+        if attributes.get("status") == "deleted":
+            for key in [k for k in mos if k == dn or k.startswith(dn + "/")]:
+                del mos[key]
+            return
+        attributes.pop("status", None)
+        attributes["dn"] = dn
+        attributes["modTs"] = _mod_ts()
+        existing = mos.get(dn, {"class": class_name, "attributes": {}})
+        existing["attributes"].update(attributes)
+        mos[dn] = existing
+    for child in body.get("children", []):
+        _store_tree(mos, child, dn)
+
+def _token_response(app: FastAPI, token_timeout: int) -> Dict[str, Any]:
+    token = uuid.uuid4().hex
+    app.state.tokens[token] = time.monotonic() + token_timeout
+    return {"imdata": [{"aaaLogin": {"attributes": {
+        "token": token,
+        "refreshTimeoutSeconds": str(token_timeout)
+    }}}]}
+
+def _apic_error(status_code: int, code: str, text: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"totalCount": "1", "imdata": [
+        {"error": {"attributes": {"code": code, "text": text}}}
+    ]})
+
+class _DroppedConnection(Response):
+    """Announce a body and then stop short, so the server drops the connection"""
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-length", b"1024"), (b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"imdata": [', "more_body": False})
+
+def create_app(latency: float = 0.0, node_count: int = 8, max_payload_bytes: int = 0,
+               token_timeout: int = 600, fault_rate: float = 0.0, reset_rate: float = 0.0,
+               capacity: int = 0, apic: bool = True, ndo: bool = True,
+               deploy_seconds: float = 0.5) -> FastAPI:
+    """Build a mock controller application.
+
+    The APIC routes live under /api and the NDO routes under /mso/api/v1;
+    either set can be left out with ``apic``/``ndo``. Every request sleeps
+    for ``latency`` seconds before answering, which stands in for a
+    controller that is slow to commit configuration.
+
+    Faults can be injected for retry testing: ``fault_rate`` of requests
+    get a 429 or 503, ``reset_rate`` have their connection dropped
+    mid-response, and with ``capacity`` set the latency grows with the
+    square of the overload once more requests than that are in flight.
+    """
+    app = FastAPI(title="Mock APIC/NDO")
+    app.state.request_count = 0
+    app.state.fault_count = 0
+    app.state.in_flight = 0
+    app.state.peak_in_flight = 0
+
+    if apic:
+        add_apic_routes(app, node_count=node_count, max_payload_bytes=max_payload_bytes, token_timeout=token_timeout)
+    if ndo:
+        add_ndo_routes(app, deploy_seconds=deploy_seconds)
+
+    # Registered last so it wraps the token checks of both route sets
+    @app.middleware("http")
+    async def simulate_latency(request: Request, call_next):
+        app.state.request_count += 1
+        app.state.in_flight += 1
+        app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+        try:
+            delay = latency
+            if capacity and app.state.in_flight > capacity:
+                # Contention makes an overloaded controller slower per request
+                delay *= (app.state.in_flight / capacity) ** 2
+            if delay:
+                await asyncio.sleep(delay)
+
+            roll = random.random()
+            if roll < fault_rate:
+                app.state.fault_count += 1
+                if roll < fault_rate / 2:
+                    return JSONResponse(status_code=429, headers={"Retry-After": "0.1"}, content={"imdata": []})
+                return JSONResponse(status_code=503, content={"imdata": []})
+            if roll < fault_rate + reset_rate:
+                app.state.fault_count += 1
+                return _DroppedConnection()
+
+            return await call_next(request)
+        finally:
+            app.state.in_flight -= 1
+
+    return app
+
+def add_apic_routes(app: FastAPI, node_count: int = 8, max_payload_bytes: int = 0, token_timeout: int = 600):
+    """Mount a mock APIC under /api.
+
+    Configuration POSTs larger than ``max_payload_bytes`` (when set) are
+    rejected the way an APIC rejects an oversized transaction. Tokens
+    expire after ``token_timeout`` seconds unless refreshed; requests with
+    a missing or expired token get the APIC's 403 token error.
+    """
+    app.state.mos = {}
+    app.state.tokens = {}
+    app.state.login_count = 0
+    # Node id -> fabricNode attributes; tests may add or change entries
+    app.state.nodes = {}
+    for node_id in range(101, 101 + node_count):
+        app.state.nodes[str(node_id)] = {
+            "dn": f"topology/pod-1/node-{node_id}",
+            "id": str(node_id),
+            "name": f"leaf-{node_id}",
+            "role": "leaf",
+            "model": "N9K-C93180YC-FX",
+            "serial": f"FDO{node_id:08d}",
+            "modTs": _mod_ts()
+        }
+
+    @app.middleware("http")
+    async def check_apic_token(request: Request, call_next):
+        if request.url.path.startswith("/api/") and request.url.path != "/api/aaaLogin.json":
+            expires_at = app.state.tokens.get(request.headers.get("apic-cookie", ""))
+            if expires_at is None or expires_at < time.monotonic():
+                return _apic_error(403, "403", "Token was invalid (Error: Token timeout)")
+        return await call_next(request)
+
+    @app.post("/api/aaaLogin.json")
+    async def aaa_login(payload: Dict[str, Any]):
+        user = payload.get("aaaUser", {}).get("attributes", {})
+        if not user.get("name") or not user.get("pwd"):
+            return JSONResponse(status_code=401, content={"imdata": []})
+        app.state.login_count += 1
+        return _token_response(app, token_timeout)
+
+    @app.get("/api/aaaRefresh.json")
+    async def aaa_refresh(request: Request):
+        app.state.tokens.pop(request.headers.get("apic-cookie", ""), None)
+        return _token_response(app, token_timeout)
+
+    @app.get("/api/class/topSystem.json")
+    async def top_system():
+        return {"totalCount": "1", "imdata": [{"topSystem": {"attributes": {"name": "mock-apic1"}}}]}
+
+    @app.get("/api/class/fabricNode.json")
+    async def fabric_nodes(request: Request):
+        query_filter = request.query_params.get("query-target-filter")
+        imdata = [
+            {"fabricNode": {"attributes": dict(node)}}
+            for node in app.state.nodes.values()
+            if _matches_filter("fabricNode", node, query_filter)
+        ]
+        return _query_response(request, imdata)
+
+    @app.post("/api/mo/{dn:path}")
+    @app.post("/api/node/mo/{dn:path}")
+    async def post_mo(dn: str, payload: Dict[str, Any], request: Request):
+        if max_payload_bytes and int(request.headers.get("content-length", 0)) > max_payload_bytes:
+            return _apic_error(400, "107", "Request payload exceeds the maximum size")
+        dn = dn.removesuffix(".json")
+        parent_dn = dn.rsplit("/", 1)[0] if "/" in dn else ""
+        _store_tree(app.state.mos, payload, parent_dn)
+        return {"totalCount": "0", "imdata": []}
+
+    @app.get("/api/mo/{dn:path}")
+    @app.get("/api/node/mo/{dn:path}")
+    async def get_mo(dn: str, request: Request):
+        dn = dn.removesuffix(".json")
+        query_target = request.query_params.get("query-target", "self")
+        classes = request.query_params.get("target-subtree-class")
+        classes = set(classes.split(",")) if classes else None
+        query_filter = request.query_params.get("query-target-filter")
+
+        matches = []
+        for mo_dn, mo in app.state.mos.items():
+            if mo_dn == dn or (query_target == "subtree" and mo_dn.startswith(dn + "/")):
+                if (classes is None or mo["class"] in classes) and _matches_filter(mo["class"], mo["attributes"], query_filter):
+                    matches.append({mo["class"]: {"attributes": dict(mo["attributes"])}})
+        return _query_response(request, matches)
+
+def add_ndo_routes(app: FastAPI, deploy_seconds: float = 0.5,
+                   sites: Tuple[str, ...] = ("AUNTH", "AUSTH", "AUTER")):
+    """Mount a mock Nexus Dashboard Orchestrator under /mso/api/v1.
+
+    Schemas and their templates are kept in memory; each write bumps the
+    schema's ``_updateVersion`` and ETag, and schema and site GETs honour
+    If-None-Match. A deployment reports
+    "running" for ``deploy_seconds`` and then "succeeded", or "failed" if
+    it targets a site id in ``app.state.failing_sites``.
+    """
+    base = "/mso/api/v1"
+    app.state.ndo_tokens = set()
+    app.state.schemas = {}
+    app.state.deployments = {}
+    # Deployments that include one of these site ids end up "failed"
+    app.state.failing_sites = set()
+    app.state.ndo_sites = [{"id": f"site-{i + 1}", "name": name, "apicSiteId": str(i + 1)} for i, name in enumerate(sites)]
+
+    @app.middleware("http")
+    async def check_ndo_token(request: Request, call_next):
+        path = request.url.path
+        if path.startswith(base + "/") and path != f"{base}/auth/login":
+            authorization = request.headers.get("authorization", "")
+            if authorization.removeprefix("Bearer ") not in app.state.ndo_tokens:
+                return JSONResponse(status_code=401, content={"code": 401, "message": "Invalid or expired token"})
+        return await call_next(request)
+
+    def template_of(schema_id: str, template_name: str) -> Optional[Dict[str, Any]]:
+        schema = app.state.schemas.get(schema_id)
+        if schema is None:
+            return None
+        return next((t for t in schema["templates"] if t["name"] == template_name), None)
+
+    def not_found(what: str) -> JSONResponse:
+        return JSONResponse(status_code=404, content={"code": 404, "message": f"{what} not found"})
+
+    def touch(schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a write to a schema"""
+        schema["_updateVersion"] = schema.get("_updateVersion", 0) + 1
+        schema["_updatedAt"] = _mod_ts()
+        return schema
+
+    def conditional(request: Request, etag: str, content: Any) -> Response:
+        """304 if the client already has this version, else the content with its ETag"""
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse(content=content, headers={"ETag": etag})
+
+    @app.post(f"{base}/auth/login")
+    async def ndo_login(payload: Dict[str, Any]):
+        if not payload.get("username") or not payload.get("password"):
+            return JSONResponse(status_code=401, content={"code": 401, "message": "Login failed"})
+        token = uuid.uuid4().hex
+        app.state.ndo_tokens.add(token)
+        return {"token": token}
+
+    @app.get(f"{base}/platform/health")
+    async def ndo_health():
+        return {"status": "healthy"}
+
+    @app.get(f"{base}/sites")
+    async def ndo_sites(request: Request):
+        etag = f'"sites-{hash(repr(app.state.ndo_sites)) & 0xffffffff:x}"'
+        return conditional(request, etag, {"sites": app.state.ndo_sites})
+
+    @app.get(f"{base}/schemas")
+    async def list_schemas():
+        return {"schemas": list(app.state.schemas.values())}
+
+    @app.get(f"{base}/schemas/list-identity")
+    async def list_schema_identities():
+        return {"schemas": [
+            {"id": schema["id"], "displayName": schema["displayName"],
+             "templates": [{"name": t["name"]} for t in schema["templates"]],
+             "_updateVersion": schema["_updateVersion"], "_updatedAt": schema["_updatedAt"]}
+            for schema in app.state.schemas.values()
+        ]}
+
+    @app.post(f"{base}/schemas")
+    async def create_schema(payload: Dict[str, Any]):
+        schema_id = uuid.uuid4().hex[:24]
+        app.state.schemas[schema_id] = touch({**payload, "id": schema_id, "templates": list(payload.get("templates", []))})
+        return JSONResponse(status_code=201, content=app.state.schemas[schema_id])
+
+    @app.get(f"{base}/schemas/{{schema_id}}")
+    async def get_schema(schema_id: str, request: Request):
+        schema = app.state.schemas.get(schema_id)
+        if schema is None:
+            return not_found("Schema")
+        return conditional(request, f'"{schema_id}-{schema["_updateVersion"]}"', schema)
+
+    @app.patch(f"{base}/schemas/{{schema_id}}")
+    async def patch_schema(schema_id: str, operations: List[Dict[str, Any]]):
+        schema = app.state.schemas.get(schema_id)
+        if schema is None:
+            return not_found("Schema")
+        patched = copy.deepcopy(schema)
+        try:
+            _apply_json_patch(patched, operations)
+        except (KeyError, StopIteration, IndexError, ValueError) as e:
+            return JSONResponse(status_code=400, content={"code": 400, "message": f"Invalid patch: {e!r}"})
+        app.state.schemas[schema_id] = touch(patched)
+        return patched
+
+    @app.post(f"{base}/schemas/{{schema_id}}/templates/{{template_name}}/tenants")
+    async def add_tenant(schema_id: str, template_name: str, payload: Dict[str, Any]):
+        template = template_of(schema_id, template_name)
+        if template is None:
+            return not_found("Template")
+        template["tenantId"] = payload["name"]
+        touch(app.state.schemas[schema_id])
+        return JSONResponse(status_code=201, content=payload)
+
+    @app.post(f"{base}/schemas/{{schema_id}}/templates/{{template_name}}/vrfs")
+    async def add_vrf(schema_id: str, template_name: str, payload: Dict[str, Any]):
+        template = template_of(schema_id, template_name)
+        if template is None:
+            return not_found("Template")
+        template.setdefault("vrfs", []).append(payload)
+        touch(app.state.schemas[schema_id])
+        return JSONResponse(status_code=201, content=payload)
+
+    @app.post(f"{base}/schemas/{{schema_id}}/templates/{{template_name}}/deploy")
+    async def deploy(schema_id: str, template_name: str, payload: Dict[str, Any]):
+        if template_of(schema_id, template_name) is None:
+            return not_found("Template")
+        deployment_id = uuid.uuid4().hex[:24]
+        app.state.deployments[deployment_id] = {
+            "id": deployment_id,
+            "schemaId": schema_id,
+            "templateName": template_name,
+            "sites": payload.get("sites", []),
+            "started": time.monotonic()
+        }
+        return JSONResponse(status_code=202, content={"id": deployment_id})
+
+    @app.get(f"{base}/deployments/{{deployment_id}}")
+    async def deployment_status(deployment_id: str):
+        deployment = app.state.deployments.get(deployment_id)
+        if deployment is None:
+            return not_found("Deployment")
+        done = time.monotonic() - deployment["started"] >= deploy_seconds
+        failed = done and bool(app.state.failing_sites.intersection(deployment["sites"]))
+        return {
+            **{key: value for key, value in deployment.items() if key != "started"},
+            "status": "failed" if failed else "succeeded" if done else "running",
+            **({"message": "Deployment to site failed: fabric unreachable"} if failed else {})
+        }
+
+class MockServer:
+    """Run a mock controller app with uvicorn on a background thread"""
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 8443):
+        self.app = app
+        self.host = host
+        self.port = port
+        self._tmpdir = tempfile.TemporaryDirectory()
+        key_path, cert_path = _write_self_signed_cert(self._tmpdir.name)
+        self.server = uvicorn.Server(uvicorn.Config(
+            app,
+            host=host,
+            port=port,
+            log_level="critical",
+            access_log=False,
+            lifespan="off",
+            ssl_keyfile=key_path,
+            ssl_certfile=cert_path
+        ))
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self._thread.join(timeout=5)
+        self._tmpdir.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock APIC/NDO on localhost")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay per request")
+    parser.add_argument("--token-timeout", type=int, default=600, help="Seconds before a login token expires")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Fraction of requests answered 429/503")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="Fraction of connections dropped mid-response")
+    parser.add_argument("--capacity", type=int, default=0, help="Concurrent requests before latency starts to climb")
+    parser.add_argument("--deploy-seconds", type=float, default=0.5, help="How long an NDO deployment stays running")
+    parser.add_argument("--no-apic", action="store_true", help="Only serve the NDO API")
+    parser.add_argument("--no-ndo", action="store_true", help="Only serve the APIC API")
+    args = parser.parse_args()
+
+    app = create_app(latency=args.latency, token_timeout=args.token_timeout, fault_rate=args.fault_rate,
+                     reset_rate=args.reset_rate, capacity=args.capacity, deploy_seconds=args.deploy_seconds,
+                     apic=not args.no_apic, ndo=not args.no_ndo)
+    with MockServer(app, port=args.port):
+        print(f"Mock controller listening on https://127.0.0.1:{args.port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Rebuild the dashboard statistics counters from the jobs and API log tables
+
+The counters are kept up to date by triggers; run this after restoring a
+backup, editing the database by hand, or whenever /api/status/stats looks off.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.models.database import Database
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="aci_provisioning.db", help="Path to the SQLite database")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"Database not found: {args.db}")
+        sys.exit(1)
+
+    db = Database(args.db)
+    totals = db.reconcile_stats()
+    db.close()
+    for name, total in sorted(totals.items()):
+        print(f"{name}: {total}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Shared fixtures: a scratch working directory, one event loop and mock controllers
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from mock_controller import MockServer, create_app
+
+from backend.clients.session_manager import get_session_manager, get_ndo_session_manager
+from backend.clients.transport import close_shared_transports
+from backend.models.aci_models import FabricConfig
+from backend.models.database import get_database
+from backend.services.log_writer import get_log_writer
+
+@pytest.fixture(scope="session", autouse=True)
+def workdir(tmp_path_factory):
+    """Run from a scratch directory, where the database singleton creates its file"""
+    path = tmp_path_factory.mktemp("workdir")
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    get_log_writer().stop()
+    get_database().close()
+    os.chdir(previous)
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine on one event loop shared by the whole session.
+
+    Sessions, transports and throttles are cached per event loop, so a
+    single long-lived loop keeps them from outliving the loop they use.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def close_connections():
+    """Drop cached sessions and pooled connections, as the app does on shutdown"""
+    get_session_manager().close()
+    get_ndo_session_manager().close()
+    await close_shared_transports()
+
+@pytest.fixture
+def mock_controller(run):
+    """Start mock controllers on free ports; call with create_app options, get (app, port)"""
+    with ExitStack() as stack:
+        def start(**options):
+            app = create_app(**options)
+            port = free_port()
+            stack.enter_context(MockServer(app, port=port))
+            return app, port
+        yield start
+        # Idle keep-alive connections would hold up the servers' shutdown
+        run(close_connections())
+
+def credentials(port: int = 443) -> dict:
+    return {"host": "127.0.0.1", "port": port, "username": "admin", "password": "password"}
+
+def fabric_config(port: int = 443, tenants: int = 2, bds: int = 2, **fields) -> FabricConfig:
+    """A small config: each tenant gets a VRF, an AP and ``bds`` BDs, each BD an EPG"""
+    names = [f"tn{t}" for t in range(tenants)]
+    objects = {
+        "tenants": [{"name": name} for name in names],
+        "vrfs": [{"name": "vrf", "tenant": name} for name in names],
+        "app_profiles": [{"name": "ap", "tenant": name} for name in names],
+        "bridge_domains": [
+            {"name": f"bd{b}", "tenant": name, "vrf": "vrf", "subnet": f"10.{t}.{b}.1/24"}
+            for t, name in enumerate(names) for b in range(bds)
+        ],
+        "epgs": [
+            {"name": f"epg{b}", "tenant": name, "app_profile": "ap", "bridge_domain": f"bd{b}"}
+            for name in names for b in range(bds)
+        ]
+    }
+    return FabricConfig(**{
+        "site_code": "AUNTH",
+        "fabric_type": "it",
+        "apic_credentials": credentials(port),
+        **objects,
+        **fields
+    })
+
+def config_dns(tenants: int = 2, bds: int = 2) -> set:
+    """The DNs of every tracked object fabric_config creates"""
+    dns = set()
+    for t in range(tenants):
+        tenant = f"uni/tn-tn{t}"
+        dns.update({tenant, f"{tenant}/ctx-vrf", f"{tenant}/ap-ap"})
+        for b in range(bds):
+            dns.update({f"{tenant}/BD-bd{b}", f"{tenant}/ap-ap/epg-epg{b}"})
+    return dns
+
+@pytest.fixture
+def insert_job():
+    """Insert a pending job row for a config; returns its id"""
+    def insert(config, job_type: str = "fabric") -> int:
+        with get_database().connection() as conn:
+            return conn.execute(
+                "INSERT INTO provisioning_jobs (name, job_type, fabric_config, status) VALUES (?, ?, ?, 'pending')",
+                ("test-job", job_type, json.dumps(config.dict()))
+            ).lastrowid
+    return insert
+
+@pytest.fixture
+def job_state():
+    """A job's status and its task_logs rows, once buffered logs are written"""
+    def state(job_id: int):
+        get_log_writer().flush()
+        with get_database().connection() as conn:
+            job = conn.execute("SELECT * FROM provisioning_jobs WHERE id = ?", (job_id,)).fetchone()
+            logs = conn.execute("SELECT * FROM task_logs WHERE job_id = ? ORDER BY id", (job_id,)).fetchall()
+        return dict(job), [dict(row) for row in logs]
+    return state
@@ -0,0 +1,46 @@
+"""
+Tests for bulk plan building and payload splitting
+"""
+
+from backend.services.bulk import build_bulk_plan, split_tree, walk_tracked, _size
+
+from .conftest import config_dns, fabric_config
+
+def test_small_config_is_one_chunk():
+    plan = build_bulk_plan(fabric_config())
+
+    assert len(plan.chunks) == 1
+    assert set(plan.objects) == config_dns()
+    assert set(plan.chunks[0].dns) == config_dns()
+    assert plan.objects["uni/tn-tn1/BD-bd0"].kind == "bd"
+    assert plan.objects["uni/tn-tn1/BD-bd0"].tenant == "tn1"
+
+def test_chunks_fit_and_carry_every_object():
+    config = fabric_config(tenants=3, bds=40)
+    max_bytes = 4096
+    plan = build_bulk_plan(config, max_bytes=max_bytes)
+
+    assert len(plan.chunks) > 3
+    assert all(chunk.size <= max_bytes for chunk in plan.chunks)
+    assert all(chunk.size == _size(chunk.payload) for chunk in plan.chunks)
+    carried = [dn for chunk in plan.chunks for dn in chunk.dns]
+    assert config_dns(tenants=3, bds=40) <= set(carried)
+    assert set(plan.objects) == config_dns(tenants=3, bds=40)
+
+def test_split_tree_repeats_the_parent():
+    tree = {"fvTenant": {"attributes": {"name": "tn", "status": "created,modified"}, "children": [
+        {"fvBD": {"attributes": {"name": f"bd{i}", "descr": "x" * 100, "status": "created,modified"}}}
+        for i in range(20)
+    ]}}
+    pieces = split_tree(tree, 600)
+
+    assert len(pieces) > 1
+    assert all(_size(piece) <= 600 for piece in pieces)
+    assert all(piece["fvTenant"]["attributes"] == tree["fvTenant"]["attributes"] for piece in pieces)
+    bds = [dn for piece in pieces for _, dn, _ in walk_tracked(piece) if "/BD-" in dn]
+    assert bds == [f"uni/tn-tn/BD-bd{i}" for i in range(20)]
+
+def test_oversized_leaf_is_returned_unchanged():
+    leaf = {"fvBD": {"attributes": {"name": "bd", "descr": "x" * 1000}}}
+
+    assert split_tree(leaf, 100) == [leaf]
@@ -0,0 +1,72 @@
+"""
+Tests for keyset paging and schema migrations
+"""
+
+import sqlite3
+
+import pytest
+
+from backend.models import database
+from backend.models.database import Database, keyset_condition
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "test.db"))
+    yield db
+    db.close()
+
+def page(conn, after, descending=False, limit=3):
+    condition, params = keyset_condition(conn, "provisioning_jobs", "created_at", after, descending)
+    order = "DESC" if descending else "ASC"
+    rows = conn.execute(f"""
+        SELECT id FROM provisioning_jobs {"WHERE " + condition if condition else ""}
+        ORDER BY created_at {order}, id {order} LIMIT ?
+    """, (*params, limit)).fetchall()
+    return [row["id"] for row in rows]
+
+def test_keyset_pages_cover_every_row_once(db):
+    with db.connection() as conn:
+        # Several rows share a timestamp, so the id breaks ties
+        for i in range(10):
+            conn.execute(
+                "INSERT INTO provisioning_jobs (name, fabric_config, created_at) VALUES (?, '{}', ?)",
+                (f"job{i}", f"2026-01-0{1 + i // 4} 00:00:00")
+            )
+
+        for descending in (False, True):
+            seen, after = [], None
+            while True:
+                ids = page(conn, after, descending)
+                if not ids:
+                    break
+                seen.extend(ids)
+                after = ids[-1]
+            expected = sorted(range(1, 11), key=lambda i: ((i - 1) // 4, i), reverse=descending)
+            assert seen == expected
+
+def test_keyset_without_cursor_or_with_deleted_cursor(db):
+    with db.connection() as conn:
+        assert keyset_condition(conn, "provisioning_jobs", "created_at", None) == ("", ())
+        assert keyset_condition(conn, "provisioning_jobs", "created_at", 99, alias="j") == ("j.id > ?", (99,))
+
+def test_database_is_at_latest_version(db):
+    with db.connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(database.MIGRATIONS)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(provisioning_jobs)")}
+    assert "job_type" in columns
+
+def test_failed_migration_step_is_rolled_back(db, monkeypatch):
+    version = len(database.MIGRATIONS)
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [[
+        "CREATE TABLE half_applied (id INTEGER)",
+        "ALTER TABLE no_such_table ADD COLUMN broken TEXT"
+    ]])
+    conn = db.get_connection()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            db._migrate(conn)
+
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == version
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_applied'").fetchone() is None
+    finally:
+        conn.close()
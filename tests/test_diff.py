@@ -0,0 +1,59 @@
+"""
+Tests for diffing a config against existing APIC objects
+"""
+
+from backend.services.bulk import build_tenant_trees
+from backend.services.diff import CREATE, MODIFY, SKIP, diff_config, flatten_mo
+
+from .conftest import fabric_config
+
+def existing_state(config):
+    """Attributes keyed by DN, as if the config had already been pushed"""
+    return {
+        dn: attributes
+        for tree in build_tenant_trees(config).values()
+        for dn, attributes in flatten_mo(tree, "uni")
+    }
+
+def test_empty_fabric_creates_everything():
+    config = fabric_config()
+    diffs, delta = diff_config(config, {})
+
+    assert {diff.action for diff in diffs} == {CREATE}
+    assert len(delta.tenants) == 2 and len(delta.epgs) == 4
+
+def test_unchanged_objects_are_skipped():
+    config = fabric_config()
+    diffs, delta = diff_config(config, existing_state(config))
+
+    assert {diff.action for diff in diffs} == {SKIP}
+    assert not any((delta.tenants, delta.vrfs, delta.bridge_domains, delta.app_profiles, delta.epgs))
+
+def test_changed_and_missing_objects():
+    config = fabric_config()
+    existing = existing_state(config)
+    existing["uni/tn-tn0/BD-bd1/rsctx"]["tnFvCtxName"] = "other"
+    existing["uni/tn-tn1/ctx-vrf"]["descr"] = "stale"
+    del existing["uni/tn-tn1/ap-ap/epg-epg0"]
+    diffs, delta = diff_config(config, existing)
+    actions = {diff.dn: diff for diff in diffs}
+
+    bd = actions["uni/tn-tn0/BD-bd1"]
+    assert bd.action == MODIFY
+    assert bd.changes == {"uni/tn-tn0/BD-bd1/rsctx.tnFvCtxName": {"current": "other", "desired": "vrf"}}
+    assert actions["uni/tn-tn1/ctx-vrf"].action == MODIFY
+    assert actions["uni/tn-tn1/ap-ap/epg-epg0"].action == CREATE
+    assert [bd.name for bd in delta.bridge_domains] == ["bd1"]
+    assert [(vrf.tenant, vrf.name) for vrf in delta.vrfs] == [("tn1", "vrf")]
+    assert [(epg.tenant, epg.name) for epg in delta.epgs] == [("tn1", "epg0")]
+    assert delta.tenants == []
+
+def test_missing_subnet_is_a_change():
+    config = fabric_config()
+    existing = existing_state(config)
+    del existing["uni/tn-tn0/BD-bd0/subnet-[10.0.0.1/24]"]
+    diffs, _ = diff_config(config, existing)
+    bd = next(diff for diff in diffs if diff.dn == "uni/tn-tn0/BD-bd0")
+
+    assert bd.action == MODIFY
+    assert bd.changes == {"uni/tn-tn0/BD-bd0/subnet-[10.0.0.1/24]": "missing"}
@@ -0,0 +1,95 @@
+"""
+Tests for parametrized template expansion and its limits
+"""
+
+import pytest
+
+from backend.services import expansion
+from backend.services.expansion import ExpansionTemplate, check_config_expansion, expand_config
+
+from .conftest import fabric_config
+
+def expand(template, field, site_code="AUNTH", fabric_type="it", parameters=None):
+    compiled = ExpansionTemplate(template)
+    variables = compiled.resolve(site_code, fabric_type, parameters)
+    compiled.count(variables)
+    return list(compiled.iter_objects(variables, field))
+
+def test_loops_variables_and_layers():
+    template = {
+        "variables": {"count": 3, "base": "10.0.0.0/16"},
+        "sites": {"AUSTH": {"base": "10.1.0.0/16"}},
+        "tenants": [{"name": "tn_{site_code}"}],
+        "bridge_domains": [{
+            "for_each": {"i": {"start": 0, "count": "{count}"}},
+            "name": "bd_{i:03d}", "tenant": "tn_{site_code}", "vrf": "vrf",
+            "subnet": "{gateway(subnet(base, i, 24))}"
+        }]
+    }
+    bds = expand(template, "bridge_domains", site_code="AUSTH")
+
+    assert [bd.name for bd in bds] == ["bd_000", "bd_001", "bd_002"]
+    assert [bd.subnet for bd in bds] == ["10.1.0.1/24", "10.1.1.1/24", "10.1.2.1/24"]
+    assert expand(template, "tenants", parameters={"count": 1})[0].name == "tn_AUNTH"
+
+def test_parameters_override_variables():
+    template = {"variables": {"count": 3}, "tenants": [{"for_each": {"t": "{count}"}, "name": "tn{t}"}]}
+
+    assert [t.name for t in expand(template, "tenants", parameters={"count": 2})] == ["tn1", "tn2"]
+
+def test_string_multiplication_is_rejected():
+    template = {"tenants": [{"name": "{'x' * 1000000}"}]}
+
+    with pytest.raises(ValueError, match="arithmetic needs integers"):
+        expand(template, "tenants")
+
+def test_huge_integers_are_rejected():
+    template = {"tenants": [{"name": "tn{100000000000000000000 * 100000000000000000000}"}]}
+
+    with pytest.raises(ValueError, match="too large"):
+        expand(template, "tenants")
+
+def test_format_width_is_capped():
+    with pytest.raises(ValueError, match="wider than"):
+        ExpansionTemplate({"tenants": [{"name": "{1:>100000000}"}]})
+
+def test_private_names_are_rejected():
+    with pytest.raises(ValueError, match="underscore"):
+        ExpansionTemplate({"variables": {"_arithmetic": 1}})
+    with pytest.raises(ValueError, match="underscore"):
+        ExpansionTemplate({"tenants": [{"for_each": {"_i": 3}, "name": "tn{_i}"}]})
+    with pytest.raises(ValueError, match="private name"):
+        ExpansionTemplate({"tenants": [{"name": "{_arithmetic}"}]})
+
+def test_loop_size_is_capped():
+    template = {"tenants": [{"for_each": {"t": expansion.MAX_LOOP_VALUES + 1}, "name": "tn{t}"}]}
+
+    with pytest.raises(ValueError, match="more than"):
+        expand(template, "tenants")
+
+def test_object_count_is_capped_without_expanding():
+    # Two nested loops under the per-loop cap whose product is far over the object cap
+    template = {"tenants": [{"for_each": {"a": 50000, "b": 50000}, "name": "tn{a}_{b}"}]}
+    compiled = ExpansionTemplate(template)
+
+    with pytest.raises(ValueError, match="more than"):
+        compiled.count(compiled.resolve("AUNTH", "it"))
+
+def test_config_expansion():
+    config = fabric_config(tenants=0, bds=0, expansion={"template": {
+        "tenants": [{"for_each": {"t": 2}, "name": "tn{t}"}],
+        "vrfs": [{"for_each": {"t": 2}, "name": "vrf", "tenant": "tn{t}"}]
+    }})
+
+    assert check_config_expansion(config) == 4
+    expanded = expand_config(config)
+    assert [t.name for t in expanded.tenants] == ["tn1", "tn2"]
+    assert expanded.expansion is None
+
+def test_invalid_object_is_reported_when_checked():
+    config = fabric_config(tenants=0, bds=0, expansion={"template": {
+        "vrfs": [{"for_each": {"t": 2}, "name": "vrf"}]
+    }})
+
+    with pytest.raises(ValueError, match="invalid object"):
+        check_config_expansion(config)
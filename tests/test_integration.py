@@ -0,0 +1,140 @@
+"""
+End-to-end provisioning jobs against the mock APIC and NDO
+"""
+
+import json
+
+import pytest
+
+from backend.models.ndo_models import NDOJobConfig
+from backend.services.provisioning import ProvisioningService
+
+from .conftest import config_dns, credentials, fabric_config
+
+@pytest.mark.parametrize("mode", ["sequential", "bulk", "parallel", "diff"])
+def test_execution_mode(mode, run, mock_controller, insert_job, job_state):
+    app, port = mock_controller()
+    config = fabric_config(port, execution_mode=mode, max_concurrency=4)
+    job_id = insert_job(config)
+    run(ProvisioningService().execute_provisioning(job_id, config))
+    job, logs = job_state(job_id)
+
+    assert job["status"] == "completed"
+    assert job["progress"] == 100
+    assert config_dns() <= set(app.state.mos)
+    assert app.state.mos["uni/tn-tn1/BD-bd1/subnet-[10.1.1.1/24]"]["class"] == "fvSubnet"
+    assert app.state.mos["uni/tn-tn0/ap-ap/epg-epg1/rsbd"]["attributes"]["tnFvBDName"] == "bd1"
+    assert not [log for log in logs if log["status"] == "error"]
+    created = [log for log in logs if log["task_name"].startswith("create_") and log["status"] == "success"]
+    assert len(created) == len(config_dns())
+
+def test_diff_rerun_pushes_only_changes(run, mock_controller, insert_job, job_state):
+    app, port = mock_controller()
+    config = fabric_config(port, execution_mode="diff")
+    run(ProvisioningService().execute_provisioning(insert_job(config), config))
+    app.state.mos["uni/tn-tn0/BD-bd1/rsctx"]["attributes"]["tnFvCtxName"] = "other"
+
+    job_id = insert_job(config)
+    run(ProvisioningService().execute_provisioning(job_id, config))
+    job, logs = job_state(job_id)
+    objects = [log for log in logs if log["task_name"].startswith("create_")]
+
+    assert job["status"] == "completed"
+    assert app.state.mos["uni/tn-tn0/BD-bd1/rsctx"]["attributes"]["tnFvCtxName"] == "vrf"
+    modified = [log for log in objects if log["message"] == "Bridge Domain modified successfully"]
+    assert [json.loads(log["details"])["dn"] for log in modified] == ["uni/tn-tn0/BD-bd1"]
+    unchanged = [log for log in objects if log["message"].endswith("unchanged, already matches desired state")]
+    assert len(unchanged) == len(config_dns()) - 1
+
+def test_multi_site_job(run, mock_controller, insert_job, job_state):
+    primary, primary_port = mock_controller()
+    secondary, secondary_port = mock_controller()
+    config = fabric_config(primary_port, execution_mode="bulk", sites=[
+        {"site_code": "AUSTH", "apic_credentials": credentials(secondary_port)}
+    ])
+    job_id = insert_job(config)
+    run(ProvisioningService().execute_provisioning(job_id, config))
+    job, _ = job_state(job_id)
+
+    assert job["status"] == "completed"
+    assert config_dns() <= set(primary.state.mos)
+    assert config_dns() <= set(secondary.state.mos)
+    site_results = json.loads(job["site_results"])
+    assert len(site_results) == 2
+    assert all(result["status"] == "completed" for result in site_results.values())
+
+@pytest.mark.parametrize("mode", ["sequential", "parallel", "bulk"])
+def test_expansion_job(mode, run, mock_controller, insert_job, job_state):
+    app, port = mock_controller()
+    config = fabric_config(port, tenants=0, bds=0, execution_mode=mode, expansion={
+        "template": {
+            "variables": {"bds": 6},
+            "tenants": [{"name": "tn_{site_code}"}],
+            "vrfs": [{"name": "vrf", "tenant": "tn_{site_code}"}],
+            "bridge_domains": [{
+                "for_each": {"i": {"start": 0, "count": "{bds}"}},
+                "name": "bd{i}", "tenant": "tn_{site_code}", "vrf": "vrf", "subnet": "10.9.{i}.1/24"
+            }]
+        },
+        "parameters": {"bds": 4}
+    })
+    job_id = insert_job(config)
+    run(ProvisioningService().execute_provisioning(job_id, config))
+    job, _ = job_state(job_id)
+
+    assert job["status"] == "completed"
+    bds = {dn for dn in app.state.mos if dn.startswith("uni/tn-tn_AUNTH/BD-") and dn.count("/") == 2}
+    assert bds == {f"uni/tn-tn_AUNTH/BD-bd{i}" for i in range(4)}
+
+def test_failed_authentication_fails_the_job(run, mock_controller, insert_job, job_state):
+    _, port = mock_controller()
+    config = fabric_config(port, apic_credentials={**credentials(port), "password": ""})
+    job_id = insert_job(config)
+    run(ProvisioningService().execute_provisioning(job_id, config))
+    job, logs = job_state(job_id)
+
+    assert job["status"] == "failed"
+    assert logs[-1]["task_name"] == "provisioning_error"
+
+def ndo_job_config(port: int, **fields) -> NDOJobConfig:
+    return NDOJobConfig(ndo_credentials=credentials(port), ndo_schema={
+        "name": "schema",
+        "templates": [{
+            "name": f"template{t}",
+            "tenants": ["tn"],
+            "sites": ["AUNTH", "AUSTH", "AUTER"],
+            "vrfs": [{"name": "vrf"}],
+            "bds": [{"name": "bd", "vrf": "vrf", "subnets": [f"10.{t}.0.1/24"]}]
+        } for t in range(2)]
+    }, **fields)
+
+def test_ndo_job_applies_and_deploys(run, mock_controller, insert_job, job_state):
+    app, port = mock_controller(apic=False, deploy_seconds=0.1)
+    config = ndo_job_config(port)
+    job_id = insert_job(config, "ndo")
+    run(ProvisioningService().execute_ndo_schema(job_id, config))
+    job, logs = job_state(job_id)
+
+    assert job["status"] == "completed"
+    assert len(app.state.schemas) == 1
+    assert len(app.state.deployments) == 6
+    deployed = [log for log in logs if log["task_name"].startswith("deploy_") and log["status"] == "success"]
+    assert len(deployed) == 7  # six deployments and the summary
+
+    # Running the same job again changes nothing in the schema
+    job_id = insert_job(config, "ndo")
+    run(ProvisioningService().execute_ndo_schema(job_id, config.copy(update={"deploy": False})))
+    job, logs = job_state(job_id)
+    assert job["status"] == "completed"
+    assert any(log["message"] == "Schema 'schema' already up to date" for log in logs)
+
+def test_ndo_job_fails_when_a_deployment_fails(run, mock_controller, insert_job, job_state):
+    app, port = mock_controller(apic=False, deploy_seconds=0.1)
+    app.state.failing_sites.add("site-2")
+    config = ndo_job_config(port)
+    job_id = insert_job(config, "ndo")
+    run(ProvisioningService().execute_ndo_schema(job_id, config))
+    job, logs = job_state(job_id)
+
+    assert job["status"] == "failed"
+    assert "2 of 6 deployments failed" in logs[-1]["message"]
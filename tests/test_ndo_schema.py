@@ -0,0 +1,91 @@
+"""
+Tests for compiling NDO schemas and patching existing ones
+"""
+
+from backend.models.ndo_models import SchemaConfig
+from backend.services.ndo_schema import _ref_key, build_schema_document, build_schema_patch
+
+SITE_IDS = {"AUNTH": "site-1", "AUSTH": "site-2"}
+
+def schema_config(**template) -> SchemaConfig:
+    return SchemaConfig(name="schema", templates=[{
+        "name": "template",
+        "tenants": ["tn"],
+        "sites": ["AUNTH", "AUSTH"],
+        "vrfs": [{"name": "vrf"}],
+        "bds": [{"name": "bd", "vrf": "vrf", "subnets": ["10.1.1.1/24"]}],
+        "anps": [{"name": "ap", "epgs": [{"name": "epg", "bd": "bd"}]}],
+        **template
+    }])
+
+def stored_schema(config: SchemaConfig) -> dict:
+    """The schema as NDO returns it: with an id, schema refs and defaults filled in"""
+    schema = {"id": "schema-1", **build_schema_document(config, SITE_IDS, schema_id="schema-1")}
+    for template in schema["templates"]:
+        for bd in template["bds"]:
+            bd["vrfRef"] = f"/schemas/schema-1/templates/{template['name']}/vrfs/{bd['vrfRef']['vrfName']}"
+            bd["unkMcastAct"] = "flood"
+            for subnet in bd["subnets"]:
+                subnet.update({"querier": False, "noDefaultGateway": False})
+    return schema
+
+def test_document_holds_every_template_site():
+    document = build_schema_document(schema_config(), SITE_IDS)
+
+    assert document["displayName"] == "schema"
+    assert document["sites"] == [
+        {"siteId": "site-1", "templateName": "template"},
+        {"siteId": "site-2", "templateName": "template"}
+    ]
+    template = document["templates"][0]
+    assert [bd["vrfRef"] for bd in template["bds"]] == [{"templateName": "template", "vrfName": "vrf"}]
+    assert template["anps"][0]["epgs"][0]["bdRef"] == {"templateName": "template", "bdName": "bd"}
+
+def test_unchanged_schema_needs_no_operations():
+    config = schema_config()
+
+    assert build_schema_patch(config, stored_schema(config), SITE_IDS) == []
+
+def test_new_objects_are_added():
+    existing = stored_schema(schema_config())
+    config = schema_config(
+        vrfs=[{"name": "vrf"}, {"name": "vrf2"}],
+        anps=[{"name": "ap", "epgs": [{"name": "epg", "bd": "bd"}, {"name": "epg2", "bd": "bd"}]}]
+    )
+    operations = build_schema_patch(config, existing, SITE_IDS)
+
+    assert [(op["op"], op["path"]) for op in operations] == [
+        ("add", "/templates/template/vrfs/-"),
+        ("add", "/templates/template/anps/ap/epgs/-")
+    ]
+    assert operations[0]["value"]["name"] == "vrf2"
+    assert operations[1]["value"]["name"] == "epg2"
+
+def test_changed_bridge_domain_is_replaced():
+    existing = stored_schema(schema_config())
+    config = schema_config(bds=[{"name": "bd", "vrf": "vrf", "subnets": ["10.1.1.1/24", "10.1.2.1/24"]}])
+    operations = build_schema_patch(config, existing, SITE_IDS)
+
+    assert [(op["op"], op["path"]) for op in operations] == [("replace", "/templates/template/bds/bd")]
+
+def test_new_template_and_site():
+    config = schema_config()
+    existing = stored_schema(config)
+    existing["sites"] = existing["sites"][:1]
+    config.templates.append(config.templates[0].copy(update={"name": "template2", "sites": ["AUNTH"]}))
+    operations = build_schema_patch(config, existing, SITE_IDS)
+
+    assert [(op["op"], op["path"]) for op in operations] == [
+        ("add", "/templates/-"),
+        ("add", "/sites/-"),
+        ("add", "/sites/-")
+    ]
+    assert [op["value"].get("siteId") for op in operations[1:]] == ["site-2", "site-1"]
+
+def test_ref_keys():
+    path = "/schemas/schema-1/templates/template/vrfs/vrf"
+
+    assert _ref_key(path) == ("template", "vrfName", "vrf")
+    assert _ref_key({"templateName": "template", "vrfName": "vrf", "schemaId": "schema-1"}) == ("template", "vrfName", "vrf")
+    # A reference with only a template name is compared as it is
+    assert _ref_key({"templateName": "template"}) == {"templateName": "template"}
@@ -0,0 +1,87 @@
+"""
+Tests for the dependency scheduler
+"""
+
+import asyncio
+
+from backend.services.scheduler import DependencyScheduler, ProvisioningTask
+
+def task(key, depends_on=(), result=None, error=None, log=None, delay=0.0):
+    async def run():
+        if log is not None:
+            log.append(("start", key))
+        await asyncio.sleep(delay)
+        if log is not None:
+            log.append(("end", key))
+        if error:
+            raise RuntimeError(error)
+        return result or {"success": True}
+    return ProvisioningTask(key=key, run=run, depends_on=list(depends_on))
+
+TENANT = ("tenant", "tn", "tn")
+VRF = ("vrf", "tn", "vrf")
+BD = ("bd", "tn", "bd")
+AP = ("ap", "tn", "ap")
+EPG = ("epg", "tn", "epg")
+
+def test_parents_run_before_children(run):
+    log = []
+    tasks = {
+        EPG: task(EPG, [AP, BD], log=log),
+        BD: task(BD, [TENANT, VRF], log=log),
+        VRF: task(VRF, [TENANT], log=log),
+        AP: task(AP, [TENANT], log=log),
+        TENANT: task(TENANT, log=log)
+    }
+    results = run(DependencyScheduler(tasks).run())
+
+    assert all(result["success"] for result in results.values())
+    position = {entry: index for index, entry in enumerate(log)}
+    for key, item in tasks.items():
+        for parent in item.depends_on:
+            assert position[("end", parent)] < position[("start", key)]
+
+def test_failure_skips_every_descendant(run):
+    tasks = {
+        TENANT: task(TENANT),
+        VRF: task(VRF, [TENANT], result={"success": False, "error": "VRF rejected"}),
+        BD: task(BD, [TENANT, VRF]),
+        AP: task(AP, [TENANT]),
+        EPG: task(EPG, [AP, BD])
+    }
+    completed = []
+    results = run(DependencyScheduler(tasks).run(on_complete=lambda item, result: completed.append(item.key)))
+
+    assert results[VRF] == {"success": False, "error": "VRF rejected"}
+    assert results[BD] == {"success": False, "skipped": True, "error": "Skipped because VRF 'vrf' failed"}
+    assert results[EPG]["skipped"]
+    assert results[EPG]["error"] == "Skipped because Bridge Domain 'bd' failed"
+    assert results[AP]["success"]
+    assert sorted(completed) == sorted(tasks)
+
+def test_exception_is_a_failed_result(run):
+    tasks = {TENANT: task(TENANT, error="connection reset"), VRF: task(VRF, [TENANT])}
+    results = run(DependencyScheduler(tasks).run())
+
+    assert results[TENANT] == {"success": False, "error": "connection reset"}
+    assert results[VRF]["skipped"]
+
+def test_concurrency_is_bounded(run):
+    running = 0
+    peak = 0
+
+    def counted(key):
+        async def run_task():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"success": True}
+        return ProvisioningTask(key=key, run=run_task)
+
+    tasks = {("tenant", f"tn{i}", f"tn{i}"): counted(("tenant", f"tn{i}", f"tn{i}")) for i in range(20)}
+    results = run(DependencyScheduler(tasks, max_concurrency=3).run())
+
+    assert len(results) == 20
+    assert peak == 3
@@ -0,0 +1,86 @@
+"""
+Tests for config validation and the subnet overlap sweep
+"""
+
+from backend.services.inventory import FabricSnapshot
+from backend.services.validation import ConfigValidator
+
+from .conftest import fabric_config
+
+def config_with_bds(*bds, vrfs=("vrf",)):
+    return fabric_config(
+        tenants=1,
+        bds=0,
+        vrfs=[{"name": vrf, "tenant": "tn0"} for vrf in vrfs],
+        bridge_domains=[{"name": name, "tenant": "tn0", "vrf": vrf, "subnet": subnet} for name, vrf, subnet in bds]
+    )
+
+def overlaps(config, snapshot=None):
+    errors, _ = ConfigValidator(config).check_fabric(snapshot)
+    return [error for error in errors if "overlaps" in error]
+
+def test_valid_config_has_no_errors():
+    validator = ConfigValidator(fabric_config())
+
+    assert validator.check_structure() == ([], [])
+    assert validator.check_fabric() == ([], [])
+
+def test_overlap_in_same_vrf():
+    config = config_with_bds(("web", "vrf", "10.1.1.1/24"), ("app", "vrf", "10.1.1.129/25"))
+
+    assert overlaps(config) == [
+        "Subnet '10.1.1.129/25' on Bridge Domain 'app' overlaps '10.1.1.1/24' on Bridge Domain 'web' in VRF 'vrf' of tenant 'tn0'"
+    ]
+
+def test_same_subnet_in_different_vrfs_is_allowed():
+    config = config_with_bds(("web", "red", "10.1.1.1/24"), ("app", "blue", "10.1.1.1/24"), vrfs=("red", "blue"))
+
+    assert overlaps(config) == []
+
+def test_adjacent_subnets_do_not_overlap():
+    config = config_with_bds(("web", "vrf", "10.1.0.1/24"), ("app", "vrf", "10.1.1.1/24"), ("db", "vrf", "10.1.2.1/23"))
+
+    assert overlaps(config) == []
+
+def test_wide_subnet_overlaps_every_nested_one():
+    config = config_with_bds(
+        ("wide", "vrf", "10.2.0.1/16"),
+        *[(f"bd{i}", "vrf", f"10.2.{i}.1/24") for i in range(5)],
+        ("outside", "vrf", "10.3.0.1/24")
+    )
+    errors = overlaps(config)
+
+    assert len(errors) == 5
+    assert all("Bridge Domain 'wide'" in error for error in errors)
+    assert all(any(f"Bridge Domain 'bd{i}'" in error for error in errors) for i in range(5))
+
+def test_overlap_with_existing_subnet():
+    config = config_with_bds(("web", "vrf", "10.1.1.1/24"))
+    snapshot = FabricSnapshot()
+    snapshot.bridge_domains[("tn0", "legacy")] = "vrf"
+    snapshot.subnets.add(("tn0", "legacy", "10.1.0.1/16"))
+    # The configured BD's own subnet is already on the fabric
+    snapshot.bridge_domains[("tn0", "web")] = "vrf"
+    snapshot.subnets.add(("tn0", "web", "10.1.1.1/24"))
+
+    assert overlaps(config, snapshot) == [
+        "Subnet '10.1.1.1/24' on Bridge Domain 'web' overlaps '10.1.0.1/16' on existing Bridge Domain 'legacy' in VRF 'vrf' of tenant 'tn0'"
+    ]
+
+def test_structure_errors():
+    config = fabric_config(tenants=1, bds=0, bridge_domains=[
+        {"name": "web", "tenant": "tn0", "vrf": "vrf", "subnet": "10.1.1.1/24"},
+        {"name": "web", "tenant": "tn0", "vrf": "vrf", "subnet": "not-a-subnet"}
+    ])
+    errors, _ = ConfigValidator(config).check_structure()
+
+    assert "Bridge Domain 'tn0/web' is defined 2 times" in errors
+    assert "Bridge Domain 'web' has an invalid subnet 'not-a-subnet'" in errors
+
+def test_dangling_references():
+    config = fabric_config(tenants=1, bds=1, epgs=[
+        {"name": "epg", "tenant": "tn0", "app_profile": "missing", "bridge_domain": "bd0"}
+    ])
+    errors, _ = ConfigValidator(config).check_fabric()
+
+    assert errors == ["EPG 'epg' references non-existent application profile 'missing' in tenant 'tn0'"]